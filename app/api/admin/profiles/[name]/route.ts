@@ -0,0 +1,39 @@
+import { NextResponse } from 'next/server';
+import { API_BASE_URL } from '@/lib/config';
+
+// GET /api/admin/profiles/:name - Download one profiling report (admin token required)
+export async function GET(request: Request, { params }: { params: Promise<{ name: string }> }) {
+  try {
+    const { name } = await params;
+    const response = await fetch(`${API_BASE_URL}/admin/profiles/${encodeURIComponent(name)}`, {
+      method: 'GET',
+      headers: {
+        Authorization: request.headers.get('authorization') || '',
+      },
+    });
+
+    if (response.ok) {
+      // Pass the report through without buffering it
+      const headers = new Headers();
+      for (const header of ['content-type', 'content-disposition', 'content-length']) {
+        const value = response.headers.get(header);
+        if (value) {
+          headers.set(header, value);
+        }
+      }
+      return new Response(response.body, { status: 200, headers });
+    } else {
+      const data = await response.json();
+      return NextResponse.json(
+        { error: data.detail || 'Failed to download profile' },
+        { status: response.status }
+      );
+    }
+  } catch (error: any) {
+    console.error('Error downloading profile:', error);
+    return NextResponse.json(
+      { error: error.message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,32 @@
+import { NextResponse } from 'next/server';
+import { API_BASE_URL } from '@/lib/config';
+
+// GET /api/admin/profiles - Stored request profiling reports (admin token required)
+export async function GET(request: Request) {
+  try {
+    const response = await fetch(`${API_BASE_URL}/admin/profiles`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+        Authorization: request.headers.get('authorization') || '',
+      },
+    });
+
+    const data = await response.json();
+
+    if (response.ok) {
+      return NextResponse.json(data, { status: 200 });
+    } else {
+      return NextResponse.json(
+        { error: data.detail || 'Failed to list profiles' },
+        { status: response.status }
+      );
+    }
+  } catch (error: any) {
+    console.error('Error listing profiles:', error);
+    return NextResponse.json(
+      { error: error.message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,41 @@
+import { NextResponse } from 'next/server';
+import { API_BASE_URL } from '@/lib/config';
+
+// GET /api/autocomplete?field=spv&q=xxx&limit=10&fiscalYear=xxx - Get ranked suggestions for a field
+export async function GET(request: Request) {
+  try {
+    const { searchParams } = new URL(request.url);
+
+    if (!searchParams.get('field')) {
+      return NextResponse.json(
+        { error: 'field is required' },
+        { status: 400 }
+      );
+    }
+
+    // Call FastAPI backend with the same query string
+    const response = await fetch(`${API_BASE_URL}/autocomplete?${searchParams.toString()}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+    });
+
+    const data = await response.json();
+
+    if (response.ok) {
+      return NextResponse.json(data, { status: 200 });
+    } else {
+      return NextResponse.json(
+        { error: data.detail || 'Failed to get suggestions' },
+        { status: response.status }
+      );
+    }
+  } catch (error: any) {
+    console.error('Error getting suggestions:', error);
+    return NextResponse.json(
+      { error: error.message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
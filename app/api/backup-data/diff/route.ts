@@ -0,0 +1,41 @@
+import { NextResponse } from 'next/server';
+import { API_BASE_URL } from '@/lib/config';
+
+// GET /api/backup-data/diff?fiscalYear=xxx&from=A&to=B - Rows added, removed and modified between two versions
+export async function GET(request: Request) {
+  try {
+    const { searchParams } = new URL(request.url);
+
+    if (!searchParams.get('fiscalYear') || !searchParams.get('from') || !searchParams.get('to')) {
+      return NextResponse.json(
+        { error: 'fiscalYear, from and to are required' },
+        { status: 400 }
+      );
+    }
+
+    // Call FastAPI backend with the same query string
+    const response = await fetch(`${API_BASE_URL}/backup-data/diff?${searchParams.toString()}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+    });
+
+    const data = await response.json();
+
+    if (response.ok) {
+      return NextResponse.json(data, { status: 200 });
+    } else {
+      return NextResponse.json(
+        { error: data.detail || 'Failed to diff backup data' },
+        { status: response.status }
+      );
+    }
+  } catch (error: any) {
+    console.error('Error diffing backup data:', error);
+    return NextResponse.json(
+      { error: error.message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,52 @@
+import { NextResponse } from 'next/server';
+import { API_BASE_URL } from '@/lib/config';
+
+// The stream stays open for as long as the client listens
+export const dynamic = 'force-dynamic';
+
+// GET /api/events - Server-Sent Events stream of table data, dropdown option and relationship changes
+// Resumes after the Last-Event-ID header (sent by EventSource on reconnect) or ?lastEventId=
+export async function GET(request: Request) {
+  try {
+    const { searchParams } = new URL(request.url);
+
+    const headers: Record<string, string> = { Accept: 'text/event-stream' };
+    const lastEventId = request.headers.get('last-event-id');
+    if (lastEventId) {
+      headers['Last-Event-ID'] = lastEventId;
+    }
+
+    // Closing the client connection also closes the backend stream
+    const response = await fetch(`${API_BASE_URL}/events?${searchParams.toString()}`, {
+      method: 'GET',
+      headers,
+      signal: request.signal,
+      cache: 'no-store',
+    });
+
+    if (response.ok && response.body) {
+      // Pass the event stream through without buffering it
+      return new Response(response.body, {
+        status: 200,
+        headers: {
+          'Content-Type': 'text/event-stream',
+          'Cache-Control': 'no-cache, no-transform',
+          'Connection': 'keep-alive',
+          'X-Accel-Buffering': 'no',
+        },
+      });
+    } else {
+      const data = await response.json();
+      return NextResponse.json(
+        { error: data.detail || 'Failed to open change feed' },
+        { status: response.status }
+      );
+    }
+  } catch (error: any) {
+    console.error('Error opening change feed:', error);
+    return NextResponse.json(
+      { error: error.message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,101 @@
+import { NextResponse } from 'next/server';
+import { API_BASE_URL } from '@/lib/config';
+
+// GET /api/master-data?fiscalYear=xxx - Get all dropdown options and location relationships in one call
+export async function GET(request: Request) {
+  try {
+    const { searchParams } = new URL(request.url);
+    const fiscalYear = searchParams.get('fiscalYear') || 'FY_25'; // Default to FY_25
+
+    // Forward the client's ETag so unchanged master data costs a 304
+    const headers: Record<string, string> = {
+      'Content-Type': 'application/json',
+    };
+    const ifNoneMatch = request.headers.get('if-none-match');
+    if (ifNoneMatch) {
+      headers['If-None-Match'] = ifNoneMatch;
+    }
+
+    // Call FastAPI backend to get the master data snapshot
+    const response = await fetch(`${API_BASE_URL}/master-data?fiscalYear=${encodeURIComponent(fiscalYear)}`, {
+      method: 'GET',
+      headers,
+      cache: 'no-store',
+    });
+
+    const etag = response.headers.get('etag');
+    const responseHeaders: Record<string, string> = { 'Cache-Control': 'no-cache' };
+    if (etag) {
+      responseHeaders['ETag'] = etag;
+    }
+
+    if (response.status === 304) {
+      return new Response(null, { status: 304, headers: responseHeaders });
+    }
+
+    const data = await response.json();
+
+    if (response.ok) {
+      return NextResponse.json(data, { status: 200, headers: responseHeaders });
+    } else {
+      return NextResponse.json(
+        { error: data.detail || 'Failed to get master data' },
+        { status: response.status }
+      );
+    }
+  } catch (error: any) {
+    console.error('Error getting master data:', error);
+    return NextResponse.json(
+      { error: error.message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
+
+// POST /api/master-data - Save changed dropdown options and location relationships in one call
+export async function POST(request: Request) {
+  try {
+    const { fiscalYear, options, relationships } = await request.json();
+
+    // Validate input
+    if (options !== undefined && (typeof options !== 'object' || Array.isArray(options))) {
+      return NextResponse.json(
+        { error: 'Options must be an object of option lists' },
+        { status: 400 }
+      );
+    }
+
+    if (relationships !== undefined && relationships !== null && !Array.isArray(relationships)) {
+      return NextResponse.json(
+        { error: 'Relationships must be an array' },
+        { status: 400 }
+      );
+    }
+
+    // Call FastAPI backend to apply all changes in one transaction
+    const response = await fetch(`${API_BASE_URL}/master-data`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ fiscalYear: fiscalYear || 'FY_25', options: options || {}, relationships }),
+    });
+
+    const data = await response.json();
+
+    if (response.ok) {
+      return NextResponse.json(data, { status: 200 });
+    } else {
+      return NextResponse.json(
+        { error: data.detail || 'Failed to save master data' },
+        { status: response.status }
+      );
+    }
+  } catch (error: any) {
+    console.error('Error saving master data:', error);
+    return NextResponse.json(
+      { error: error.message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
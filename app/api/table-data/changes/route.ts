@@ -0,0 +1,48 @@
+import { NextResponse } from 'next/server';
+import { API_BASE_URL } from '@/lib/config';
+
+// GET /api/table-data/changes?fiscalYear=xxx&since=N - Rows changed since version N
+// Returns inserted/updated/deleted rows, or the full sheet with full: true when the history is too short
+export async function GET(request: Request) {
+  try {
+    const { searchParams } = new URL(request.url);
+
+    if (!searchParams.get('fiscalYear') || !searchParams.get('since')) {
+      return NextResponse.json(
+        { error: 'fiscalYear and since are required' },
+        { status: 400 }
+      );
+    }
+
+    // Call FastAPI backend with the same query string
+    const response = await fetch(`${API_BASE_URL}/table-data/changes?${searchParams.toString()}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      cache: 'no-store',
+    });
+
+    const data = await response.json();
+
+    if (response.ok) {
+      const headers: Record<string, string> = {};
+      const etag = response.headers.get('etag');
+      if (etag) {
+        headers['ETag'] = etag;
+      }
+      return NextResponse.json(data, { status: 200, headers });
+    } else {
+      return NextResponse.json(
+        { error: data.detail || 'Failed to fetch table data changes' },
+        { status: response.status }
+      );
+    }
+  } catch (error: any) {
+    console.error('Error fetching table data changes:', error);
+    return NextResponse.json(
+      { error: error.message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,41 @@
+import { NextResponse } from 'next/server';
+import { API_BASE_URL } from '@/lib/config';
+
+// GET /api/table-data/compare?fiscalYear=FY_23,FY_24&groupBy=group,type - Compare totals across fiscal years
+export async function GET(request: Request) {
+  try {
+    const { searchParams } = new URL(request.url);
+
+    if (!searchParams.get('fiscalYear')) {
+      return NextResponse.json(
+        { error: 'fiscalYear is required' },
+        { status: 400 }
+      );
+    }
+
+    // Call FastAPI backend with the same query string
+    const response = await fetch(`${API_BASE_URL}/table-data/compare?${searchParams.toString()}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+    });
+
+    const data = await response.json();
+
+    if (response.ok) {
+      return NextResponse.json(data, { status: 200 });
+    } else {
+      return NextResponse.json(
+        { error: data.detail || 'Failed to compare table data' },
+        { status: response.status }
+      );
+    }
+  } catch (error: any) {
+    console.error('Error comparing table data:', error);
+    return NextResponse.json(
+      { error: error.message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,46 @@
+import { NextResponse } from 'next/server';
+import { API_BASE_URL } from '@/lib/config';
+
+// GET /api/table-data/export?fiscalYear=xxx&format=arrow|parquet|csv|xlsx - Export fiscal year data as a file
+// Optional filters: group, ppaMerchant, type, locationCode, location, connectivity
+export async function GET(request: Request) {
+  try {
+    const { searchParams } = new URL(request.url);
+
+    if (!searchParams.get('fiscalYear')) {
+      return NextResponse.json(
+        { error: 'fiscalYear is required' },
+        { status: 400 }
+      );
+    }
+
+    // Call FastAPI backend with the same query string
+    const response = await fetch(`${API_BASE_URL}/table-data/export?${searchParams.toString()}`, {
+      method: 'GET',
+    });
+
+    if (response.ok) {
+      // Pass the file body through without buffering it
+      const headers = new Headers();
+      for (const name of ['content-type', 'content-disposition', 'content-length']) {
+        const value = response.headers.get(name);
+        if (value) {
+          headers.set(name, value);
+        }
+      }
+      return new Response(response.body, { status: 200, headers });
+    } else {
+      const data = await response.json();
+      return NextResponse.json(
+        { error: data.detail || 'Failed to export table data' },
+        { status: response.status }
+      );
+    }
+  } catch (error: any) {
+    console.error('Error exporting table data:', error);
+    return NextResponse.json(
+      { error: error.message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
@@ -60,10 +60,14 @@ function validateTableRow(row: any): string | null {
 }
 
 // GET /api/table-data?fiscalYear=xxx - Get table data for a specific fiscal year
+// GET /api/table-data?fiscalYear=xxx&format=compact - Get column-wise encoded table data
+// GET /api/table-data?fiscalYear=xxx&asOf=2025-03-31 - Get the version that was current at a date or ISO timestamp
 export async function GET(request: Request) {
   try {
     const { searchParams } = new URL(request.url);
     const fiscalYear = searchParams.get('fiscalYear');
+    const format = searchParams.get('format');
+    const asOf = searchParams.get('asOf');
     
     if (!fiscalYear) {
       return NextResponse.json(
@@ -73,7 +77,15 @@ export async function GET(request: Request) {
     }
     
     // Call FastAPI backend to get table data
-    const response = await fetch(`${API_BASE_URL}/table-data?fiscalYear=${encodeURIComponent(fiscalYear)}`, {
+    let queryString = `fiscalYear=${encodeURIComponent(fiscalYear)}`;
+    if (format) {
+      queryString += `&format=${encodeURIComponent(format)}`;
+    }
+    if (asOf) {
+      queryString += `&asOf=${encodeURIComponent(asOf)}`;
+    }
+
+    const response = await fetch(`${API_BASE_URL}/table-data?${queryString}`, {
       method: 'GET',
       headers: {
         'Content-Type': 'application/json',
@@ -83,7 +95,9 @@ export async function GET(request: Request) {
     const data = await response.json();
 
     if (response.ok) {
-      return NextResponse.json(data, { status: 200 });
+      // The ETag carries the version to send back as If-Match when saving
+      const etag = response.headers.get('etag');
+      return NextResponse.json(data, { status: 200, headers: etag ? { ETag: etag } : undefined });
     } else {
       return NextResponse.json(
         { error: data.detail || 'Failed to get table data' },
@@ -102,7 +116,7 @@ export async function GET(request: Request) {
 // POST /api/table-data - Save table data for a specific fiscal year
 export async function POST(request: Request) {
   try {
-    const { fiscalYear, data } = await request.json();
+    const { fiscalYear, data, expectedVersion } = await request.json();
     
     if (!fiscalYear) {
       return NextResponse.json(
@@ -131,19 +145,32 @@ export async function POST(request: Request) {
       }
     }
     
+    // Forward the version check (If-Match header or expectedVersion)
+    const headers: Record<string, string> = {
+      'Content-Type': 'application/json',
+    };
+    const ifMatch = request.headers.get('if-match');
+    if (ifMatch) {
+      headers['If-Match'] = ifMatch;
+    }
+
     // Call FastAPI backend to save table data
     const response = await fetch(`${API_BASE_URL}/table-data`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({ fiscalYear, data }),
+      headers,
+      body: JSON.stringify({ fiscalYear, data, expectedVersion }),
     });
 
     const responseData = await response.json();
 
     if (response.ok) {
       return NextResponse.json(responseData, { status: 200 });
+    } else if (response.status === 409) {
+      // Pass the row-level conflict description through so the client can rebase
+      return NextResponse.json(
+        { error: 'Table data was modified by another request', conflict: responseData.detail },
+        { status: 409 }
+      );
     } else {
       return NextResponse.json(
         { error: responseData.detail || 'Failed to save table data' },
@@ -172,18 +199,34 @@ export async function DELETE(request: Request) {
       );
     }
     
+    let queryString = `fiscalYear=${encodeURIComponent(fiscalYear)}`;
+    const expectedVersion = searchParams.get('expectedVersion');
+    if (expectedVersion) {
+      queryString += `&expectedVersion=${encodeURIComponent(expectedVersion)}`;
+    }
+    const headers: Record<string, string> = {
+      'Content-Type': 'application/json',
+    };
+    const ifMatch = request.headers.get('if-match');
+    if (ifMatch) {
+      headers['If-Match'] = ifMatch;
+    }
+
     // Call FastAPI backend to delete table data
-    const response = await fetch(`${API_BASE_URL}/table-data?fiscalYear=${encodeURIComponent(fiscalYear)}`, {
+    const response = await fetch(`${API_BASE_URL}/table-data?${queryString}`, {
       method: 'DELETE',
-      headers: {
-        'Content-Type': 'application/json',
-      },
+      headers,
     });
 
     const data = await response.json();
 
     if (response.ok) {
       return NextResponse.json(data, { status: 200 });
+    } else if (response.status === 409) {
+      return NextResponse.json(
+        { error: 'Table data was modified by another request', conflict: data.detail },
+        { status: 409 }
+      );
     } else {
       return NextResponse.json(
         { error: data.detail || 'Failed to delete table data' },
@@ -0,0 +1,69 @@
+import { NextResponse } from 'next/server';
+import { API_BASE_URL } from '@/lib/config';
+
+// GET /api/variables/bulk?keys=a,b&prefix=xxx - Get several variables in one request
+export async function GET(request: Request) {
+  try {
+    // Forward the query string as-is (keys may be repeated)
+    const { searchParams } = new URL(request.url);
+    const queryString = searchParams.toString();
+
+    // Call FastAPI backend
+    const response = await fetch(`${API_BASE_URL}/variables/bulk${queryString ? `?${queryString}` : ''}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+    });
+
+    const data = await response.json();
+
+    if (response.ok) {
+      return NextResponse.json(data, { status: 200 });
+    } else {
+      return NextResponse.json(
+        { error: data.detail || 'Failed to get variables' },
+        { status: response.status }
+      );
+    }
+  } catch (error: any) {
+    console.error('Error getting variables:', error);
+    return NextResponse.json(
+      { error: error.message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
+
+// POST /api/variables/bulk - Set several variables in one transaction
+export async function POST(request: Request) {
+  try {
+    const body = await request.json();
+
+    // Call FastAPI backend
+    const response = await fetch(`${API_BASE_URL}/variables/bulk`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify(body),
+    });
+
+    const data = await response.json();
+
+    if (response.ok) {
+      return NextResponse.json(data, { status: 200 });
+    } else {
+      return NextResponse.json(
+        { error: data.detail || 'Failed to set variables' },
+        { status: response.status }
+      );
+    }
+  } catch (error: any) {
+    console.error('Error setting variables:', error);
+    return NextResponse.json(
+      { error: error.message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
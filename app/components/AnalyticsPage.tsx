@@ -1,9 +1,11 @@
 "use client";
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useAuth } from '@/lib/hooks/useAuth';
+import { useChangeFeed, ChangeEvent } from '@/lib/hooks/useChangeFeed';
 import { useRouter } from 'next/navigation';
 import { API_BASE_URL } from '@/lib/config';
+import { decodeCompactTable, isCompactTableData } from '@/lib/compact-table';
 import {
   Chart as ChartJS,
   CategoryScale,
@@ -16,7 +18,6 @@ import {
 } from 'chart.js';
 import { Bar, Pie } from 'react-chartjs-2';
 import SearchableDropdown from './SearchableDropdown';
-import * as XLSX from 'xlsx'; // Add this import for Excel export
 
 // Register Chart.js components
 ChartJS.register(
@@ -59,6 +60,9 @@ export default function AnalyticsPage() {
   const router = useRouter();
   const [tableData, setTableData] = useState<TableRow[]>([]); // State to hold data from API
   const [dataLoaded, setDataLoaded] = useState(false); // Add this to track if data has been loaded from database
+  const tableVersionRef = useRef(0); // Version of the sheet held in tableData
+  const fiscalYearRef = useRef(fiscalYear);
+  fiscalYearRef.current = fiscalYear;
   const [newRow, setNewRow] = useState<Omit<TableRow, 'id' | 'sno'>>({
     capacity: null,
     group: '',
@@ -162,59 +166,28 @@ export default function AnalyticsPage() {
   useEffect(() => {
     const loadMasterData = async () => {
       try {
-        // Load dropdown options separately for each type (without fiscalYear)
-        const groupsResponse = await fetch(`/api/groups`);
-        if (groupsResponse.ok) {
-          const groupsData = await groupsResponse.json();
-          if (Array.isArray(groupsData.groups)) {
-            setGroups(groupsData.groups);
+        // Load all dropdown options and location relationships in one request
+        const masterDataResponse = await fetch(`/api/master-data`);
+        if (masterDataResponse.ok) {
+          const { options, relationships } = await masterDataResponse.json();
+          if (Array.isArray(options?.groups)) {
+            setGroups(options.groups);
           }
-        }
-
-        const ppaMerchantsResponse = await fetch(`/api/ppa-merchants`);
-        if (ppaMerchantsResponse.ok) {
-          const ppaMerchantsData = await ppaMerchantsResponse.json();
-          if (Array.isArray(ppaMerchantsData.ppaMerchants)) {
-            setPpaMerchants(ppaMerchantsData.ppaMerchants);
+          if (Array.isArray(options?.ppaMerchants)) {
+            setPpaMerchants(options.ppaMerchants);
           }
-        }
-
-        const typesResponse = await fetch(`/api/types`);
-        if (typesResponse.ok) {
-          const typesData = await typesResponse.json();
-          if (Array.isArray(typesData.types)) {
-            setTypes(typesData.types);
+          if (Array.isArray(options?.types)) {
+            setTypes(options.types);
           }
-        }
-
-        const locationCodesResponse = await fetch(`/api/location-codes`);
-        if (locationCodesResponse.ok) {
-          const locationCodesData = await locationCodesResponse.json();
-          if (Array.isArray(locationCodesData.locationCodes)) {
-            setLocationCodes(locationCodesData.locationCodes);
+          if (Array.isArray(options?.locationCodes)) {
+            setLocationCodes(options.locationCodes);
           }
-        }
-
-        const locationsResponse = await fetch(`/api/locations`);
-        if (locationsResponse.ok) {
-          const locationsData = await locationsResponse.json();
-          if (Array.isArray(locationsData.locations)) {
-            setLocations(locationsData.locations);
+          if (Array.isArray(options?.locations)) {
+            setLocations(options.locations);
           }
-        }
-
-        const connectivitiesResponse = await fetch(`/api/connectivities`);
-        if (connectivitiesResponse.ok) {
-          const connectivitiesData = await connectivitiesResponse.json();
-          if (Array.isArray(connectivitiesData.connectivities)) {
-            setConnectivities(connectivitiesData.connectivities);
+          if (Array.isArray(options?.connectivities)) {
+            setConnectivities(options.connectivities);
           }
-        }
-
-        // Load location relationships (without fiscalYear)
-        const relResponse = await fetch(`/api/location-relationships`);
-        if (relResponse.ok) {
-          const relationships = await relResponse.json();
           if (Array.isArray(relationships)) {
             setLocationRelationships(relationships);
           }
@@ -234,11 +207,22 @@ export default function AnalyticsPage() {
   useEffect(() => {
     const saveMasterData = async () => {
       try {
-        // Save dropdown options
-        await saveDropdownOptions();
-        
-        // Save location relationships
-        await saveLocationRelationships();
+        // Save dropdown options and location relationships in one transaction;
+        // the backend only writes the lists that actually changed
+        const response = await fetch(`/api/master-data`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify({
+            options: { groups, ppaMerchants, types, locationCodes, locations, connectivities },
+            relationships: locationRelationships,
+          }),
+        });
+
+        if (!response.ok) {
+          console.error('Failed to save master data:', response.status, response.statusText);
+        }
       } catch (error: any) {
         console.error('Error saving master data:', error.message || error);
       }
@@ -255,109 +239,6 @@ export default function AnalyticsPage() {
     setIsInitialLoad(false);
   }, []);
 
-  // Function to save all dropdown options to API
-  const saveDropdownOptions = async () => {
-    try {
-      // Save dropdown options separately for each type (without fiscalYear)
-      const groupsResponse = await fetch(`/api/groups`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(groups),
-      });
-
-      if (!groupsResponse.ok) {
-        console.error('Failed to save groups:', groupsResponse.status, groupsResponse.statusText);
-      }
-
-      const ppaMerchantsResponse = await fetch(`/api/ppa-merchants`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(ppaMerchants),
-      });
-
-      if (!ppaMerchantsResponse.ok) {
-        console.error('Failed to save ppa merchants:', ppaMerchantsResponse.status, ppaMerchantsResponse.statusText);
-      }
-
-      const typesResponse = await fetch(`/api/types`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(types),
-      });
-
-      if (!typesResponse.ok) {
-        console.error('Failed to save types:', typesResponse.status, typesResponse.statusText);
-      }
-
-      const locationCodesResponse = await fetch(`/api/location-codes`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(locationCodes),
-      });
-
-      if (!locationCodesResponse.ok) {
-        console.error('Failed to save location codes:', locationCodesResponse.status, locationCodesResponse.statusText);
-      }
-
-      const locationsResponse = await fetch(`/api/locations`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(locations),
-      });
-
-      if (!locationsResponse.ok) {
-        console.error('Failed to save locations:', locationsResponse.status, locationsResponse.statusText);
-      }
-
-      const connectivitiesResponse = await fetch(`/api/connectivities`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(connectivities),
-      });
-
-      if (!connectivitiesResponse.ok) {
-        console.error('Failed to save connectivities:', connectivitiesResponse.status, connectivitiesResponse.statusText);
-      }
-    } catch (error: any) {
-      console.error('Error saving dropdown options:', error.message || error);
-      throw error;
-    }
-  };
-
-  // Function to save location relationships to API
-  const saveLocationRelationships = async () => {
-    try {
-      const response = await fetch(`/api/location-relationships`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(locationRelationships)
-      });
-      
-      if (!response.ok) {
-        const errorText = await response.text();
-        console.error('Failed to save location relationships:', response.status, response.statusText, errorText);
-        // Also log the data being sent for debugging
-        console.error('Data being sent:', locationRelationships);
-      }
-    } catch (error: any) {
-      console.error('Error saving location relationships:', error.message || error);
-    }
-  };
-
   // Function to handle filter changes
   const handleFilterChange = (filterName: string, value: string) => {
     setFilters(prev => ({
@@ -569,16 +450,17 @@ export default function AnalyticsPage() {
         if (!response.ok) {
           console.error('Failed to save data to database:', response.status, response.statusText);
           alert('Failed to delete row from database');
-          // Revert the change in UI if database update failed
-          const originalData = await fetch(`/api/table-data?fiscalYear=${fiscalYear}`).then(res => res.json());
-          setTableData(originalData.data);
+          // Revert the change in UI if database update failed; changes made
+          // elsewhere meanwhile arrive through the change feed
+          setTableData(tableData);
+        } else {
+          noteSavedVersion((await response.json()).version);
         }
       } catch (error) {
         console.error('Error saving table data to database:', error);
         alert('Error deleting row from database');
         // Revert the change in UI if database update failed
-        const originalData = await fetch(`/api/table-data?fiscalYear=${fiscalYear}`).then(res => res.json());
-        setTableData(originalData.data);
+        setTableData(tableData);
       }
     } else {
       console.log(`Skipping database save for ${ fiscalYear } - data not yet loaded from database`);
@@ -629,6 +511,8 @@ export default function AnalyticsPage() {
     if (!response.ok) {
       console.error('Failed to save data to database:', response.status, response.statusText);
       alert('Failed to save changes to database');
+    } else {
+      noteSavedVersion((await response.json()).version);
     }
   } catch (error) {
     console.error('Error saving table data to database:', error);
@@ -741,30 +625,85 @@ useEffect(() => {
   }
 }, []);
 
-// Fetch table data from API when fiscal year changes
-useEffect(() => {
-  const fetchTableData = async () => {
-    try {
-      const response = await fetch(`/api/table-data?fiscalYear=${fiscalYear}`);
-      if (response.ok) {
-        const result = await response.json();
-        setTableData(result.data || []);
-      } else {
-        console.error('Failed to fetch table data:', response.status, response.statusText);
-        setTableData([]);
-      }
-    } catch (error) {
-      console.error('Error fetching table data:', error);
+// Fetch the full sheet of the selected fiscal year, column-wise to keep the payload small
+const fetchTableData = async () => {
+  try {
+    const response = await fetch(`/api/table-data?fiscalYear=${fiscalYear}&format=compact`);
+    if (response.ok) {
+      const result = await response.json();
+      setTableData(isCompactTableData(result) ? decodeCompactTable<TableRow>(result) : result.data || []);
+      tableVersionRef.current = result.version || 0;
+    } else {
+      console.error('Failed to fetch table data:', response.status, response.statusText);
       setTableData([]);
-    } finally {
-      // Mark data as loaded regardless of success or failure
-      setDataLoaded(true);
+      tableVersionRef.current = 0;
     }
-  };
+  } catch (error) {
+    console.error('Error fetching table data:', error);
+    setTableData([]);
+    tableVersionRef.current = 0;
+  } finally {
+    // Mark data as loaded regardless of success or failure
+    setDataLoaded(true);
+  }
+};
 
+// Fetch table data from API when fiscal year changes
+useEffect(() => {
   fetchTableData();
 }, [fiscalYear]);
 
+// Remember the version a save of ours produced, so its change event is not fetched again
+const noteSavedVersion = (version?: number) => {
+  if (typeof version === 'number' && version > tableVersionRef.current) {
+    tableVersionRef.current = version;
+  }
+};
+
+// Apply the rows changed since the version we hold
+const applyTableChanges = async (year: string, since: number) => {
+  try {
+    const response = await fetch(`/api/table-data/changes?fiscalYear=${year}&since=${since}`);
+    if (!response.ok) {
+      console.error('Failed to fetch table data changes:', response.status, response.statusText);
+      return;
+    }
+    const changes = await response.json();
+    // Skip answers for another year or already overtaken; a deleted sheet comes back as version 0
+    if (year !== fiscalYearRef.current) return;
+    if (changes.version <= tableVersionRef.current && !(changes.full && changes.version === 0)) return;
+    tableVersionRef.current = changes.version;
+
+    if (changes.full) {
+      setTableData(changes.data || []);
+      return;
+    }
+    // Upsert by id, so rows this page already saved are not duplicated
+    const deletedIds = new Set<number>(changes.deleted);
+    setTableData(rows => {
+      const rowsById = new Map<number, TableRow>();
+      rows.forEach(row => {
+        if (!deletedIds.has(row.id)) rowsById.set(row.id, row);
+      });
+      [...changes.updated, ...changes.inserted].forEach((row: TableRow) => rowsById.set(row.id, row));
+      return Array.from(rowsById.values());
+    });
+  } catch (error) {
+    console.error('Error applying table data changes:', error);
+  }
+};
+
+// Keep the sheet current with saves made elsewhere, instead of refetching it
+useChangeFeed(
+  (event: ChangeEvent) => {
+    if (event.resource === 'tableData' && event.fiscalYear === fiscalYear && event.version > tableVersionRef.current) {
+      applyTableChanges(fiscalYear, tableVersionRef.current);
+    }
+  },
+  // Events were missed: start over from the full sheet
+  () => fetchTableData()
+);
+
 // Handle adding a new row
 const handleAddRow = async () => {
   // Check if user is authenticated
@@ -839,6 +778,7 @@ const handleAddRow = async () => {
         } else {
           const result = await response.json();
           console.log('Data saved successfully to database:', result);
+          noteSavedVersion(result.version);
         }
       } catch (error: any) {
         console.error('Error saving table data to database:', error);
@@ -1032,53 +972,16 @@ const handleAddRow = async () => {
 
   const sums = calculateSums();
 
-  // Handle export to Excel
+  // Handle export to Excel - the backend streams the workbook with the same
+  // filters, column order and totals row as the table
   const handleExportToExcel = () => {
-    // Create the data array with headers
-    const dataWithTotals = [
-      ['S.No', 'Capacity', 'Group', 'PPA/Merchant', 'Type', 'Solar', 'Wind', 'SPV', 'Location Code', 'Location', 'PSS', 'Connectivity'],
-      ...tableData.map(row => [
-        row.sno,
-        row.capacity,
-        row.group,
-        row.ppaMerchant,
-        row.type,
-        row.solar,
-        row.wind,
-        row.spv,
-        row.locationCode,
-        row.location,
-        row.pss,
-        row.connectivity
-      ]),
-      [], // Empty row
-      ['TOTAL', sums.capacity.toFixed(2), '', '', '', sums.solar.toFixed(2), sums.wind.toFixed(2), '', '', '', '', '']
-    ];
-    
-    // Create the data worksheet with totals
-    const dataWorksheet = XLSX.utils.aoa_to_sheet(dataWithTotals);
-    
-    // Create summary data
-    const summaryData = [
-      ['SUMMARY REPORT'],
-      [''],
-      ['Metric', 'Value'],
-      ['Total Capacity', sums.capacity.toFixed(2)],
-      ['Total Solar', sums.solar.toFixed(2)],
-      ['Total Wind', sums.wind.toFixed(2)],
-      ['Total Projects', tableData.length]
-    ];
-    
-    // Create summary worksheet
-    const summaryWorksheet = XLSX.utils.aoa_to_sheet(summaryData);
-    
-    // Create workbook and add both worksheets
-    const workbook = XLSX.utils.book_new();
-    XLSX.utils.book_append_sheet(workbook, dataWorksheet, 'Table Data');
-    XLSX.utils.book_append_sheet(workbook, summaryWorksheet, 'Summary');
-    
-    // Export the workbook
-    XLSX.writeFile(workbook, `table - data - ${ fiscalYear }.xlsx`);
+    const params = new URLSearchParams({ fiscalYear, format: 'xlsx' });
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value) {
+        params.set(key, value);
+      }
+    });
+    window.location.href = `/api/table-data/export?${params.toString()}`;
   };
 
   return (
@@ -1549,11 +1452,9 @@ const handleAddRow = async () => {
                       // For new locations, set location code to the same value by default
                       saveDropdownOption('locations', value);
                       setNewRow({...newRow, location: value, locationCode: value});
-                      // Also add to location relationships
+                      // Also add to location relationships; the master data effect saves them
                       const newRelationship = { location: value, locationCode: value };
                       setLocationRelationships(prev => [...prev, newRelationship]);
-                      // Save location relationships to API
-                      saveLocationRelationships();
                     }}
                     placeholder="Select or type location..."
                   />
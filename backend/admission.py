@@ -0,0 +1,162 @@
+from typing import Optional
+from collections import deque
+import asyncio
+import os
+import time
+import metrics
+
+# Admission control. Sync handlers share Starlette's threadpool (40 threads),
+# so each class of route gets its own concurrency limit and a bounded wait
+# queue; requests beyond both, or waiting longer than the queue timeout, get
+# 503 with Retry-After. The limits add up to less than the pool, leaving
+# threads for the exempt routes (/health, /metrics) under any load.
+ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', '1') != '0'
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_SECONDS', '5'))
+
+READ = 'read'
+WRITE = 'write'
+HEAVY = 'heavy'
+
+# Routes that never wait: probes, metrics, and the feed stream (async, long-lived)
+EXEMPT_PATHS = ('/health', '/metrics', '/events')
+# Admin and bulk operations, on their own lane so they cannot crowd out the rest
+HEAVY_ROUTES = (
+    (None, '/import-data'),
+    (None, '/import-default-data'),
+    (None, '/import-data-from-frontend'),
+    ('GET', '/backup-data'),
+    ('GET', '/backup-data/diff'),
+    ('GET', '/table-data/export'),
+    (None, '/admin/'),
+)
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def _setting(lane: str, name: str, default: int) -> int:
+    return int(os.environ.get(f'ADMISSION_{lane.upper()}_{name}', default))
+
+
+class Lane:
+    """
+    A concurrency limit with a FIFO wait queue, used from the event loop only.
+    A finishing request hands its slot straight to the oldest waiter.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, retry_after: int):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self.active = 0
+        self._waiters: deque = deque()
+        self._active_gauge = metrics.gauge(f'admission.{name}.active')
+        self._queued_gauge = metrics.gauge(f'admission.{name}.queued')
+        self._admitted = metrics.counter(f'admission.{name}.admitted')
+        self._shed = metrics.counter(f'admission.{name}.shed')
+        self._wait = metrics.histogram(f'admission.{name}.wait_ms')
+
+    async def acquire(self) -> bool:
+        """Takes a slot, waiting in the queue if need be. False means the request is shed."""
+        if self.active < self.limit and not self._waiters:
+            self._take()
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self._shed.inc()
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._queued_gauge.inc()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), ADMISSION_QUEUE_TIMEOUT_SECONDS)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot arrived as the wait ended: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                self._queued_gauge.dec()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._shed.inc()
+            return False
+        self._wait.observe((time.perf_counter() - started) * 1000)
+        return True
+
+    def _take(self) -> None:
+        self.active += 1
+        self._active_gauge.inc()
+        self._admitted.inc()
+
+    def release(self) -> None:
+        self.active -= 1
+        self._active_gauge.dec()
+        if self._waiters and self.active < self.limit:
+            waiter = self._waiters.popleft()
+            self._queued_gauge.dec()
+            self._take()
+            waiter.set_result(None)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+
+LANES = {
+    READ: Lane(READ, _setting(READ, 'LIMIT', 16), _setting(READ, 'QUEUE', 64), _setting(READ, 'RETRY_AFTER', 1)),
+    WRITE: Lane(WRITE, _setting(WRITE, 'LIMIT', 8), _setting(WRITE, 'QUEUE', 32), _setting(WRITE, 'RETRY_AFTER', 1)),
+    HEAVY: Lane(HEAVY, _setting(HEAVY, 'LIMIT', 2), _setting(HEAVY, 'QUEUE', 4), _setting(HEAVY, 'RETRY_AFTER', 5)),
+}
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """The lane of a request, or None when it is admitted unconditionally."""
+    if path.startswith('/api/'):
+        path = path[4:]
+    if method == 'OPTIONS' or path.startswith(EXEMPT_PATHS):
+        return None
+    for route_method, prefix in HEAVY_ROUTES:
+        matches = path.startswith(prefix) if prefix.endswith('/') else path == prefix
+        if matches and route_method in (None, method):
+            return HEAVY
+    return READ if method in SAFE_METHODS else WRITE
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that admits each request through the lane of its route class."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        lane = LANES.get(classify(scope['method'], scope['path'])) if scope['type'] == 'http' and ADMISSION_CONTROL else None
+        if lane is None:
+            return await self.app(scope, receive, send)
+        if not await lane.acquire():
+            return await self._shed(lane, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release()
+
+    async def _shed(self, lane: Lane, send):
+        body = b'{"detail":"Server busy, retry later"}'
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'retry-after', str(lane.retry_after).encode()),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def snapshot():
+    return {
+        name: {'active': lane.active, 'limit': lane.limit, 'queued': lane.queued, 'queueSize': lane.queue_size}
+        for name, lane in LANES.items()
+    }
@@ -0,0 +1,132 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import threading
+from table_codec import CATEGORICAL_COLUMNS
+
+# Dimensions a comparison can be grouped by
+GROUP_BY_COLUMNS = CATEGORICAL_COLUMNS
+
+MEASURES = ['capacity', 'solar', 'wind']
+
+
+class AggregateCache:
+    """
+    Small thread-safe LRU of per-year aggregates keyed by
+    (fiscal_year, version, blob_hash, group_by). A new version never reuses an
+    old entry, so saves need no explicit invalidation; the content hash keeps
+    an entry from outliving the content it was computed from under the same
+    version number.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple, value: Dict) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+aggregate_cache = AggregateCache()
+
+
+def fetch_active_versions(cursor, fiscal_years: List[str]) -> Dict[str, Tuple[int, str]]:
+    """Returns {fiscal_year: (version, blob_hash)} for the active record of each requested year."""
+    placeholders = ', '.join('?' for _ in fiscal_years)
+    cursor.execute(f'''
+        SELECT fiscal_year, version, blob_hash FROM table_data
+        WHERE fiscal_year IN ({placeholders}) AND is_deleted = 0
+    ''', list(fiscal_years))
+    return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+
+def fetch_year_aggregates(cursor, fiscal_years: List[str], group_by: List[str]) -> Dict[Tuple[str, int, str], Dict]:
+    """
+    Aggregates all given years in one query and one pass inside SQLite.
+    Returns {(fiscal_year, version, blob_hash): {group_key: [capacity, solar, wind, count]}}.
+    """
+    placeholders = ', '.join('?' for _ in fiscal_years)
+    key_sql = ''.join(f", json_extract(j.value, '$.{column}')" for column in group_by)
+    group_positions = ', '.join(str(position) for position in range(1, len(group_by) + 4))
+    cursor.execute(f'''
+        SELECT t.fiscal_year, t.version, t.blob_hash{key_sql},
+               TOTAL(json_extract(j.value, '$.capacity')),
+               TOTAL(json_extract(j.value, '$.solar')),
+               TOTAL(json_extract(j.value, '$.wind')),
+               COUNT(*)
+        FROM table_data_content t, json_each(t.data) j
+        WHERE t.fiscal_year IN ({placeholders}) AND t.is_deleted = 0
+        GROUP BY {group_positions}
+    ''', list(fiscal_years))
+
+    aggregates: Dict[Tuple[str, int, str], Dict] = {}
+    key_end = 3 + len(group_by)
+    for row in cursor.fetchall():
+        year_aggregates = aggregates.setdefault((row[0], row[1], row[2]), {})
+        year_aggregates[tuple(row[3:key_end])] = list(row[key_end:])
+    return aggregates
+
+
+def _measures(values: Optional[List[float]]) -> Dict[str, float]:
+    if values is None:
+        return {'capacity': 0.0, 'solar': 0.0, 'wind': 0.0, 'count': 0}
+    return {'capacity': values[0], 'solar': values[1], 'wind': values[2], 'count': values[3]}
+
+
+def _deltas(fiscal_years: List[str], totals: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    # Year-over-year change between consecutive requested years
+    deltas = {}
+    for previous, current in zip(fiscal_years, fiscal_years[1:]):
+        deltas[current] = {
+            measure: totals[current][measure] - totals[previous][measure]
+            for measure in MEASURES + ['count']
+        }
+    return deltas
+
+
+def build_comparison(fiscal_years: List[str], group_by: List[str], per_year: Dict[str, Dict]) -> Dict[str, Any]:
+    """Aligns the per-year aggregates by group and adds year-over-year deltas."""
+    keys = set()
+    for year_aggregates in per_year.values():
+        keys.update(year_aggregates)
+
+    groups = []
+    for key in sorted(keys, key=lambda k: tuple('' if v is None else str(v) for v in k)):
+        totals = {year: _measures(per_year[year].get(key)) for year in fiscal_years}
+        groups.append({
+            'key': dict(zip(group_by, key)),
+            'totals': totals,
+            'deltas': _deltas(fiscal_years, totals),
+        })
+
+    overall = {}
+    for year in fiscal_years:
+        year_total = [0.0, 0.0, 0.0, 0]
+        for values in per_year[year].values():
+            for i in range(4):
+                year_total[i] += values[i]
+        overall[year] = _measures(year_total)
+
+    return {
+        'fiscalYears': fiscal_years,
+        'groupBy': group_by,
+        'groups': groups,
+        'totals': overall,
+        'deltas': _deltas(fiscal_years, overall),
+    }
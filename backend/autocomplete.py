@@ -0,0 +1,169 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from collections import Counter
+import bisect
+import heapq
+import re
+import threading
+import generations
+
+# Row fields offered for autocomplete
+AUTOCOMPLETE_FIELDS = ['spv', 'pss', 'location', 'locationCode']
+
+_TOKEN_SPLIT = re.compile(r'[^0-9a-z]+')
+
+
+def _search_keys(value: str) -> Set[str]:
+    # The whole value and each word in it, so "04" finds "PSS-04"
+    lowered = value.lower()
+    keys = {lowered}
+    keys.update(token for token in _TOKEN_SPLIT.split(lowered) if token)
+    return keys
+
+
+class _FieldIndex:
+    """Immutable prefix index over the distinct values of one field."""
+
+    def __init__(self, counts: Counter):
+        self.counts = counts
+        entries = set()
+        for value in counts:
+            for key in _search_keys(value):
+                entries.add((key, value))
+        self.entries: List[Tuple[str, str]] = sorted(entries)
+        # Most frequent first, for empty queries
+        self.by_count = sorted(counts, key=lambda value: (-counts[value], value))
+
+    def search(self, query: str, limit: int) -> List[Dict]:
+        query = query.lower()
+        if not query:
+            values = self.by_count[:limit]
+        else:
+            start = bisect.bisect_left(self.entries, (query, ''))
+            matches = set()
+            for key, value in self.entries[start:]:
+                if not key.startswith(query):
+                    break
+                matches.add(value)
+            values = heapq.nsmallest(limit, matches, key=lambda value: (-self.counts[value], value))
+        return [{'value': value, 'count': self.counts[value]} for value in values]
+
+
+class AutocompleteIndex:
+    """
+    Distinct values of the autocomplete fields per fiscal year, with prefix
+    indexes per year and across all years. Years are loaded lazily from the
+    database and refreshed on every committed table data write. Writes made by
+    other workers show up as a new TABLE_DATA generation, after which years
+    whose active version changed are reloaded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._year_counts: Dict[str, Dict[str, Counter]] = {}
+        self._year_indexes: Dict[str, Dict[str, _FieldIndex]] = {}
+        self._all_indexes: Dict[str, _FieldIndex] = {}
+        self._versions: Dict[str, int] = {}
+        self._stale: Set[str] = set()
+        self._loaded = False
+        self._generation = None
+
+    @staticmethod
+    def _count_rows(rows: Iterable) -> Dict[str, Counter]:
+        counts = {field: Counter() for field in AUTOCOMPLETE_FIELDS}
+        for row in rows:
+            for field in AUTOCOMPLETE_FIELDS:
+                value = row.get(field)
+                if isinstance(value, str) and value:
+                    counts[field][value] += 1
+        return counts
+
+    def _rebuild_all(self) -> None:
+        merged = {field: Counter() for field in AUTOCOMPLETE_FIELDS}
+        for year_counts in self._year_counts.values():
+            for field, counts in year_counts.items():
+                merged[field].update(counts)
+        self._all_indexes = {field: _FieldIndex(counts) for field, counts in merged.items()}
+
+    def _set_year(self, fiscal_year: str, counts: Optional[Dict[str, Counter]], version: Optional[int] = None) -> None:
+        if counts is None:
+            self._year_counts.pop(fiscal_year, None)
+            self._year_indexes.pop(fiscal_year, None)
+            self._versions.pop(fiscal_year, None)
+        else:
+            self._year_counts[fiscal_year] = counts
+            self._versions[fiscal_year] = version
+            self._year_indexes[fiscal_year] = {field: _FieldIndex(c) for field, c in counts.items()}
+
+    def update_year(self, fiscal_year: str, rows: List[Dict], version: int) -> None:
+        """Replaces a year's values with the rows of its new active sheet."""
+        counts = self._count_rows(rows)
+        with self._lock:
+            self._set_year(fiscal_year, counts, version)
+            self._stale.discard(fiscal_year)
+            self._rebuild_all()
+
+    def invalidate(self, fiscal_year: str) -> None:
+        """Marks a year for reloading from the database on the next search."""
+        with self._lock:
+            self._stale.add(fiscal_year)
+
+    def _refresh(self, connect, generation: int) -> None:
+        with self._lock:
+            if self._loaded and not self._stale and self._generation == generation:
+                return
+            conn = connect()
+            try:
+                conn.row_factory = None
+                cursor = conn.cursor()
+                if self._loaded and self._generation != generation:
+                    # Some worker wrote table data: reload the years whose version moved
+                    cursor.execute('SELECT fiscal_year, version FROM table_data WHERE is_deleted = 0')
+                    active = dict(cursor.fetchall())
+                    self._stale.update(year for year, version in active.items() if self._versions.get(year) != version)
+                    self._stale.update(year for year in self._versions if year not in active)
+                self._generation = generation
+                if self._loaded and not self._stale:
+                    return
+
+                years = None if not self._loaded else sorted(self._stale)
+                select_list = ', '.join(f"json_extract(j.value, '$.{field}')" for field in AUTOCOMPLETE_FIELDS)
+                query = f'''
+                    SELECT t.fiscal_year, t.version, {select_list}
+                    FROM table_data_content t, json_each(t.data) j
+                    WHERE t.is_deleted = 0
+                '''
+                params = []
+                if years is not None:
+                    query += f" AND t.fiscal_year IN ({', '.join('?' for _ in years)})"
+                    params = years
+                cursor.execute(query, params)
+                rows_by_year: Dict[str, List[Dict]] = {year: [] for year in (years or [])}
+                versions: Dict[str, int] = {}
+                for row in cursor.fetchall():
+                    versions[row[0]] = row[1]
+                    rows_by_year.setdefault(row[0], []).append(dict(zip(AUTOCOMPLETE_FIELDS, row[2:])))
+            finally:
+                conn.close()
+
+            for year, rows in rows_by_year.items():
+                # A stale year without active rows was deleted
+                self._set_year(year, self._count_rows(rows) if rows else None, versions.get(year))
+            self._stale.clear()
+            self._loaded = True
+            self._rebuild_all()
+
+    def search(self, connect, field: str, query: str, limit: int = 10, fiscal_year: Optional[str] = None) -> List[Dict]:
+        """Top `limit` values of a field matching the query prefix, most frequent first."""
+        generation = generations.current(generations.TABLE_DATA)
+        if not self._loaded or self._stale or generation != self._generation:
+            self._refresh(connect, generation)
+        if fiscal_year is None:
+            index = self._all_indexes.get(field)
+        else:
+            index = self._year_indexes.get(fiscal_year, {}).get(field)
+        if index is None:
+            return []
+        return index.search(query, limit)
+
+
+index = AutocompleteIndex()
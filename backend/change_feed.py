@@ -0,0 +1,81 @@
+from typing import Any, Dict, List, Optional
+import json
+import os
+import generations
+import table_deltas
+
+# Resources named in change notifications
+TABLE_DATA = 'tableData'
+DROPDOWN_OPTIONS = 'dropdownOptions'
+LOCATION_RELATIONSHIPS = 'locationRelationships'
+
+# Events are kept for clients reconnecting with Last-Event-ID; older ones are pruned
+CHANGE_FEED_RETAIN = int(os.environ.get('CHANGE_FEED_RETAIN', '10000'))
+# Above this many changed rows a notification carries rowIds null: refetch the sheet
+CHANGE_FEED_MAX_ROW_IDS = int(os.environ.get('CHANGE_FEED_MAX_ROW_IDS', '1000'))
+
+
+def watermark() -> tuple:
+    """Generations of the resources the feed covers; it moves after every committed event."""
+    return (
+        generations.current(generations.TABLE_DATA),
+        generations.current(generations.DROPDOWN_OPTIONS),
+        generations.current(generations.LOCATION_RELATIONSHIPS),
+    )
+
+
+def changed_row_ids(delta: Dict[str, list]) -> Optional[List[Any]]:
+    """Ids of the rows a table delta touches, or None when there are too many to list."""
+    row_ids = table_deltas.changed_row_ids(delta)
+    if len(row_ids) > CHANGE_FEED_MAX_ROW_IDS:
+        return None
+    return row_ids
+
+
+def record(
+    cursor,
+    resource: str,
+    fiscal_year: Optional[str],
+    version: int,
+    row_ids: Optional[List[Any]] = None,
+    option_types: Optional[List[str]] = None
+) -> int:
+    """
+    Appends a change notification inside the writer's transaction, so it is
+    published exactly when the write commits. rowIds None means the whole
+    resource (or fiscal year) was replaced. Returns the event id.
+    """
+    payload = {'resource': resource, 'fiscalYear': fiscal_year, 'version': version, 'rowIds': row_ids}
+    if option_types is not None:
+        payload['optionTypes'] = option_types
+    cursor.execute(
+        'INSERT INTO change_events (resource, fiscal_year, version, payload) VALUES (?, ?, ?, ?)',
+        (resource, fiscal_year, version, json.dumps(payload))
+    )
+    event_id = cursor.lastrowid
+    cursor.execute('DELETE FROM change_events WHERE id <= ?', (event_id - CHANGE_FEED_RETAIN,))
+    return event_id
+
+
+def latest_id(cursor) -> int:
+    cursor.execute('SELECT MAX(id) FROM change_events')
+    row = cursor.fetchone()
+    return row[0] or 0
+
+
+def events_since(cursor, last_id: int, limit: int = 500) -> List[Dict[str, Any]]:
+    """Events committed after last_id, oldest first, each with its id."""
+    cursor.execute(
+        'SELECT id, payload FROM change_events WHERE id > ? ORDER BY id LIMIT ?',
+        (last_id, limit)
+    )
+    events = []
+    for event_id, payload in cursor.fetchall():
+        event = json.loads(payload)
+        event['id'] = event_id
+        events.append(event)
+    return events
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"id: {event['id']}\nevent: change\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
@@ -0,0 +1,390 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import glob
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import database
+from table_codec import TABLE_COLUMNS, NUMERIC_COLUMNS, COMPACT_FORMAT, dictionary_encode
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the shared snapshots; callers fall back to SQL
+    np = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is only needed for the Arrow/Parquet export
+    pa = None
+
+# Snapshot file: magic, header length, JSON header, then 64-byte aligned arrays
+MAGIC = b'ADNSNAP1'
+_PREFIX = struct.Struct('<8sQ')
+ALIGNMENT = 64
+
+# Snapshots of past versions (asOf reads) each worker keeps attached
+SNAPSHOT_PAST_VERSIONS = int(os.environ.get('SNAPSHOT_PAST_VERSIONS', '8'))
+
+INTEGER_COLUMNS = ['id', 'sno']
+MEASURE_COLUMNS = ['capacity', 'solar', 'wind']
+
+
+def available() -> bool:
+    return np is not None
+
+
+def snapshot_dir() -> str:
+    """
+    Where snapshots are published: ADANI_SNAPSHOT_DIR, else tmpfs (/dev/shm)
+    so the pages are shared memory, else next to the database.
+    """
+    configured = os.environ.get('ADANI_SNAPSHOT_DIR')
+    if configured:
+        return configured
+    if os.path.isdir('/dev/shm'):
+        db_hash = hashlib.sha1(os.path.abspath(database.DB_PATH).encode('utf-8')).hexdigest()[:12]
+        return os.path.join('/dev/shm', f'adani-snapshots-{db_hash}')
+    return os.path.join(database.DB_DIR, 'snapshots')
+
+
+def _file_prefix(fiscal_year: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', fiscal_year) + '-v'
+
+
+# Active snapshot file names after the year prefix: {version}-{hash prefix}.snap
+_ACTIVE_NAME = re.compile(r'^(\d+)(?:-[0-9a-f]{16})?\.snap$')
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class Snapshot:
+    """
+    Read-only columnar view of one (fiscal_year, version) sheet. Arrays are
+    backed directly by the mapped file, so every worker shares the same pages.
+    `exact` is False when rows carry fields or values the columns cannot hold;
+    such snapshots can aggregate but must not stand in for the stored rows.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_length = _PREFIX.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a table snapshot: {path}")
+        header = json.loads(bytes(self._map[_PREFIX.size:_PREFIX.size + header_length]))
+        self.fiscal_year: str = header['fiscalYear']
+        self.version: int = header['version']
+        self.blob_hash: Optional[str] = header.get('blobHash')
+        self.length: int = header['length']
+        self.exact: bool = header['exact']
+        self.arrays: Dict[str, Any] = {}
+        self.dictionaries: Dict[str, List] = {}
+        for name, column in header['columns'].items():
+            self.arrays[name] = np.frombuffer(self._map, dtype=column['dtype'], count=self.length, offset=column['offset'])
+            if 'dictionary' in column:
+                self.dictionaries[name] = column['dictionary']
+
+    # --- Filtering ---
+
+    def mask(self, filters: Optional[Dict[str, Optional[str]]] = None):
+        """Boolean row mask for exact-match filters on categorical columns, or None for all rows."""
+        mask = None
+        for column, value in (filters or {}).items():
+            if not value:
+                continue
+            dictionary = self.dictionaries[column]
+            if value in dictionary:
+                matches = self.arrays[column] == dictionary.index(value)
+            else:
+                matches = np.zeros(self.length, dtype=bool)
+            mask = matches if mask is None else mask & matches
+        return mask
+
+    # --- Aggregation ---
+
+    def aggregate(self, group_by: List[str], mask=None) -> Dict[Tuple, List[float]]:
+        """{group_key: [capacity, solar, wind, count]}, like aggregates.fetch_year_aggregates."""
+        if self.length == 0:
+            return {}
+        codes = [self.arrays[column] for column in group_by]
+        measures = [np.nan_to_num(self.arrays[column]) for column in MEASURE_COLUMNS]
+        if mask is not None:
+            codes = [c[mask] for c in codes]
+            measures = [m[mask] for m in measures]
+            if not len(measures[0]):
+                return {}
+
+        if codes:
+            groups, inverse = np.unique(np.stack(codes), axis=1, return_inverse=True)
+            group_count = groups.shape[1]
+            inverse = inverse.reshape(-1)
+        else:
+            groups = np.zeros((0, 1), dtype=np.int32)
+            group_count = 1
+            inverse = np.zeros(len(measures[0]), dtype=np.intp)
+
+        totals = [np.bincount(inverse, weights=m, minlength=group_count) for m in measures]
+        counts = np.bincount(inverse, minlength=group_count)
+        result = {}
+        for i in range(group_count):
+            key = tuple(self.dictionaries[column][int(groups[j, i])] for j, column in enumerate(group_by))
+            result[key] = [float(totals[0][i]), float(totals[1][i]), float(totals[2][i]), int(counts[i])]
+        return result
+
+    # --- Serialization ---
+
+    def _values(self, column: str, mask=None) -> List:
+        array = self.arrays[column] if mask is None else self.arrays[column][mask]
+        values = array.tolist()
+        if array.dtype.kind == 'f' and np.isnan(array).any():
+            values = [None if value != value else value for value in values]
+        return values
+
+    def to_compact(self, mask=None) -> Dict[str, Any]:
+        """The sheet in the GET /table-data?format=compact layout."""
+        data = {}
+        dictionaries = {}
+        for column in TABLE_COLUMNS:
+            data[column] = self._values(column, mask)
+            if column in self.dictionaries:
+                dictionaries[column] = self.dictionaries[column]
+        return {
+            'format': COMPACT_FORMAT,
+            'length': len(data['id']),
+            'columns': list(TABLE_COLUMNS),
+            'dictionaries': dictionaries,
+            'data': data,
+        }
+
+    def to_arrow(self, mask=None):
+        """Typed Arrow table built straight from the column arrays and code dictionaries."""
+        arrays = []
+        fields = []
+        for column in TABLE_COLUMNS:
+            values = self.arrays[column] if mask is None else self.arrays[column][mask]
+            if column in self.dictionaries:
+                array = pa.DictionaryArray.from_arrays(
+                    pa.array(values, type=pa.int32()),
+                    pa.array(self.dictionaries[column], type=pa.string())
+                )
+            else:
+                # NaN marks a missing measure
+                array = pa.array(values, from_pandas=True)
+            arrays.append(array)
+            fields.append(pa.field(column, array.type))
+        return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def build_arrow_table(snapshots: List[Snapshot], filters: Optional[Dict[str, Optional[str]]] = None):
+    """
+    Arrow table of several years' snapshots with a leading fiscalYear column,
+    in the layout of table_export.build_arrow_table.
+    """
+    tables = []
+    for snapshot in snapshots:
+        mask = snapshot.mask(filters)
+        table = snapshot.to_arrow(mask)
+        fiscal_year = pa.DictionaryArray.from_arrays(
+            pa.array(np.zeros(table.num_rows, dtype=np.int32)),
+            pa.array([snapshot.fiscal_year], type=pa.string())
+        )
+        tables.append(table.add_column(0, pa.field('fiscalYear', fiscal_year.type), fiscal_year))
+    if not tables:
+        return None
+    # One dictionary per column across the years, as IPC streams expect
+    return pa.concat_tables(tables).unify_dictionaries()
+
+
+def _build_columns(rows: List[Dict]) -> Tuple[Dict[str, Any], Dict[str, List], bool]:
+    known = set(TABLE_COLUMNS)
+    exact = all(known.issuperset(row) for row in rows)
+    arrays = {}
+    dictionaries = {}
+    for column in TABLE_COLUMNS:
+        values = [row.get(column) for row in rows]
+        if column in INTEGER_COLUMNS:
+            if not all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+                exact = False
+                values = [value if isinstance(value, int) else 0 for value in values]
+            arrays[column] = np.array(values, dtype=np.int64)
+        elif column in NUMERIC_COLUMNS:
+            if not all(value is None or isinstance(value, (int, float)) for value in values):
+                exact = False
+                values = [value if isinstance(value, (int, float)) else None for value in values]
+            arrays[column] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        else:
+            if not all(value is None or isinstance(value, str) for value in values):
+                exact = False
+            codes, dictionary = dictionary_encode(values)
+            arrays[column] = np.array(codes, dtype=np.int32)
+            dictionaries[column] = dictionary
+    return arrays, dictionaries, exact
+
+
+def write_snapshot(path: str, fiscal_year: str, version: int, rows: List[Dict], blob_hash: Optional[str] = None) -> None:
+    """Writes the snapshot file atomically (temporary file, then rename)."""
+    arrays, dictionaries, exact = _build_columns(rows)
+
+    # Offsets depend on the header length, which contains them: size it first
+    columns = {name: {'dtype': array.dtype.str, 'offset': 0} for name, array in arrays.items()}
+    for name, dictionary in dictionaries.items():
+        columns[name]['dictionary'] = dictionary
+    header = {
+        'fiscalYear': fiscal_year, 'version': version, 'blobHash': blob_hash,
+        'length': len(rows), 'exact': exact, 'columns': columns,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    reserved = _align(len(header_bytes) + 32 * len(arrays))
+    offset = _align(_PREFIX.size + reserved)
+    for name, array in arrays.items():
+        columns[name]['offset'] = offset
+        offset = _align(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode('utf-8')
+    assert len(header_bytes) <= reserved
+    header_bytes = header_bytes.ljust(reserved)
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_PREFIX.pack(MAGIC, len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in arrays.items():
+                f.seek(columns[name]['offset'])
+                f.write(array.tobytes())
+            f.truncate(offset)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+class SnapshotStore:
+    """
+    Publishes one snapshot file per (fiscal_year, version, blob_hash) and
+    keeps each worker attached to the latest one per year. The first worker
+    to need a version builds it; the others find the file and map it. The
+    content hash in the name keeps a file left over from another database
+    (e.g. one reset under the same path) from being served for a version
+    number it happens to share.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._attached: Dict[str, Snapshot] = {}
+        self._past: "OrderedDict[Tuple[str, int], Snapshot]" = OrderedDict()
+
+    def _path(self, fiscal_year: str, version: int, blob_hash: str) -> str:
+        return os.path.join(snapshot_dir(), f'{_file_prefix(fiscal_year)}{version}-{blob_hash[:16]}.snap')
+
+    def _remove_older(self, fiscal_year: str, version: int, current: str) -> None:
+        # Workers still mapping an old file keep their pages until they let go.
+        # Past-version files (.past.snap) are left to the LRU in get_past.
+        prefix = _file_prefix(fiscal_year)
+        for path in glob.glob(os.path.join(snapshot_dir(), glob.escape(prefix) + '*.snap')):
+            match = _ACTIVE_NAME.match(os.path.basename(path)[len(prefix):])
+            if match and path != current and int(match.group(1)) <= version:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def _is_current(self, snapshot: Optional[Snapshot], version: int, blob_hash: str) -> bool:
+        return snapshot is not None and snapshot.version == version and snapshot.blob_hash == blob_hash
+
+    def get(self, fiscal_year: str, version: int, blob_hash: str, connect) -> Optional[Snapshot]:
+        """
+        The snapshot of the given active (version, blob_hash), or None if it is
+        no longer active. Records stored inline (blob_hash NULL) have no content
+        hash to key a file by, so they are not snapshotted.
+        """
+        if blob_hash is None:
+            return None
+        snapshot = self._attached.get(fiscal_year)
+        if self._is_current(snapshot, version, blob_hash):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._attached.get(fiscal_year)
+            if self._is_current(snapshot, version, blob_hash):
+                return snapshot
+
+            path = self._path(fiscal_year, version, blob_hash)
+            if not os.path.exists(path):
+                conn = connect()
+                try:
+                    conn.row_factory = None
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT data FROM table_data_content
+                        WHERE fiscal_year = ? AND version = ? AND blob_hash = ? AND is_deleted = 0
+                    ''', (fiscal_year, version, blob_hash))
+                    row = cursor.fetchone()
+                finally:
+                    conn.close()
+                if row is None:
+                    return None
+                write_snapshot(path, fiscal_year, version, json.loads(row[0]), blob_hash)
+                self._remove_older(fiscal_year, version, path)
+
+            snapshot = Snapshot(path)
+            self._attached[fiscal_year] = snapshot
+            return snapshot
+
+    def get_past(self, fiscal_year: str, version: int, blob_hash: str, connect) -> Optional[Snapshot]:
+        """
+        The snapshot of a past version's content, for asOf reads. Files are
+        named by content hash and kept apart from the active ones;
+        the least recently used are detached and removed past SNAPSHOT_PAST_VERSIONS.
+        """
+        key = (fiscal_year, version)
+        with self._lock:
+            snapshot = self._past.get(key)
+            if snapshot is not None:
+                self._past.move_to_end(key)
+                return snapshot
+
+            path = os.path.join(snapshot_dir(), f'{_file_prefix(fiscal_year)}{version}-{blob_hash[:16]}.past.snap')
+            if not os.path.exists(path):
+                conn = connect()
+                try:
+                    conn.row_factory = None
+                    row = conn.execute('SELECT data FROM table_blobs WHERE hash = ?', (blob_hash,)).fetchone()
+                finally:
+                    conn.close()
+                if row is None:
+                    return None
+                write_snapshot(path, fiscal_year, version, json.loads(row[0]), blob_hash)
+
+            snapshot = Snapshot(path)
+            self._past[key] = snapshot
+            while len(self._past) > SNAPSHOT_PAST_VERSIONS:
+                _, evicted = self._past.popitem(last=False)
+                try:
+                    os.unlink(evicted.path)
+                except OSError:
+                    pass
+            return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        attached = dict(self._attached)
+        return {
+            'directory': snapshot_dir(),
+            'attached': {
+                year: {'version': s.version, 'rows': s.length, 'exact': s.exact, 'bytes': len(s._map)}
+                for year, s in sorted(attached.items())
+            },
+        }
+
+
+store = SnapshotStore()
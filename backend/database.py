@@ -2,124 +2,108 @@ import sqlite3
 import os
 import bcrypt
 from typing import List, Any, Dict, Optional
+import migrations
+import query_log
+from db_retry import BUSY_TIMEOUT_SECONDS, begin_immediate
 
-# Database path
-DB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
-DB_PATH = os.path.join(DB_DIR, 'adani-excel.db')
+# Database path (ADANI_DB_PATH points the backend at another file, e.g. for benchmarks)
+DB_PATH = os.environ.get('ADANI_DB_PATH') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'adani-excel.db'
+)
+DB_DIR = os.path.dirname(os.path.abspath(DB_PATH))
 
-def get_db_connection():
-    """Establishes a connection to the SQLite database."""
+# Default admin account, created by `python backend/database.py create-admin`
+DEFAULT_ADMIN_EMAIL = "admin@adani.com"
+DEFAULT_ADMIN_USERNAME = "adani"
+DEFAULT_ADMIN_PASSWORD = "adani123456"
+
+def get_db_connection(check_same_thread: bool = True):
+    """
+    Establishes a connection to the SQLite database.
+    Pass check_same_thread=False for connections handed to a streaming
+    response, which are consumed from the threadpool one chunk at a time.
+    """
     if not os.path.exists(DB_DIR):
         os.makedirs(DB_DIR)
     
-    conn = sqlite3.connect(DB_PATH)
+    # Timed connections feed the slow-query log (query_log.SLOW_QUERY_MS)
+    conn = sqlite3.connect(
+        DB_PATH, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=check_same_thread,
+        factory=query_log.connection_factory()
+    )
     conn.row_factory = sqlite3.Row  # Allows accessing columns by name
     return conn
 
 def init_db():
-    """Initializes the database tables if they don't exist."""
+    """
+    Applies pending schema migrations. Cheap when the schema is current: one
+    PRAGMA read, no write lock. Does not create users; see create_admin_user.
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
     
     try:
-        # Table Data
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS table_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fiscal_year TEXT NOT NULL,
-                data TEXT NOT NULL,
-                version INTEGER DEFAULT 1,
-                is_deleted BOOLEAN DEFAULT FALSE,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Dropdown Options
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS dropdown_options (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                option_type TEXT NOT NULL,
-                option_value TEXT NOT NULL,
-                version INTEGER DEFAULT 1,
-                is_deleted BOOLEAN DEFAULT FALSE,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Location Relationships
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS location_relationships (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fiscal_year TEXT NOT NULL DEFAULT 'FY_25',
-                location TEXT NOT NULL,
-                location_code TEXT NOT NULL,
-                version INTEGER DEFAULT 1,
-                is_deleted BOOLEAN DEFAULT FALSE,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Users
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Variables
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS variables (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                key TEXT NOT NULL,
-                value TEXT,
-                user_id TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Indexes
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_table_data_fiscal_year ON table_data(fiscal_year)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_table_data_fiscal_year_deleted ON table_data(fiscal_year, is_deleted)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_dropdown_options_type ON dropdown_options(option_type)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_dropdown_options_type_deleted ON dropdown_options(option_type, is_deleted)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_location_relationships_fiscal_year ON location_relationships(fiscal_year)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_location_relationships_fiscal_year_deleted ON location_relationships(fiscal_year, is_deleted)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_variables_key_user ON variables(key, user_id)')
+        applied = migrations.migrate(conn)
+        if applied:
+            print(f"SQLite database migrated to schema version {migrations.LATEST_VERSION}")
+    except Exception as e:
+        print(f"Failed to initialize SQLite database: {e}")
+    finally:
+        conn.close()
 
-        # Create admin user if it doesn't exist
-        admin_email = "admin@adani.com"
-        admin_username = "adani"
-        admin_password = "adani123456"
-        
+def create_admin_user(email: str = DEFAULT_ADMIN_EMAIL, username: str = DEFAULT_ADMIN_USERNAME, password: str = DEFAULT_ADMIN_PASSWORD) -> bool:
+    """Creates the admin user unless one with this email exists. Returns True if created."""
+    init_db()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
         # Check if admin user already exists
-        cursor.execute("SELECT id FROM users WHERE email = ?", (admin_email,))
-        existing_user = cursor.fetchone()
-        
-        if not existing_user:
-            # Hash the password
-            hashed_password = bcrypt.hashpw(admin_password.encode('utf-8'), bcrypt.gensalt())
-            # Insert admin user
-            cursor.execute(
-                "INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
-                (admin_username, admin_email, hashed_password)
-            )
-            print(f"Admin user created: {admin_email}")
+        cursor.execute("SELECT id FROM users WHERE email = ?", (email,))
+        if cursor.fetchone():
+            return False
 
+        # Hash the password
+        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        cursor.execute(
+            "INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+            (username, email, hashed_password)
+        )
         conn.commit()
-        print("SQLite database initialized successfully")
-    except Exception as e:
-        print(f"Failed to initialize SQLite database: {e}")
+        return True
     finally:
         conn.close()
 
-# Initialize DB on module load (or call explicitly)
+# Schema setup and admin provisioning from the command line:
+#   python backend/database.py                 # apply migrations
+#   python backend/database.py create-admin    # also create the admin user
+#   python backend/database.py gc              # delete sheet blobs no record points at
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Database maintenance")
+    parser.add_argument("command", nargs="?", choices=["migrate", "create-admin", "gc"], default="migrate")
+    parser.add_argument("--email", default=DEFAULT_ADMIN_EMAIL)
+    parser.add_argument("--username", default=DEFAULT_ADMIN_USERNAME)
+    parser.add_argument("--password", default=os.environ.get("ADANI_ADMIN_PASSWORD", DEFAULT_ADMIN_PASSWORD))
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        init_db()
+    elif args.command == "create-admin":
+        if create_admin_user(args.email, args.username, args.password):
+            print(f"Admin user created: {args.email}")
+        else:
+            print(f"Admin user already exists: {args.email}")
+    elif args.command == "gc":
+        import table_store
+
+        init_db()
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            begin_immediate(cursor)
+            removed = table_store.collect_blobs(cursor)
+            conn.commit()
+        finally:
+            conn.close()
+        print(f"Removed {removed} unreferenced blob(s)")
@@ -0,0 +1,47 @@
+import os
+import random
+import sqlite3
+import time
+import metrics
+
+# How long one attempt waits on a locked database (sqlite3 busy handler), and
+# how often a write transaction is retried after that, with capped backoff
+BUSY_TIMEOUT_SECONDS = float(os.environ.get('ADANI_DB_BUSY_TIMEOUT', '1.0'))
+BUSY_RETRIES = int(os.environ.get('ADANI_DB_BUSY_RETRIES', '4'))
+BUSY_BACKOFF_SECONDS = 0.025
+BUSY_BACKOFF_MAX_SECONDS = 0.4
+
+
+def is_busy_error(error: Exception) -> bool:
+    """True for SQLITE_BUSY / SQLITE_LOCKED errors."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def backoff_delay(attempt: int) -> float:
+    # Exponential with full jitter, so workers retrying together spread out
+    return random.uniform(0, min(BUSY_BACKOFF_MAX_SECONDS, BUSY_BACKOFF_SECONDS * (2 ** attempt)))
+
+
+def begin_immediate(cursor) -> None:
+    """
+    Starts a write transaction, taking the write lock up front. If another
+    process holds it past the busy timeout, retries up to BUSY_RETRIES times
+    before letting the error through.
+    """
+    attempt = 0
+    while True:
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            return
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e):
+                raise
+            if attempt >= BUSY_RETRIES:
+                metrics.counter('db.busy_failures').inc()
+                raise
+            metrics.counter('db.busy_retries').inc()
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
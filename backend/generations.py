@@ -0,0 +1,72 @@
+import mmap
+import os
+import struct
+import threading
+import database
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows: counters stay consistent within one process
+    fcntl = None
+
+# Resources whose cached views depend on committed writes
+DROPDOWN_OPTIONS = 'dropdown_options'
+LOCATION_RELATIONSHIPS = 'location_relationships'
+TABLE_DATA = 'table_data'
+TABLE_HISTORY = 'table_history'
+VARIABLES = 'variables'
+
+# Counters live in a small file next to the database, memory-mapped by every
+# worker process: reading one is a struct unpack, bumping one takes a flock.
+_SLOTS = {DROPDOWN_OPTIONS: 0, LOCATION_RELATIONSHIPS: 1, TABLE_DATA: 2, VARIABLES: 3, TABLE_HISTORY: 4}
+_COUNTER = struct.Struct('<Q')
+_FILE_SIZE = 16 * _COUNTER.size
+
+_lock = threading.Lock()
+_fd = None
+_map = None
+
+
+def _path() -> str:
+    return os.environ.get('ADANI_GENERATIONS_PATH') or database.DB_PATH + '-generations'
+
+
+def _shared() -> mmap.mmap:
+    global _fd, _map
+    if _map is None:
+        with _lock:
+            if _map is None:
+                try:
+                    fd = os.open(_path(), os.O_RDWR | os.O_CREAT, 0o644)
+                    # Growing to the same size from several processes is harmless
+                    if os.fstat(fd).st_size < _FILE_SIZE:
+                        os.ftruncate(fd, _FILE_SIZE)
+                    shared = mmap.mmap(fd, _FILE_SIZE)
+                except OSError as e:
+                    # Unwritable location: fall back to counters private to this process
+                    print(f"Generation counters are process-local: {e}")
+                    fd, shared = None, mmap.mmap(-1, _FILE_SIZE)
+                _fd = fd
+                _map = shared
+    return _map
+
+
+def current(resource: str) -> int:
+    """Returns the change counter of a resource (0 until its first write)."""
+    return _COUNTER.unpack_from(_shared(), _SLOTS[resource] * _COUNTER.size)[0]
+
+
+def bump(resource: str) -> int:
+    """Marks a resource as changed in every worker; call after the write has been committed."""
+    shared = _shared()
+    offset = _SLOTS[resource] * _COUNTER.size
+    with _lock:
+        if fcntl is not None and _fd is not None:
+            fcntl.flock(_fd, fcntl.LOCK_EX)
+        try:
+            value = _COUNTER.unpack_from(shared, offset)[0] + 1
+            _COUNTER.pack_into(shared, offset, value)
+            return value
+        finally:
+            if fcntl is not None and _fd is not None:
+                fcntl.flock(_fd, fcntl.LOCK_UN)
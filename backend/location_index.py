@@ -0,0 +1,98 @@
+from typing import Dict, List, Optional
+import threading
+import generations
+from master_data import DEFAULT_LOCATION_RELATIONSHIPS
+
+CHECK_MODE = 'check'
+FILL_MODE = 'fill'
+VALIDATION_MODES = [CHECK_MODE, FILL_MODE]
+
+
+class LocationIndex:
+    """
+    Per fiscal year hash index of location -> locationCode built from the
+    active location relationships. Years are loaded on first use and dropped
+    whenever relationships are saved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._years: Dict[str, Dict[str, str]] = {}
+
+    def get(self, fiscal_year: str, connect) -> Dict[str, str]:
+        generation = generations.current(generations.LOCATION_RELATIONSHIPS)
+        mapping = self._years.get(fiscal_year) if self._generation == generation else None
+        if mapping is not None:
+            return mapping
+
+        with self._lock:
+            generation = generations.current(generations.LOCATION_RELATIONSHIPS)
+            if self._generation != generation:
+                self._years = {}
+                self._generation = generation
+            mapping = self._years.get(fiscal_year)
+            if mapping is None:
+                conn = connect()
+                try:
+                    conn.row_factory = None
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT location, location_code FROM location_relationships
+                        WHERE fiscal_year = ? AND is_deleted = 0
+                    ''', (fiscal_year,))
+                    mapping = dict(cursor.fetchall())
+                finally:
+                    conn.close()
+                if not mapping:
+                    # Same fallback as GET /location-relationships
+                    mapping = {rel['location']: rel['locationCode'] for rel in DEFAULT_LOCATION_RELATIONSHIPS}
+                self._years[fiscal_year] = mapping
+            return mapping
+
+
+index = LocationIndex()
+
+
+def validate_rows(rows: List[Dict], mapping: Dict[str, str], mode: str = CHECK_MODE) -> Dict:
+    """
+    Checks every row's locationCode against the relationship of its location in
+    one pass. In fill mode empty codes of known locations are filled in place.
+    Returns a compact report of filled rows, mismatches and unknown locations.
+    """
+    filled = []
+    mismatches = []
+    unknown = set()
+    for row in rows:
+        location = row.get('location')
+        expected = mapping.get(location)
+        if expected is None:
+            if location:
+                unknown.add(location)
+            continue
+        code = row.get('locationCode')
+        if not code:
+            if mode == FILL_MODE:
+                row['locationCode'] = expected
+                filled.append(row.get('id'))
+            else:
+                mismatches.append({'id': row.get('id'), 'location': location, 'locationCode': code, 'expected': expected})
+        elif code != expected:
+            mismatches.append({'id': row.get('id'), 'location': location, 'locationCode': code, 'expected': expected})
+
+    return {
+        'mode': mode,
+        'checked': len(rows),
+        'filled': filled,
+        'mismatches': mismatches,
+        'unknownLocations': sorted(unknown),
+    }
+
+
+def validate_for_year(fiscal_year: str, rows: List[Dict], mode: Optional[str], connect) -> Optional[Dict]:
+    """Runs validate_rows against the year's index; returns None when mode is None."""
+    if mode is None:
+        return None
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Invalid locationCheck. Valid modes: {VALIDATION_MODES}")
+    return validate_rows(rows, index.get(fiscal_year, connect), mode)
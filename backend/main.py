@@ -1,9 +1,11 @@
-from fastapi import FastAPI, HTTPException, Query, Body, Depends, Request, status
+from fastapi import FastAPI, HTTPException, Query, Body, Depends, Request, Header, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import List, Dict, Any, Optional
+import asyncio
+import functools
 import json
 import sqlite3
 from datetime import datetime, timedelta
@@ -13,9 +15,29 @@ import subprocess
 import sys
 import bcrypt
 import jwt
-from database import get_db_connection, init_db
+from database import get_db_connection, init_db, begin_immediate, DEFAULT_ADMIN_EMAIL
+from table_codec import COMPACT_FORMAT, encode_compact
+import table_export
+import columnar_snapshot
+import aggregates
+import change_feed
+import generations
+import master_data
+import row_diff
+import table_store
+import table_deltas
+import version_diff
+import admission
+import metrics
+import profiling
+import query_log
+import variable_cache
+import autocomplete
+import location_index
+from write_coalescer import WriteCoalescer
 from schemas import (
-    TableDataRequest, DropdownOptions, LocationRelationship, RestoreBackupRequest, TableRow, UserRegister, UserLogin, UserResponse, LoginResponse, Variable
+    TableDataRequest, DropdownOptions, LocationRelationship, RestoreBackupRequest, TableRow, UserRegister, UserLogin, UserResponse, LoginResponse, Variable,
+    MasterDataUpdate
 )
 
 # JWT configuration
@@ -23,7 +45,34 @@ SECRET_KEY = "your-secret-key-change-this-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Window in which rapid saves of the same fiscal year are coalesced into one write
+TABLE_DATA_COALESCE_WINDOW_MS = float(os.environ.get("TABLE_DATA_COALESCE_WINDOW_MS", "25"))
+
+# Accounts allowed to use admin tools (profiling): the default admin plus ADMIN_EMAILS
+ADMIN_EMAILS = {DEFAULT_ADMIN_EMAIL, *filter(None, os.environ.get("ADMIN_EMAILS", "").split(","))}
+
+def is_admin_token(authorization: Optional[str]) -> bool:
+    """True when the Authorization header carries a valid access token of an admin account."""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return False
+    try:
+        payload = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return False
+    return payload.get("email") in ADMIN_EMAILS
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if not is_admin_token(authorization):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
 app = FastAPI()
+# Sync endpoints join a request's profile when one is active (see profiling.py)
+app.router.route_class = profiling.ProfiledRoute
+
+# Per route class concurrency limits; added first so it runs inside CORS and shed responses carry its headers
+app.add_middleware(admission.AdmissionMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -33,6 +82,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(profiling.ProfilingMiddleware, authorize=lambda headers: is_admin_token(headers.get("authorization")))
 
 @app.on_event("startup")
 def startup_event():
@@ -53,6 +103,151 @@ def health_check():
 def api_health_check():
     return health_check()
 
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
+
+# Additional route with /api prefix for direct access
+@app.get("/api/metrics")
+def api_get_metrics():
+    return get_metrics()
+
+# --- Profiling Endpoints ---
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+def list_profiles():
+    return {"reports": profiling.list_reports(), "maxReports": profiling.PROFILE_MAX_REPORTS}
+
+# Additional route with /api prefix for direct access
+@app.get("/api/admin/profiles", dependencies=[Depends(require_admin)])
+def api_list_profiles():
+    return list_profiles()
+
+@app.get("/admin/profiles/{name}", dependencies=[Depends(require_admin)])
+def get_profile(name: str):
+    path = profiling.report_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile report {name} not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
+
+# Additional route with /api prefix for direct access
+@app.get("/api/admin/profiles/{name}", dependencies=[Depends(require_admin)])
+def api_get_profile(name: str):
+    return get_profile(name)
+
+@app.get("/admin/slow-queries", dependencies=[Depends(require_admin)])
+def get_slow_queries():
+    # Statements slower than SLOW_QUERY_MS seen by this worker
+    return {"enabled": query_log.enabled(), **query_log.snapshot()}
+
+# Additional route with /api prefix for direct access
+@app.get("/api/admin/slow-queries", dependencies=[Depends(require_admin)])
+def api_get_slow_queries():
+    return get_slow_queries()
+
+@app.delete("/admin/slow-queries", dependencies=[Depends(require_admin)])
+def reset_slow_queries():
+    query_log.reset()
+    return {"message": "Slow query log cleared"}
+
+# Additional route with /api prefix for direct access
+@app.delete("/api/admin/slow-queries", dependencies=[Depends(require_admin)])
+def api_reset_slow_queries():
+    return reset_slow_queries()
+
+# --- Change Feed Endpoints ---
+
+# How often an open /events stream checks for new changes, and how long it may stay silent
+EVENTS_POLL_SECONDS = float(os.environ.get("EVENTS_POLL_SECONDS", "0.25"))
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_BATCH_SIZE = 500
+
+def read_change_events(last_id: int) -> List[Dict[str, Any]]:
+    conn = get_db_connection()
+    try:
+        return change_feed.events_since(conn.cursor(), last_id, EVENTS_BATCH_SIZE)
+    finally:
+        conn.close()
+
+def resolve_event_cursor(last_id: Optional[int]):
+    """Returns where a stream starts and whether events after last_id were already pruned."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        latest = change_feed.latest_id(cursor)
+        if last_id is None or last_id > latest:
+            return latest, False
+        cursor.execute('SELECT MIN(id) FROM change_events')
+        oldest = cursor.fetchone()[0]
+        return last_id, oldest is not None and last_id < oldest - 1
+    finally:
+        conn.close()
+
+async def change_event_stream(request: Request, last_id: int, missed: bool):
+    yield "retry: 3000\n\n"
+    if missed:
+        # The client was away longer than the feed keeps events: it has to refetch
+        yield "event: reset\ndata: {}\n\n"
+    watermark = None
+    idle = 0.0
+    while not await request.is_disconnected():
+        # Writers bump the generations after committing, so a moved watermark
+        # means there are events to read; otherwise the database is not touched
+        current = change_feed.watermark()
+        if current != watermark:
+            watermark = current
+            events = await asyncio.to_thread(read_change_events, last_id)
+            for event in events:
+                last_id = event["id"]
+                yield change_feed.format_sse(event)
+            metrics.counter("events.sent").inc(len(events))
+            if len(events) == EVENTS_BATCH_SIZE:
+                watermark = None
+                continue
+            idle = 0.0
+        elif idle >= EVENTS_HEARTBEAT_SECONDS:
+            yield ": keepalive\n\n"
+            idle = 0.0
+        await asyncio.sleep(EVENTS_POLL_SECONDS)
+        idle += EVENTS_POLL_SECONDS
+
+@app.get("/events")
+async def stream_events(
+    request: Request,
+    lastEventId: Optional[int] = Query(None, description="Resume after this event id"),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-Sent Events stream of committed changes to table data, dropdown
+    options and location relationships. Each 'change' event carries resource,
+    fiscalYear, version and rowIds (null when the whole sheet or list was
+    replaced). Reconnecting clients resume from Last-Event-ID.
+    """
+    if lastEventId is None and last_event_id:
+        try:
+            lastEventId = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID header")
+    try:
+        start_id, missed = await asyncio.to_thread(resolve_event_cursor, lastEventId)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    metrics.counter("events.connections").inc()
+    return StreamingResponse(
+        change_event_stream(request, start_id, missed),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Additional route with /api prefix for direct access
+@app.get("/api/events")
+async def api_stream_events(
+    request: Request,
+    lastEventId: Optional[int] = Query(None, description="Resume after this event id"),
+    last_event_id: Optional[str] = Header(None)
+):
+    return await stream_events(request, lastEventId, last_event_id)
+
 # --- Authentication Endpoints ---
 
 # Utility function to create access token
@@ -134,88 +329,65 @@ async def api_login_user(user: UserLogin):
 
 # --- Variables Endpoints ---
 
-# Get all variables or a specific variable by key
-@app.get("/variables")
-async def get_variables(key: Optional[str] = None, user_id: Optional[str] = None):
+def load_variables(user_id: Optional[str]) -> List[Dict]:
     conn = get_db_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
-   
     try:
-        if key:
-            # Get specific variable by key (and optionally user_id)
-            if user_id:
-                cursor.execute("SELECT * FROM variables WHERE key = ? AND user_id = ?", (key, user_id))
-            else:
-                cursor.execute("SELECT * FROM variables WHERE key = ?", (key,))
+        if user_id:
+            cursor.execute("SELECT * FROM variables WHERE user_id = ?", (user_id,))
         else:
-            # Get all variables (optionally filtered by user_id)
-            if user_id:
-                cursor.execute("SELECT * FROM variables WHERE user_id = ?", (user_id,))
-            else:
-                cursor.execute("SELECT * FROM variables")
-       
-        rows = cursor.fetchall()
-        variables = [dict(row) for row in rows]
+            cursor.execute("SELECT * FROM variables")
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+# Get all variables or a specific variable by key
+@app.get("/variables")
+def get_variables(key: Optional[str] = None, user_id: Optional[str] = None):
+    try:
+        # Served from the per-user cache; the table is only read on a miss
+        scope = user_id or variable_cache.ALL_USERS
+        variables = variable_cache.cache.get(scope, lambda: load_variables(user_id))
+        if key:
+            # Specific variable by key (and optionally user_id)
+            variables = [variable for variable in variables if variable['key'] == key]
         return variables
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error retrieving variables: {str(e)}"
         )
-    finally:
-        conn.close()
 
 # Additional route with /api prefix for direct access
 @app.get("/api/variables")
-async def api_get_variables(key: Optional[str] = None, user_id: Optional[str] = None):
-    return await get_variables(key, user_id)
+def api_get_variables(key: Optional[str] = None, user_id: Optional[str] = None):
+    return get_variables(key, user_id)
+
+# Insert or update a variable in one statement, returning the stored row
+UPSERT_VARIABLE_SQL = '''
+    INSERT INTO variables (key, value, user_id) VALUES (?, ?, ?)
+    ON CONFLICT(key, COALESCE(user_id, '')) DO UPDATE
+    SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+'''
 
 # Set a variable
 @app.post("/variables")
-async def set_variable(variable: Variable):
+def set_variable(variable: Variable):
     conn = get_db_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
    
     try:
-        # Check if variable already exists
-        if variable.user_id:
-            cursor.execute("SELECT id FROM variables WHERE key = ? AND user_id = ?", (variable.key, variable.user_id))
-        else:
-            cursor.execute("SELECT id FROM variables WHERE key = ? AND user_id IS NULL", (variable.key,))
-           
-        existing_variable = cursor.fetchone()
-       
-        if existing_variable:
-            # Update existing variable
-            if variable.user_id:
-                cursor.execute(
-                    "UPDATE variables SET value = ?, updated_at = CURRENT_TIMESTAMP WHERE key = ? AND user_id = ?",
-                    (json.dumps(variable.value), variable.key, variable.user_id)
-                )
-            else:
-                cursor.execute(
-                    "UPDATE variables SET value = ?, updated_at = CURRENT_TIMESTAMP WHERE key = ? AND user_id IS NULL",
-                    (json.dumps(variable.value), variable.key)
-                )
-        else:
-            # Insert new variable
-            cursor.execute(
-                "INSERT INTO variables (key, value, user_id) VALUES (?, ?, ?)",
-                (variable.key, json.dumps(variable.value), variable.user_id)
-            )
-       
+        begin_immediate(cursor)
+        cursor.execute(
+            UPSERT_VARIABLE_SQL + ' RETURNING *',
+            (variable.key, json.dumps(variable.value), variable.user_id)
+        )
+        updated_variable = dict(cursor.fetchone())
         conn.commit()
-       
-        # Return the updated/created variable
-        if variable.user_id:
-            cursor.execute("SELECT * FROM variables WHERE key = ? AND user_id = ?", (variable.key, variable.user_id))
-        else:
-            cursor.execute("SELECT * FROM variables WHERE key = ? AND user_id IS NULL", (variable.key,))
-           
-        updated_variable = cursor.fetchone()
-        return dict(updated_variable)
+        variable_cache.cache.row_saved(updated_variable)
+        return updated_variable
     except Exception as e:
         conn.rollback()
         raise HTTPException(
@@ -227,16 +399,113 @@ async def set_variable(variable: Variable):
 
 # Additional route with /api prefix for direct access
 @app.post("/api/variables")
-async def api_set_variable(variable: Variable):
-    return await set_variable(variable)
+def api_set_variable(variable: Variable):
+    return set_variable(variable)
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    Smallest string above every string starting with prefix, or None when
+    there is none (the prefix is all U+10FFFF, the last code point).
+    """
+    stripped = prefix.rstrip(chr(sys.maxunicode))
+    if not stripped:
+        return None
+    return stripped[:-1] + chr(ord(stripped[-1]) + 1)
+
+# Get several variables by a list of keys and/or a key prefix
+@app.get("/variables/bulk")
+def get_variables_bulk(
+    keys: List[str] = Query([], description="Keys, repeated or comma-separated"),
+    prefix: Optional[str] = None,
+    user_id: Optional[str] = None
+):
+    key_list = parse_list_param(keys)
+    if not key_list and not prefix:
+        raise HTTPException(status_code=400, detail="keys or prefix is required")
+
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+   
+    try:
+        conditions = []
+        params = []
+        if key_list:
+            conditions.append(f"key IN ({', '.join('?' for _ in key_list)})")
+            params.extend(key_list)
+        if prefix:
+            # Range scan on the key index instead of LIKE
+            upper_bound = prefix_upper_bound(prefix)
+            if upper_bound is None:
+                conditions.append("key >= ?")
+                params.append(prefix)
+            else:
+                conditions.append("(key >= ? AND key < ?)")
+                params.extend([prefix, upper_bound])
+        query = f"SELECT * FROM variables WHERE ({' OR '.join(conditions)})"
+        if user_id:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        cursor.execute(query + " ORDER BY key", params)
+        return [dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving variables: {str(e)}"
+        )
+    finally:
+        conn.close()
+
+# Additional route with /api prefix for direct access
+@app.get("/api/variables/bulk")
+def api_get_variables_bulk(
+    keys: List[str] = Query([], description="Keys, repeated or comma-separated"),
+    prefix: Optional[str] = None,
+    user_id: Optional[str] = None
+):
+    return get_variables_bulk(keys, prefix, user_id)
+
+# Set several variables in one transaction
+@app.post("/variables/bulk")
+def set_variables_bulk(variables: List[Variable]):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+   
+    try:
+        begin_immediate(cursor)
+        cursor.executemany(
+            UPSERT_VARIABLE_SQL,
+            [(variable.key, json.dumps(variable.value), variable.user_id) for variable in variables]
+        )
+        conn.commit()
+        variable_cache.cache.invalidate(variable.user_id for variable in variables)
+        return {
+            "message": f"{len(variables)} variables saved successfully",
+            "count": len(variables),
+            "keys": [variable.key for variable in variables]
+        }
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error setting variables: {str(e)}"
+        )
+    finally:
+        conn.close()
+
+# Additional route with /api prefix for direct access
+@app.post("/api/variables/bulk")
+def api_set_variables_bulk(variables: List[Variable]):
+    return set_variables_bulk(variables)
 
 # Delete a variable
 @app.delete("/variables")
-async def delete_variable(key: str, user_id: Optional[str] = None):
+def delete_variable(key: str, user_id: Optional[str] = None):
     conn = get_db_connection()
     cursor = conn.cursor()
    
     try:
+        begin_immediate(cursor)
         # Delete variable by key (and optionally user_id)
         if user_id:
             cursor.execute("DELETE FROM variables WHERE key = ? AND user_id = ?", (key, user_id))
@@ -244,6 +513,7 @@ async def delete_variable(key: str, user_id: Optional[str] = None):
             cursor.execute("DELETE FROM variables WHERE key = ? AND user_id IS NULL", (key,))
            
         conn.commit()
+        variable_cache.cache.row_deleted(key, user_id or None)
        
         if cursor.rowcount > 0:
             return {"message": f"Variable '{key}' deleted successfully"}
@@ -265,8 +535,18 @@ async def delete_variable(key: str, user_id: Optional[str] = None):
 
 # Additional route with /api prefix for direct access
 @app.delete("/api/variables")
-async def api_delete_variable(key: str, user_id: Optional[str] = None):
-    return await delete_variable(key, user_id)
+def api_delete_variable(key: str, user_id: Optional[str] = None):
+    return delete_variable(key, user_id)
+
+# Hit rate and size of the variables cache
+@app.get("/variables/cache-stats")
+def get_variable_cache_stats():
+    return variable_cache.cache.stats()
+
+# Additional route with /api prefix for direct access
+@app.get("/api/variables/cache-stats")
+def api_get_variable_cache_stats():
+    return get_variable_cache_stats()
 
 # --- Dropdown Options Endpoints ---
 
@@ -328,6 +608,7 @@ def save_dropdown_options(options: DropdownOptions):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
+        begin_immediate(cursor)
         # Soft delete existing options
         cursor.execute('''
             UPDATE dropdown_options
@@ -352,7 +633,11 @@ def save_dropdown_options(options: DropdownOptions):
                         VALUES (?, ?, 1)
                     ''', (db_key, value))
         
+        config_version = master_data.bump_config_version(cursor)
+        change_feed.record(cursor, change_feed.DROPDOWN_OPTIONS, None, config_version,
+                           option_types=[key for key, values in options_dict.items() if isinstance(values, list)])
         conn.commit()
+        generations.bump(generations.DROPDOWN_OPTIONS)
         # Return the saved options
         result = options.dict()
         # Remove fiscalYear from response since it's not used
@@ -384,6 +669,7 @@ def add_dropdown_option(option: Dict[str, Any] = Body(...)):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
+        begin_immediate(cursor)
         # First, get all existing options
         cursor.execute('''
             SELECT option_type, option_value FROM dropdown_options
@@ -440,7 +726,10 @@ def add_dropdown_option(option: Dict[str, Any] = Body(...)):
                     VALUES (?, ?, 1)
                 ''', (db_key, value))
        
+        config_version = master_data.bump_config_version(cursor)
+        change_feed.record(cursor, change_feed.DROPDOWN_OPTIONS, None, config_version, option_types=[option_type])
         conn.commit()
+        generations.bump(generations.DROPDOWN_OPTIONS)
        
         return {
             "success": True,
@@ -502,6 +791,7 @@ def save_dropdown_options_by_type(option_type: str, options: List[str] = Body(..
         if option_type not in valid_types:
             raise HTTPException(status_code=400, detail=f"Invalid option type. Valid types: {valid_types}")
         
+        begin_immediate(cursor)
         # Soft delete existing options for this type
         cursor.execute('''
             UPDATE dropdown_options
@@ -516,7 +806,11 @@ def save_dropdown_options_by_type(option_type: str, options: List[str] = Body(..
                 VALUES (?, ?, 1)
             ''', (option_type, value))
         
+        config_version = master_data.bump_config_version(cursor)
+        change_feed.record(cursor, change_feed.DROPDOWN_OPTIONS, None, config_version,
+                           option_types=[master_data.OPTION_TYPE_KEYS[option_type]])
         conn.commit()
+        generations.bump(generations.DROPDOWN_OPTIONS)
         return {option_type: options, "message": f"{option_type} saved successfully"}
     except Exception as e:
         conn.rollback()
@@ -529,28 +823,138 @@ def save_dropdown_options_by_type(option_type: str, options: List[str] = Body(..
 def api_add_dropdown_option(option: Dict[str, Any] = Body(...)):
     return add_dropdown_option(option)
 
+# --- Master Data Endpoints ---
+
+@app.get("/master-data")
+def get_master_data(request: Request, fiscalYear: str = Query("FY_25", description="Fiscal Year")):
+    # All dropdown option types plus location relationships in one response
+    try:
+        snapshot = master_data.get_snapshot(fiscalYear, get_db_connection)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == snapshot.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+# Additional route with /api prefix for direct access
+@app.get("/api/master-data")
+def api_get_master_data(request: Request, fiscalYear: str = Query("FY_25", description="Fiscal Year")):
+    return get_master_data(request, fiscalYear)
+
+@app.post("/master-data")
+def save_master_data(update: MasterDataUpdate):
+    # Applies every changed option list and the relationships in one transaction
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        begin_immediate(cursor)
+        relationships = None
+        if update.relationships is not None:
+            relationships = [(rel.location, rel.locationCode) for rel in update.relationships]
+        result = master_data.apply_master_data_update(cursor, update.fiscalYear, update.options, relationships)
+        if result['optionsChanged']:
+            changed_types = [
+                key for key, change in result['changes'].items()
+                if key != 'relationships' and (change['added'] or change['removed'])
+            ]
+            change_feed.record(cursor, change_feed.DROPDOWN_OPTIONS, None, result['version'], option_types=changed_types)
+        if result['relationshipsChanged']:
+            change_feed.record(cursor, change_feed.LOCATION_RELATIONSHIPS, update.fiscalYear, result['version'])
+        conn.commit()
+
+        if result['optionsChanged']:
+            generations.bump(generations.DROPDOWN_OPTIONS)
+        if result['relationshipsChanged']:
+            generations.bump(generations.LOCATION_RELATIONSHIPS)
+        return {"message": "Master data saved successfully", "version": result['version'], "changes": result['changes']}
+    except ValueError as e:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+
+# Additional route with /api prefix for direct access
+@app.post("/api/master-data")
+def api_save_master_data(update: MasterDataUpdate):
+    return save_master_data(update)
+
 # --- Table Data Endpoints ---
 
 @app.get("/table-data")
-def get_table_data(fiscalYear: str = Query(..., description="Fiscal Year")):
+def get_table_data(
+    response: Response,
+    fiscalYear: str = Query(..., description="Fiscal Year"),
+    format: Optional[str] = Query(None, description="Response format: 'compact' for column-wise dictionary encoding"),
+    asOf: Optional[str] = Query(None, description="Return the version that was current at this ISO 8601 timestamp (or end of this date)")
+):
     print(f"Received request for fiscalYear: {fiscalYear}")
+    if format is not None and format != COMPACT_FORMAT:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Valid formats: ['{COMPACT_FORMAT}']")
+    try:
+        as_of = table_store.parse_as_of(asOf) if asOf is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     conn = get_db_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     try:
+        # (version, blob_hash) of a past version to serve instead of the active
+        # one; a blob_hash of None means the year had no data at that time
+        past = None
+        if as_of is not None:
+            entry = table_store.version_as_of(cursor, fiscalYear, as_of)
+            record = table_store.get_active_record(cursor, fiscalYear)
+            if entry is None or entry['is_deleted']:
+                past = (0, None)
+            elif record is None or entry['version'] != record[1]:
+                if entry['blob_hash'] is None:
+                    raise HTTPException(status_code=410, detail=f"Content of version {entry['version']} is no longer retained")
+                past = (entry['version'], entry['blob_hash'])
+
+        if format == COMPACT_FORMAT and columnar_snapshot.available() and (past is None or past[1] is not None):
+            # Serve from the shared columnar snapshot, skipping the JSON decode
+            if past is None:
+                record = table_store.get_active_record(cursor, fiscalYear)
+                snapshot = columnar_snapshot.store.get(fiscalYear, record[1], record[2], get_db_connection) if record else None
+            else:
+                snapshot = columnar_snapshot.store.get_past(fiscalYear, past[0], past[1], get_db_connection)
+            if snapshot is not None and snapshot.exact:
+                response.headers["ETag"] = table_store.version_etag(snapshot.version)
+                result = snapshot.to_compact()
+                result["version"] = snapshot.version
+                return result
+
         print(f"Executing query for fiscalYear: {fiscalYear}")
-        cursor.execute('SELECT * FROM table_data WHERE fiscal_year = ? AND is_deleted = 0', (fiscalYear,))
-        row = cursor.fetchone()
+        if past is None:
+            cursor.execute('SELECT * FROM table_data_content WHERE fiscal_year = ? AND is_deleted = 0', (fiscalYear,))
+            row = cursor.fetchone()
+        elif past[1] is not None:
+            cursor.execute('SELECT data, ? AS version FROM table_blobs WHERE hash = ?', (past[0], past[1]))
+            row = cursor.fetchone()
+        else:
+            row = None
         print(f"Query result: {row is not None}")
         if row:
-            print(f"Row keys: {list(row.keys())}")
             data = json.loads(row['data'])
+            version = row['version']
             print(f"Data loaded, length: {len(data)}")
         else:
             data = []
-        result = {"data": data}
-        print(f"Returning result: {result}")
-        return result
+            version = 0
+        # The version doubles as ETag for If-Match on writes
+        response.headers["ETag"] = table_store.version_etag(version)
+        if format == COMPACT_FORMAT:
+            result = encode_compact(data)
+            result["version"] = version
+            return result
+        return {"data": data, "version": version}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in get_table_data: {e}")
         import traceback
@@ -561,78 +965,163 @@ def get_table_data(fiscalYear: str = Query(..., description="Fiscal Year")):
 
 # Additional route with /api prefix for direct access
 @app.get("/api/table-data")
-def api_get_table_data(fiscalYear: str = Query(..., description="Fiscal Year")):
-    return get_table_data(fiscalYear)
+def api_get_table_data(
+    response: Response,
+    fiscalYear: str = Query(..., description="Fiscal Year"),
+    format: Optional[str] = Query(None, description="Response format: 'compact' for column-wise dictionary encoding"),
+    asOf: Optional[str] = Query(None, description="Return the version that was current at this ISO 8601 timestamp (or end of this date)")
+):
+    return get_table_data(response, fiscalYear, format, asOf)
 
-@app.post("/table-data")
-def save_table_data(request: TableDataRequest):
+def version_conflict_error(cursor, conflict: table_store.VersionConflict, submitted_rows: Optional[List[Dict[str, Any]]] = None):
+    """
+    Builds the 409 for a failed version check. When the client sent rows, the
+    detail lists how the stored sheet differs from them (row-level, changed
+    fields as [submitted, stored]) so the client can rebase its edit.
+    """
+    detail = {
+        "message": "Table data was modified by another request",
+        "fiscalYear": conflict.fiscal_year,
+        "expectedVersion": conflict.expected_version,
+        "currentVersion": conflict.current_version,
+    }
+    if submitted_rows is not None:
+        cursor.execute('SELECT data FROM table_data_content WHERE fiscal_year = ? AND is_deleted = 0', (conflict.fiscal_year,))
+        row = cursor.fetchone()
+        current_rows = json.loads(row[0]) if row else []
+        detail["conflicts"] = row_diff.diff_rows(submitted_rows, current_rows)
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=detail,
+        headers={"ETag": table_store.version_etag(conflict.current_version)}
+    )
+
+def table_data_changed(fiscal_year: str, rows: Optional[List[Dict[str, Any]]] = None, version: Optional[int] = None):
+    """
+    Refreshes in-memory views of table data after a committed write and tells
+    the other workers about it. Pass the new active rows and version when the
+    caller has them; otherwise views reload lazily.
+    """
+    generations.bump(generations.TABLE_DATA)
+    if rows is not None and version is not None:
+        autocomplete.index.update_year(fiscal_year, rows, version)
+    else:
+        autocomplete.index.invalidate(fiscal_year)
+
+def persist_table_data(fiscal_year: str, data_dicts: List[Dict[str, Any]], expected_version: Optional[int] = None) -> int:
+    """Serializes and stores a full sheet as the active record, returning its version."""
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        fiscal_year = request.fiscalYear
-        # Convert TableRow objects to dictionaries
-        data_dicts = []
-        for row in request.data:
-            try:
-                data_dicts.append(row.dict())
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Error converting row to dict: {str(e)}")
-       
         data_json = json.dumps(data_dicts)
-       
-        # Check if there's already an active record for this fiscal year
-        cursor.execute('SELECT id, version FROM table_data WHERE fiscal_year = ? AND is_deleted = 0', (fiscal_year,))
-        existing_record = cursor.fetchone()
-       
-        if existing_record:
-            # Update existing active record
-            next_version = existing_record['version'] + 1
-            cursor.execute('''
-                UPDATE table_data
-                SET data = ?, version = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (data_json, next_version, existing_record['id']))
-        else:
-            # Get current max version for this fiscal year
-            cursor.execute('SELECT MAX(version) FROM table_data WHERE fiscal_year = ?', (fiscal_year,))
-            row = cursor.fetchone()
-            next_version = (row[0] if row[0] is not None else 0) + 1
-           
-            # Insert new active record
-            cursor.execute('''
-                INSERT INTO table_data (fiscal_year, data, version, is_deleted)
-                VALUES (?, ?, ?, 0)
-            ''', (fiscal_year, data_json, next_version))
-           
+
+        # Check the version and write in one transaction
+        begin_immediate(cursor)
+        previous = table_store.get_active_record(cursor, fiscal_year)
+        base_hash = previous[2] if previous else None
+        # Diff against the rows this worker last saved when they are the base,
+        # decoding the stored sheet only when they are not
+        old_index = table_deltas.base_rows.get(fiscal_year, base_hash) if previous else {}
+        if old_index is None:
+            cursor.execute('SELECT data FROM table_data_content WHERE id = ?', (previous[0],))
+            old_index = row_diff.index_rows(json.loads(cursor.fetchone()[0]))
+        new_index = row_diff.index_rows(data_dicts)
+        next_version = table_store.write_active_data(cursor, fiscal_year, data_json, expected_version)
+        delta = table_deltas.compute_indexed(old_index, new_index)
+        table_deltas.record(cursor, fiscal_year, next_version, delta, base_hash)
+        change_feed.record(cursor, change_feed.TABLE_DATA, fiscal_year, next_version, change_feed.changed_row_ids(delta))
+        saved_hash = table_store.get_active_record(cursor, fiscal_year)[2]
         conn.commit()
-       
-        return {"message": "Table data saved successfully", "version": next_version}
+        table_deltas.base_rows.put(fiscal_year, saved_hash, new_index)
+        table_data_changed(fiscal_year, data_dicts, next_version)
+        return next_version
+    except table_store.VersionConflict as conflict:
+        error = version_conflict_error(cursor, conflict, data_dicts)
+        conn.rollback()
+        raise error
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+# Bursts of unconditional saves for one fiscal year are persisted once, with the latest data
+table_data_coalescer = WriteCoalescer('table_data.save', TABLE_DATA_COALESCE_WINDOW_MS / 1000, persist_table_data)
+
+@app.post("/table-data")
+def save_table_data(
+    request: TableDataRequest,
+    if_match: Optional[str] = Header(None),
+    locationCheck: Optional[str] = Query(None, description="Validate locationCode against location relationships: 'check' or 'fill'")
+):
+    fiscal_year = request.fiscalYear
+    try:
+        expected_version = table_store.resolve_expected_version(if_match, request.expectedVersion)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Convert TableRow objects to dictionaries
+    data_dicts = []
+    for row in request.data:
+        try:
+            data_dicts.append(row.dict())
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error converting row to dict: {str(e)}")
+
+    try:
+        location_report = location_index.validate_for_year(fiscal_year, data_dicts, locationCheck, get_db_connection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if expected_version is None:
+            next_version = table_data_coalescer.submit(fiscal_year, data_dicts)
+        else:
+            # Version-checked saves must not be merged with other writes
+            next_version = persist_table_data(fiscal_year, data_dicts, expected_version)
+        result = {"message": "Table data saved successfully", "version": next_version}
+        if location_report is not None:
+            result["locationReport"] = location_report
+        return result
     except HTTPException:
         raise
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to save data to database: {str(e)}")
-    finally:
-        conn.close()
 
 # Additional route with /api prefix for direct access
 @app.post("/api/table-data")
-def api_save_table_data(request: TableDataRequest):
-    return save_table_data(request)
+def api_save_table_data(
+    request: TableDataRequest,
+    if_match: Optional[str] = Header(None),
+    locationCheck: Optional[str] = Query(None, description="Validate locationCode against location relationships: 'check' or 'fill'")
+):
+    return save_table_data(request, if_match, locationCheck)
 
 @app.delete("/table-data")
-def delete_table_data(fiscalYear: str = Query(..., description="Fiscal Year")):
+def delete_table_data(
+    fiscalYear: str = Query(..., description="Fiscal Year"),
+    expectedVersion: Optional[int] = Query(None, description="Only delete if the active version matches"),
+    if_match: Optional[str] = Header(None)
+):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
+        expected_version = table_store.resolve_expected_version(if_match, expectedVersion)
+        begin_immediate(cursor)
+        table_store.check_version(cursor, fiscalYear, expected_version)
+        # The active record becomes a backup under a new version; older backups keep theirs
+        deleted_version = table_store.next_version(cursor, fiscalYear)
         cursor.execute('''
             UPDATE table_data
-            SET is_deleted = 1, version = version + 1, updated_at = CURRENT_TIMESTAMP
-            WHERE fiscal_year = ?
-        ''', (fiscalYear,))
+            SET is_deleted = 1, version = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE fiscal_year = ? AND is_deleted = 0
+        ''', (deleted_version, fiscalYear))
        
         if cursor.rowcount > 0:
+            table_store.log_version(cursor, fiscalYear, deleted_version, None)
+            change_feed.record(cursor, change_feed.TABLE_DATA, fiscalYear, deleted_version)
             conn.commit()
+            table_data_changed(fiscalYear)
             return {"message": "Table data marked as deleted successfully"}
         else:
             # Check if it existed at all
@@ -641,6 +1130,12 @@ def delete_table_data(fiscalYear: str = Query(..., description="Fiscal Year")):
                  return {"message": "Table data already marked as deleted"}
             else:
                 raise HTTPException(status_code=404, detail="Table data not found")
+    except table_store.VersionConflict as conflict:
+        conn.rollback()
+        raise version_conflict_error(cursor, conflict)
+    except ValueError as e:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
@@ -651,8 +1146,247 @@ def delete_table_data(fiscalYear: str = Query(..., description="Fiscal Year")):
 
 # Additional route with /api prefix for direct access
 @app.delete("/api/table-data")
-def api_delete_table_data(fiscalYear: str = Query(..., description="Fiscal Year")):
-    return delete_table_data(fiscalYear)
+def api_delete_table_data(
+    fiscalYear: str = Query(..., description="Fiscal Year"),
+    expectedVersion: Optional[int] = Query(None, description="Only delete if the active version matches"),
+    if_match: Optional[str] = Header(None)
+):
+    return delete_table_data(fiscalYear, expectedVersion, if_match)
+
+# Net changes above this many rows are answered with the full sheet instead
+TABLE_CHANGES_MAX_ROWS = int(os.environ.get("TABLE_CHANGES_MAX_ROWS", "5000"))
+
+@app.get("/table-data/changes")
+def get_table_data_changes(
+    response: Response,
+    fiscalYear: str = Query(..., description="Fiscal Year"),
+    since: int = Query(..., ge=0, description="Version the client already holds")
+):
+    """
+    Rows inserted, updated (latest contents) and deleted (ids) between version
+    `since` and the active version, composed from the stored deltas. When the
+    history does not reach back that far, or the net change is too large, the
+    response is the full sheet with "full": true.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        record = table_store.get_active_record(cursor, fiscalYear)
+        if record is not None and 0 < since <= record[1]:
+            try:
+                deltas = table_deltas.load(cursor, fiscalYear, since, record[1])
+                changes = table_deltas.compose(deltas, TABLE_CHANGES_MAX_ROWS)
+                metrics.counter("table_data.changes.delta").inc()
+                response.headers["ETag"] = table_store.version_etag(record[1])
+                return {"fiscalYear": fiscalYear, "since": since, "version": record[1], "full": False, **changes}
+            except table_deltas.DeltaUnavailable:
+                pass
+
+        # Fall back to the full sheet, read with its version in one statement
+        metrics.counter("table_data.changes.full").inc()
+        cursor.execute('SELECT data, version FROM table_data_content WHERE fiscal_year = ? AND is_deleted = 0', (fiscalYear,))
+        row = cursor.fetchone()
+        data, version = (json.loads(row[0]), row[1]) if row else ([], 0)
+        response.headers["ETag"] = table_store.version_etag(version)
+        return {"fiscalYear": fiscalYear, "since": since, "version": version, "full": True, "data": data}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+
+# Additional route with /api prefix for direct access
+@app.get("/api/table-data/changes")
+def api_get_table_data_changes(
+    response: Response,
+    fiscalYear: str = Query(..., description="Fiscal Year"),
+    since: int = Query(..., ge=0, description="Version the client already holds")
+):
+    return get_table_data_changes(response, fiscalYear, since)
+
+# --- Table Data Export and Comparison Endpoints ---
+
+def parse_list_param(values: List[str]) -> List[str]:
+    # Accept both repeated parameters and comma-separated lists
+    parsed = []
+    for value in values:
+        for item in value.split(','):
+            item = item.strip()
+            if item and item not in parsed:
+                parsed.append(item)
+    return parsed
+
+@app.get("/table-data/export")
+def export_table_data(
+    fiscalYear: List[str] = Query(..., description="Fiscal Year(s), repeated or comma-separated"),
+    format: str = Query(table_export.ARROW_FORMAT, description="Export format: 'arrow' (IPC stream), 'parquet', 'csv' or 'xlsx'"),
+    group: Optional[str] = None,
+    ppaMerchant: Optional[str] = None,
+    type: Optional[str] = None,
+    locationCode: Optional[str] = None,
+    location: Optional[str] = None,
+    connectivity: Optional[str] = None
+):
+    if format not in table_export.EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Valid formats: {list(table_export.EXPORT_MEDIA_TYPES)}")
+    if format in (table_export.ARROW_FORMAT, table_export.PARQUET_FORMAT) and table_export.pa is None:
+        raise HTTPException(status_code=501, detail="Arrow/Parquet export requires the pyarrow package")
+    if format == table_export.XLSX_FORMAT and table_export.Workbook is None:
+        raise HTTPException(status_code=501, detail="Excel export requires the openpyxl package")
+    fiscal_years = parse_list_param(fiscalYear)
+    if not fiscal_years:
+        raise HTTPException(status_code=400, detail="At least one fiscalYear is required")
+    if format in table_export.SHEET_FORMATS and len(fiscal_years) != 1:
+        raise HTTPException(status_code=400, detail=f"{format} export takes exactly one fiscalYear")
+
+    # Same filters as the analytics table
+    filters = {
+        'group': group,
+        'ppaMerchant': ppaMerchant,
+        'type': type,
+        'locationCode': locationCode,
+        'location': location,
+        'connectivity': connectivity
+    }
+    filename = f"table-data_{'_'.join(fiscal_years)}.{table_export.EXPORT_EXTENSIONS[format]}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+    if format in table_export.SHEET_FORMATS:
+        # The generator opens its connection when the body starts and closes it
+        # once sent; chunks may be pulled from different threadpool threads
+        connect = functools.partial(get_db_connection, check_same_thread=False)
+        if format == table_export.CSV_FORMAT:
+            body = table_export.stream_csv(connect, fiscal_years[0], filters)
+        else:
+            body = table_export.stream_xlsx(connect, fiscal_years[0], filters)
+        return StreamingResponse(body, media_type=table_export.EXPORT_MEDIA_TYPES[format], headers=headers)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        table = None
+        if columnar_snapshot.available():
+            # Filter and encode the shared columnar snapshots when every year has an exact one
+            versions = aggregates.fetch_active_versions(cursor, fiscal_years)
+            snapshots = [columnar_snapshot.store.get(year, *versions[year], get_db_connection) for year in sorted(versions)]
+            if snapshots and all(snapshot is not None and snapshot.exact for snapshot in snapshots):
+                table = columnar_snapshot.build_arrow_table(snapshots, filters)
+        if table is None:
+            columns = table_export.fetch_table_columns(cursor, fiscal_years, filters)
+            table = table_export.build_arrow_table(columns)
+        content = table_export.serialize_arrow_table(table, format)
+        return Response(
+            content=content,
+            media_type=table_export.EXPORT_MEDIA_TYPES[format],
+            headers=headers
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export table data: {str(e)}")
+    finally:
+        conn.close()
+
+# Additional route with /api prefix for direct access
+@app.get("/api/table-data/export")
+def api_export_table_data(
+    fiscalYear: List[str] = Query(..., description="Fiscal Year(s), repeated or comma-separated"),
+    format: str = Query(table_export.ARROW_FORMAT, description="Export format: 'arrow' (IPC stream), 'parquet', 'csv' or 'xlsx'"),
+    group: Optional[str] = None,
+    ppaMerchant: Optional[str] = None,
+    type: Optional[str] = None,
+    locationCode: Optional[str] = None,
+    location: Optional[str] = None,
+    connectivity: Optional[str] = None
+):
+    return export_table_data(fiscalYear, format, group, ppaMerchant, type, locationCode, location, connectivity)
+
+@app.get("/table-data/compare")
+def compare_table_data(
+    fiscalYear: List[str] = Query(..., description="Fiscal Years to compare, repeated or comma-separated"),
+    groupBy: List[str] = Query(['group'], description="Dimensions to group by, repeated or comma-separated")
+):
+    fiscal_years = parse_list_param(fiscalYear)
+    group_by = parse_list_param(groupBy)
+    if not fiscal_years:
+        raise HTTPException(status_code=400, detail="At least one fiscalYear is required")
+    invalid = [column for column in group_by if column not in aggregates.GROUP_BY_COLUMNS]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid groupBy {invalid}. Valid dimensions: {aggregates.GROUP_BY_COLUMNS}")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        versions = aggregates.fetch_active_versions(cursor, fiscal_years)
+
+        # Reuse cached per-year aggregates, fetch the rest in one query
+        per_year = {}
+        missing = []
+        for year in fiscal_years:
+            if year not in versions:
+                per_year[year] = {}
+                continue
+            cached = aggregates.aggregate_cache.get((year, *versions[year], tuple(group_by)))
+            if cached is None:
+                missing.append(year)
+            else:
+                per_year[year] = cached
+
+        if missing and columnar_snapshot.available():
+            # Aggregate the shared columnar snapshots where they can be had
+            for year in list(missing):
+                snapshot = columnar_snapshot.store.get(year, *versions[year], get_db_connection)
+                if snapshot is not None:
+                    per_year[year] = snapshot.aggregate(group_by)
+                    aggregates.aggregate_cache.put((year, snapshot.version, snapshot.blob_hash, tuple(group_by)), per_year[year])
+                    missing.remove(year)
+
+        if missing:
+            fetched = aggregates.fetch_year_aggregates(cursor, missing, group_by)
+            fetched_by_year = {year: ((version, blob_hash), values) for (year, version, blob_hash), values in fetched.items()}
+            for year in missing:
+                # Years with an empty sheet have no aggregate rows
+                active, values = fetched_by_year.get(year, (versions[year], {}))
+                aggregates.aggregate_cache.put((year, *active, tuple(group_by)), values)
+                per_year[year] = values
+
+        return aggregates.build_comparison(fiscal_years, group_by, per_year)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compare table data: {str(e)}")
+    finally:
+        conn.close()
+
+# Additional route with /api prefix for direct access
+@app.get("/api/table-data/compare")
+def api_compare_table_data(
+    fiscalYear: List[str] = Query(..., description="Fiscal Years to compare, repeated or comma-separated"),
+    groupBy: List[str] = Query(['group'], description="Dimensions to group by, repeated or comma-separated")
+):
+    return compare_table_data(fiscalYear, groupBy)
+
+# --- Autocomplete Endpoints ---
+
+@app.get("/autocomplete")
+def autocomplete_values(
+    field: str = Query(..., description="One of spv, pss, location, locationCode"),
+    q: str = Query("", description="Prefix of the value or of a word in it"),
+    limit: int = Query(10, ge=1, le=100),
+    fiscalYear: Optional[str] = Query(None, description="Restrict to one fiscal year")
+):
+    if field not in autocomplete.AUTOCOMPLETE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Invalid field. Valid fields: {autocomplete.AUTOCOMPLETE_FIELDS}")
+    try:
+        matches = autocomplete.index.search(get_db_connection, field, q, limit, fiscalYear)
+        return {"field": field, "query": q, "matches": matches}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Additional route with /api prefix for direct access
+@app.get("/api/autocomplete")
+def api_autocomplete_values(
+    field: str = Query(..., description="One of spv, pss, location, locationCode"),
+    q: str = Query("", description="Prefix of the value or of a word in it"),
+    limit: int = Query(10, ge=1, le=100),
+    fiscalYear: Optional[str] = Query(None, description="Restrict to one fiscal year")
+):
+    return autocomplete_values(field, q, limit, fiscalYear)
 
 # --- Location Relationships Endpoints ---
 
@@ -691,6 +1425,7 @@ def save_location_relationships(
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
+        begin_immediate(cursor)
         # Soft delete existing
         cursor.execute('''
             UPDATE location_relationships
@@ -705,7 +1440,10 @@ def save_location_relationships(
                 VALUES (?, ?, ?, 1)
             ''', (fiscalYear, rel.location, rel.locationCode))
            
+        config_version = master_data.bump_config_version(cursor)
+        change_feed.record(cursor, change_feed.LOCATION_RELATIONSHIPS, fiscalYear, config_version)
         conn.commit()
+        generations.bump(generations.LOCATION_RELATIONSHIPS)
         return relationships
     except Exception as e:
         conn.rollback()
@@ -726,6 +1464,33 @@ def api_save_location_relationships(
 ):
     return save_location_relationships(relationships, fiscalYear)
 
+@app.post("/location-relationships/validate")
+def validate_location_codes(
+    rows: List[Dict[str, Any]] = Body(...),
+    fiscalYear: str = Query("FY_25"),
+    mode: str = Query(location_index.CHECK_MODE, description="'check' to report, 'fill' to also fill empty locationCodes")
+):
+    # Checks (or fills) locationCode of the given rows against the year's relationships
+    try:
+        report = location_index.validate_for_year(fiscalYear, rows, mode, get_db_connection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    result = {"fiscalYear": fiscalYear, "report": report}
+    if mode == location_index.FILL_MODE:
+        result["data"] = rows
+    return result
+
+# Additional route with /api prefix for direct access
+@app.post("/api/location-relationships/validate")
+def api_validate_location_codes(
+    rows: List[Dict[str, Any]] = Body(...),
+    fiscalYear: str = Query("FY_25"),
+    mode: str = Query(location_index.CHECK_MODE, description="'check' to report, 'fill' to also fill empty locationCodes")
+):
+    return validate_location_codes(rows, fiscalYear, mode)
+
 # --- Backup Data Endpoints ---
 
 @app.get("/backup-data")
@@ -736,7 +1501,7 @@ def get_backups(fiscalYear: str = Query("FY_25")):
     try:
         cursor.execute('''
             SELECT id, fiscal_year, data, version, is_deleted, created_at, updated_at
-            FROM table_data
+            FROM table_data_content
             WHERE fiscal_year = ?
             ORDER BY version DESC
         ''', (fiscalYear,))
@@ -759,14 +1524,18 @@ def get_backups(fiscalYear: str = Query("FY_25")):
         conn.close()
 
 @app.post("/backup-data/restore")
-def restore_backup(request: RestoreBackupRequest):
+def restore_backup(request: RestoreBackupRequest, if_match: Optional[str] = Header(None)):
     conn = get_db_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     try:
-        # Get specific version
+        expected_version = table_store.resolve_expected_version(if_match, request.expectedVersion)
+        begin_immediate(cursor)
+        table_store.check_version(cursor, request.fiscalYear, expected_version)
+
+        # Get specific version; only records written before the blob store need their data
         cursor.execute('''
-            SELECT data FROM table_data
+            SELECT CASE WHEN blob_hash IS NULL THEN data END AS data, blob_hash FROM table_data
             WHERE fiscal_year = ? AND version = ?
         ''', (request.fiscalYear, request.version))
        
@@ -782,23 +1551,24 @@ def restore_backup(request: RestoreBackupRequest):
         # But my `save_table_data` updates the existing row if `is_deleted=0`.
         # So here I should update that row too.
        
-        data_str = result['data']
-       
-        cursor.execute('''
-            UPDATE table_data
-            SET data = ?, version = version + 1, updated_at = CURRENT_TIMESTAMP
-            WHERE fiscal_year = ? AND is_deleted = 0
-        ''', (data_str, request.fiscalYear))
-       
-        if cursor.rowcount == 0:
-            # If no active record, insert one
-            cursor.execute('''
-                INSERT INTO table_data (fiscal_year, data, version)
-                VALUES (?, ?, 1)
-            ''', (request.fiscalYear, data_str))
-           
+        # The content is stored once: restoring repoints the active record at it
+        # under a new version (inserting an active record if the year was deleted)
+        blob_hash = result['blob_hash'] or table_store.store_blob(cursor, result['data'])
+        active_record = table_store.get_active_record(cursor, request.fiscalYear)
+        restored_version = table_store.set_active_blob(cursor, request.fiscalYear, active_record, blob_hash)
+
+        # Recorded as a wholesale replacement, so the restore never decodes either sheet
+        table_deltas.record(cursor, request.fiscalYear, restored_version, None)
+        change_feed.record(cursor, change_feed.TABLE_DATA, request.fiscalYear, restored_version)
         conn.commit()
+        table_data_changed(request.fiscalYear)
         return {"message": "Data restored successfully"}
+    except table_store.VersionConflict as conflict:
+        conn.rollback()
+        raise version_conflict_error(cursor, conflict)
+    except ValueError as e:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
@@ -854,10 +1624,15 @@ def delete_backup(fiscalYear: str = Query(...), version: int = Query(...)):
         cursor.execute('''
             DELETE FROM table_data
             WHERE fiscal_year = ? AND version = ? AND is_deleted = 1
+            RETURNING blob_hash
         ''', (fiscalYear, version))
-       
-        if cursor.rowcount > 0:
+        released = {row[0] for row in cursor.fetchall()}
+
+        if released:
+            for blob_hash in released:
+                table_store.release_blob(cursor, blob_hash)
             conn.commit()
+            version_diff.history_rewritten()
             return {"message": "Backup version deleted successfully"}
         else:
              raise HTTPException(status_code=404, detail="Backup version not found or not deleted")
@@ -869,6 +1644,24 @@ def delete_backup(fiscalYear: str = Query(...), version: int = Query(...)):
     finally:
         conn.close()
 
+@app.get("/backup-data/diff")
+def diff_backups(
+    fiscalYear: str = Query(...),
+    from_version: int = Query(..., alias="from", description="Older version"),
+    to_version: int = Query(..., alias="to", description="Newer version")
+):
+    """
+    Rows added, removed and modified between two versions of a fiscal year,
+    with the changed fields and capacity deltas. Versions that are no longer
+    stored as records are rebuilt from the stored deltas.
+    """
+    try:
+        return version_diff.cache.get(fiscalYear, from_version, to_version, get_db_connection)
+    except version_diff.VersionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Additional route with /api prefix for direct access
 @app.get("/api/backup-data")
 def api_get_backups(fiscalYear: str = Query("FY_25")):
@@ -876,8 +1669,17 @@ def api_get_backups(fiscalYear: str = Query("FY_25")):
 
 # Additional route with /api prefix for direct access
 @app.post("/api/backup-data/restore")
-def api_restore_backup(request: RestoreBackupRequest):
-    return restore_backup(request)
+def api_restore_backup(request: RestoreBackupRequest, if_match: Optional[str] = Header(None)):
+    return restore_backup(request, if_match)
+
+# Additional route with /api prefix for direct access
+@app.get("/api/backup-data/diff")
+def api_diff_backups(
+    fiscalYear: str = Query(...),
+    from_version: int = Query(..., alias="from", description="Older version"),
+    to_version: int = Query(..., alias="to", description="Newer version")
+):
+    return diff_backups(fiscalYear, from_version, to_version)
 
 # Additional route with /api prefix for direct access
 @app.delete("/api/backup-data")
@@ -944,6 +1746,7 @@ def import_data():
     results = []
    
     try:
+        begin_immediate(cursor)
         for item in files_map:
             file_path = os.path.join(components_dir, item['file'])
             if not os.path.exists(file_path):
@@ -963,22 +1766,19 @@ def import_data():
             converted_data = [convert_to_table_row(row, i) for i, row in enumerate(raw_data)]
             data_json = json.dumps(converted_data)
            
-            # Upsert logic
-            cursor.execute('SELECT 1 FROM table_data WHERE fiscal_year = ?', (item['name'],))
-            exists = cursor.fetchone()
-           
-            if exists:
-                cursor.execute('''
-                    UPDATE table_data
-                    SET data = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE fiscal_year = ?
-                ''', (data_json, item['name']))
-            else:
-                cursor.execute('''
-                    INSERT INTO table_data (fiscal_year, data, version)
-                    VALUES (?, ?, 1)
-                ''', (item['name'], data_json))
-               
+            # Upsert logic; re-importing an unchanged file writes nothing
+            imported_version = table_store.import_sheet(cursor, item['name'], data_json)
+            if imported_version is None:
+                results.append({
+                    'fiscalYear': item['name'],
+                    'message': 'Data unchanged',
+                    'count': len(converted_data),
+                    'unchanged': True
+                })
+                continue
+
+            change_feed.record(cursor, change_feed.TABLE_DATA, item['name'], imported_version)
+
             results.append({
                 'fiscalYear': item['name'],
                 'message': 'Data imported successfully',
@@ -986,6 +1786,9 @@ def import_data():
             })
            
         conn.commit()
+        for result in results:
+            if result['count'] and not result.get('unchanged'):
+                table_data_changed(result['fiscalYear'])
         return {"message": "All fiscal year data imported successfully", "results": results}
        
     except Exception as e:
@@ -1003,64 +1806,53 @@ def import_default_data():
 
 # Add this new endpoint after the existing import endpoints
 @app.post("/import-data-from-frontend")
-def import_data_from_frontend(request: TableDataRequest):
+def import_data_from_frontend(
+    request: TableDataRequest,
+    if_match: Optional[str] = Header(None),
+    locationCheck: Optional[str] = Query(None, description="Validate locationCode against location relationships: 'check' or 'fill'")
+):
     """
     Import data directly from frontend - useful for production environments
     where local JSON files might not be available
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    fiscal_year = request.fiscalYear
     try:
-        fiscal_year = request.fiscalYear
-        # Convert TableRow objects to dictionaries if needed
-        data_dicts = []
-        for row in request.data:
-            if hasattr(row, 'dict'):
-                data_dicts.append(row.dict())
-            else:
-                data_dicts.append(row)
-       
-        data_json = json.dumps(data_dicts)
-       
-        # Check if there's already an active record for this fiscal year
-        cursor.execute('SELECT id, version FROM table_data WHERE fiscal_year = ? AND is_deleted = 0', (fiscal_year,))
-        existing_record = cursor.fetchone()
-       
-        if existing_record:
-            # Update existing active record
-            next_version = existing_record['version'] + 1
-            cursor.execute('''
-                UPDATE table_data
-                SET data = ?, version = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (data_json, next_version, existing_record['id']))
+        expected_version = table_store.resolve_expected_version(if_match, request.expectedVersion)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Convert TableRow objects to dictionaries if needed
+    data_dicts = []
+    for row in request.data:
+        if hasattr(row, 'dict'):
+            data_dicts.append(row.dict())
         else:
-            # Get current max version for this fiscal year
-            cursor.execute('SELECT MAX(version) FROM table_data WHERE fiscal_year = ?', (fiscal_year,))
-            row = cursor.fetchone()
-            next_version = (row[0] if row[0] is not None else 0) + 1
-           
-            # Insert new active record
-            cursor.execute('''
-                INSERT INTO table_data (fiscal_year, data, version, is_deleted)
-                VALUES (?, ?, ?, 0)
-            ''', (fiscal_year, data_json, next_version))
-           
-        conn.commit()
-       
-        return {"message": "Table data imported successfully", "version": next_version, "count": len(data_dicts)}
+            data_dicts.append(row)
+
+    try:
+        location_report = location_index.validate_for_year(fiscal_year, data_dicts, locationCheck, get_db_connection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        next_version = persist_table_data(fiscal_year, data_dicts, expected_version)
+        result = {"message": "Table data imported successfully", "version": next_version, "count": len(data_dicts)}
+        if location_report is not None:
+            result["locationReport"] = location_report
+        return result
     except HTTPException:
         raise
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to import data: {str(e)}")
-    finally:
-        conn.close()
 
 # Additional route with /api prefix for direct access
 @app.post("/api/import-data-from-frontend")
-def api_import_data_from_frontend(request: TableDataRequest):
-    return import_data_from_frontend(request)
+def api_import_data_from_frontend(
+    request: TableDataRequest,
+    if_match: Optional[str] = Header(None),
+    locationCheck: Optional[str] = Query(None, description="Validate locationCode against location relationships: 'check' or 'fill'")
+):
+    return import_data_from_frontend(request, if_match, locationCheck)
 
 # Additional route with /api prefix for direct access
 @app.post("/api/import-data")
@@ -0,0 +1,212 @@
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import threading
+import generations
+
+# Database option types and the keys the API uses for them
+OPTION_TYPE_KEYS = {
+    'groups': 'groups',
+    'ppa-merchants': 'ppaMerchants',
+    'types': 'types',
+    'location-codes': 'locationCodes',
+    'locations': 'locations',
+    'connectivities': 'connectivities',
+}
+
+# API keys back to database option types
+API_KEY_OPTION_TYPES = {api_key: option_type for option_type, api_key in OPTION_TYPE_KEYS.items()}
+
+DEFAULT_LOCATION_RELATIONSHIPS = [
+    {'location': 'Khavda', 'locationCode': 'Khavda'},
+    {'location': 'Baap', 'locationCode': 'RJ'},
+    {'location': 'Essel', 'locationCode': 'RJ'},
+]
+
+
+class MasterDataSnapshot:
+    """
+    Prebuilt master data response (every option type plus the location
+    relationships of one fiscal year), serialized once with its ETag.
+    """
+
+    def __init__(self, generation: Tuple[int, int], body: bytes):
+        self.generation = generation
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+_lock = threading.Lock()
+_snapshots: Dict[str, MasterDataSnapshot] = {}
+
+
+def _current_generation() -> Tuple[int, int]:
+    return (
+        generations.current(generations.DROPDOWN_OPTIONS),
+        generations.current(generations.LOCATION_RELATIONSHIPS),
+    )
+
+
+def get_config_version(cursor) -> int:
+    cursor.execute('SELECT version FROM config_version WHERE id = 1')
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def bump_config_version(cursor) -> int:
+    """Increments the shared configuration version inside the caller's transaction."""
+    cursor.execute('''
+        INSERT INTO config_version (id, version) VALUES (1, 1)
+        ON CONFLICT(id) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        RETURNING version
+    ''')
+    return cursor.fetchone()[0]
+
+
+def build_master_data(cursor, fiscal_year: str) -> Dict:
+    """Reads all active options and the year's relationships into one payload."""
+    options = {api_key: [] for api_key in OPTION_TYPE_KEYS.values()}
+    cursor.execute('SELECT option_type, option_value FROM dropdown_options WHERE is_deleted = 0')
+    for option_type, option_value in cursor.fetchall():
+        api_key = OPTION_TYPE_KEYS.get(option_type, option_type)
+        options.setdefault(api_key, []).append(option_value)
+
+    cursor.execute('''
+        SELECT location, location_code FROM location_relationships
+        WHERE fiscal_year = ? AND is_deleted = 0
+    ''', (fiscal_year,))
+    relationships = [
+        {'location': location, 'locationCode': location_code}
+        for location, location_code in cursor.fetchall()
+    ]
+
+    return {
+        'fiscalYear': fiscal_year,
+        'version': get_config_version(cursor),
+        'options': options,
+        # Same fallback as GET /location-relationships
+        'relationships': relationships or DEFAULT_LOCATION_RELATIONSHIPS,
+    }
+
+
+def get_snapshot(fiscal_year: str, connect) -> MasterDataSnapshot:
+    """
+    Returns the snapshot for a fiscal year, rebuilding it only when options or
+    relationships have changed since it was built. `connect` opens a database
+    connection and is only called on a rebuild.
+    """
+    generation = _current_generation()
+    snapshot = _snapshots.get(fiscal_year)
+    if snapshot is not None and snapshot.generation == generation:
+        return snapshot
+
+    with _lock:
+        # Read the generation before the data, so a concurrent write leaves
+        # the snapshot stale rather than wrongly current
+        generation = _current_generation()
+        snapshot = _snapshots.get(fiscal_year)
+        if snapshot is not None and snapshot.generation == generation:
+            return snapshot
+        conn = connect()
+        try:
+            conn.row_factory = None
+            payload = build_master_data(conn.cursor(), fiscal_year)
+        finally:
+            conn.close()
+        snapshot = MasterDataSnapshot(generation, json.dumps(payload).encode('utf-8'))
+        _snapshots[fiscal_year] = snapshot
+        return snapshot
+
+
+def _diff_active(active_rows, wanted: List) -> Tuple[List[int], List]:
+    """
+    Compares active (id, value) rows with the wanted values and returns the row
+    ids to soft-delete and the values to insert. Duplicate rows are removed.
+    """
+    kept = set()
+    removed_ids = []
+    wanted_set = set(wanted)
+    for row_id, value in active_rows:
+        if value in wanted_set and value not in kept:
+            kept.add(value)
+        else:
+            removed_ids.append(row_id)
+    added = []
+    for value in wanted:
+        if value not in kept:
+            kept.add(value)
+            added.append(value)
+    return removed_ids, added
+
+
+def apply_master_data_update(
+    cursor,
+    fiscal_year: str,
+    options: Dict[str, List[str]],
+    relationships: Optional[List[Tuple[str, str]]]
+) -> Dict:
+    """
+    Applies only the differences between the stored and the submitted option
+    lists and relationships, with executemany, inside the caller's transaction.
+    Returns per-resource change counts and the configuration version, which is
+    bumped once when anything changed.
+    """
+    changes = {}
+    options_changed = False
+
+    for key, values in options.items():
+        option_type = API_KEY_OPTION_TYPES.get(key, key)
+        if option_type not in OPTION_TYPE_KEYS:
+            raise ValueError(f"Invalid option type '{key}'. Valid types: {list(OPTION_TYPE_KEYS.values())}")
+        cursor.execute(
+            'SELECT id, option_value FROM dropdown_options WHERE option_type = ? AND is_deleted = 0 ORDER BY id',
+            (option_type,)
+        )
+        removed_ids, added = _diff_active(cursor.fetchall(), values)
+        if removed_ids:
+            cursor.executemany('''
+                UPDATE dropdown_options
+                SET is_deleted = 1, version = version + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', [(row_id,) for row_id in removed_ids])
+        if added:
+            cursor.executemany('''
+                INSERT INTO dropdown_options (option_type, option_value, version)
+                VALUES (?, ?, 1)
+            ''', [(option_type, value) for value in added])
+        changes[OPTION_TYPE_KEYS[option_type]] = {'added': len(added), 'removed': len(removed_ids)}
+        options_changed = options_changed or bool(removed_ids or added)
+
+    relationships_changed = False
+    if relationships is not None:
+        cursor.execute('''
+            SELECT id, location, location_code FROM location_relationships
+            WHERE fiscal_year = ? AND is_deleted = 0 ORDER BY id
+        ''', (fiscal_year,))
+        active = [(row_id, (location, location_code)) for row_id, location, location_code in cursor.fetchall()]
+        removed_ids, added = _diff_active(active, relationships)
+        if removed_ids:
+            cursor.executemany('''
+                UPDATE location_relationships
+                SET is_deleted = 1, version = version + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', [(row_id,) for row_id in removed_ids])
+        if added:
+            cursor.executemany('''
+                INSERT INTO location_relationships (fiscal_year, location, location_code, version)
+                VALUES (?, ?, ?, 1)
+            ''', [(fiscal_year, location, location_code) for location, location_code in added])
+        changes['relationships'] = {'added': len(added), 'removed': len(removed_ids)}
+        relationships_changed = bool(removed_ids or added)
+
+    if options_changed or relationships_changed:
+        version = bump_config_version(cursor)
+    else:
+        version = get_config_version(cursor)
+
+    return {
+        'version': version,
+        'changes': changes,
+        'optionsChanged': options_changed,
+        'relationshipsChanged': relationships_changed,
+    }
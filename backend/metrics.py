@@ -0,0 +1,115 @@
+from typing import Dict, List, Optional
+import bisect
+import threading
+
+_lock = threading.Lock()
+_counters: Dict[str, "Counter"] = {}
+_histograms: Dict[str, "Histogram"] = {}
+_gauges: Dict[str, "Gauge"] = {}
+
+# Default histogram buckets for latencies in milliseconds
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """A value that goes up and down, e.g. a queue depth."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with count, sum and max."""
+
+    def __init__(self, buckets: List[float]):
+        self._lock = threading.Lock()
+        self.buckets = sorted(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = None
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, bucket_count in zip(self.buckets + ['+Inf'], self.bucket_counts):
+                cumulative += bucket_count
+                buckets[str(bound)] = cumulative
+            return {
+                'count': self.count,
+                'sum': self.sum,
+                'max': self.max,
+                'mean': self.sum / self.count if self.count else None,
+                'buckets': buckets,
+            }
+
+
+def counter(name: str) -> Counter:
+    """Returns the counter registered under name, creating it on first use."""
+    with _lock:
+        if name not in _counters:
+            _counters[name] = Counter()
+        return _counters[name]
+
+
+def histogram(name: str, buckets: Optional[List[float]] = None) -> Histogram:
+    """Returns the histogram registered under name, creating it on first use."""
+    with _lock:
+        if name not in _histograms:
+            _histograms[name] = Histogram(buckets or LATENCY_BUCKETS_MS)
+        return _histograms[name]
+
+
+def gauge(name: str) -> Gauge:
+    """Returns the gauge registered under name, creating it on first use."""
+    with _lock:
+        if name not in _gauges:
+            _gauges[name] = Gauge()
+        return _gauges[name]
+
+
+def snapshot() -> Dict:
+    """Current values of every registered metric."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = dict(_histograms)
+        gauges = dict(_gauges)
+    return {
+        'counters': {name: metric.snapshot() for name, metric in sorted(counters.items())},
+        'gauges': {name: metric.snapshot() for name, metric in sorted(gauges.items())},
+        'histograms': {name: metric.snapshot() for name, metric in sorted(histograms.items())},
+    }
@@ -0,0 +1,256 @@
+from typing import Callable, List, Tuple
+import hashlib
+import time
+from db_retry import begin_immediate
+
+# Schema migrations, applied in order. The number of the last one applied is
+# kept in PRAGMA user_version, so an up-to-date database costs one header read.
+# Append new migrations at the end; never edit or reorder applied ones.
+
+
+def _create_base_schema(cursor) -> None:
+    # Table Data
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fiscal_year TEXT NOT NULL,
+            data TEXT NOT NULL,
+            version INTEGER DEFAULT 1,
+            is_deleted BOOLEAN DEFAULT FALSE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Dropdown Options
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dropdown_options (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            option_type TEXT NOT NULL,
+            option_value TEXT NOT NULL,
+            version INTEGER DEFAULT 1,
+            is_deleted BOOLEAN DEFAULT FALSE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Location Relationships
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS location_relationships (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fiscal_year TEXT NOT NULL DEFAULT 'FY_25',
+            location TEXT NOT NULL,
+            location_code TEXT NOT NULL,
+            version INTEGER DEFAULT 1,
+            is_deleted BOOLEAN DEFAULT FALSE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Users
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Variables
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS variables (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT NOT NULL,
+            value TEXT,
+            user_id TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Indexes
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_table_data_fiscal_year ON table_data(fiscal_year)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_table_data_fiscal_year_deleted ON table_data(fiscal_year, is_deleted)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_dropdown_options_type ON dropdown_options(option_type)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_dropdown_options_type_deleted ON dropdown_options(option_type, is_deleted)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_location_relationships_fiscal_year ON location_relationships(fiscal_year)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_location_relationships_fiscal_year_deleted ON location_relationships(fiscal_year, is_deleted)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_variables_key_user ON variables(key, user_id)')
+
+
+def _create_config_version(cursor) -> None:
+    # Shared version of the dropdown/relationship configuration
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS config_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _unique_variables(cursor) -> None:
+    # One variable per (key, user); NULL user_id (global variables) counts as one user.
+    # Keep the most recently updated row of any duplicates before enforcing it.
+    cursor.execute('''
+        DELETE FROM variables WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY key, COALESCE(user_id, '')
+                    ORDER BY updated_at DESC, id DESC
+                ) AS rank
+                FROM variables
+            ) WHERE rank = 1
+        )
+    ''')
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_variables_key_user_unique ON variables(key, COALESCE(user_id, ''))")
+
+
+def _create_change_events(cursor) -> None:
+    # Change notifications served by GET /events, in commit order
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            resource TEXT NOT NULL,
+            fiscal_year TEXT,
+            version INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _create_table_data_deltas(cursor) -> None:
+    # Row-level change that produced each table data version, old and new side
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_data_deltas (
+            fiscal_year TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            row_count INTEGER NOT NULL,
+            changes TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (fiscal_year, version)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _create_table_blobs(cursor) -> None:
+    # Sheet JSON stored once per content hash; table_data rows point at it
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_blobs (
+            hash TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('ALTER TABLE table_data ADD COLUMN blob_hash TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_table_data_blob_hash ON table_data(blob_hash)')
+    # Sheet content of every record, whether stored as a blob or inline
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS table_data_content AS
+        SELECT t.id, t.fiscal_year, COALESCE(b.data, t.data) AS data, t.blob_hash,
+               t.version, t.is_deleted, t.created_at, t.updated_at
+        FROM table_data t LEFT JOIN table_blobs b ON b.hash = t.blob_hash
+    ''')
+
+    # Move existing inline sheets into blobs, one record at a time
+    cursor.execute('SELECT id FROM table_data WHERE blob_hash IS NULL')
+    for (record_id,) in cursor.fetchall():
+        cursor.execute('SELECT data FROM table_data WHERE id = ?', (record_id,))
+        data = cursor.fetchone()[0]
+        blob_hash = hashlib.sha256(data.encode('utf-8')).hexdigest()
+        cursor.execute(
+            'INSERT OR IGNORE INTO table_blobs (hash, data, size) VALUES (?, ?, ?)',
+            (blob_hash, data, len(data))
+        )
+        cursor.execute("UPDATE table_data SET data = '', blob_hash = ? WHERE id = ?", (blob_hash, record_id))
+
+
+def _create_table_versions(cursor) -> None:
+    # When each version became active, for reads as of a timestamp
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            fiscal_year TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            blob_hash TEXT,
+            is_deleted BOOLEAN NOT NULL DEFAULT FALSE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (fiscal_year, version)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_table_versions_fiscal_year_created ON table_versions(fiscal_year, created_at, version)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_table_versions_blob_hash ON table_versions(blob_hash)')
+    # Only the active records' times are known; earlier versions start unlogged
+    cursor.execute('''
+        INSERT OR IGNORE INTO table_versions (fiscal_year, version, blob_hash, created_at)
+        SELECT fiscal_year, version, blob_hash, updated_at FROM table_data WHERE is_deleted = 0
+    ''')
+
+
+def _index_version_and_user_lookups(cursor) -> None:
+    # Backup restore/delete look up one (fiscal_year, version); variables are listed per user
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_table_data_fiscal_year_version ON table_data(fiscal_year, version)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_variables_user_id ON variables(user_id)')
+
+
+def _add_delta_base_hash(cursor) -> None:
+    # Content each delta was computed from; rows from before stay NULL and
+    # only chain onto an empty or deleted sheet
+    cursor.execute('ALTER TABLE table_data_deltas ADD COLUMN base_hash TEXT')
+
+
+# (version, description, apply). Migrations 1-3 use IF NOT EXISTS so they also
+# adopt databases created before versioning, which report user_version 0.
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'base schema', _create_base_schema),
+    (2, 'config_version table', _create_config_version),
+    (3, 'unique variables per key and user', _unique_variables),
+    (4, 'change_events table', _create_change_events),
+    (5, 'table_data_deltas table', _create_table_data_deltas),
+    (6, 'content-addressed table_blobs', _create_table_blobs),
+    (7, 'table_versions log', _create_table_versions),
+    (8, 'indexes for version and per-user lookups', _index_version_and_user_lookups),
+    (9, 'base content hash of table_data_deltas', _add_delta_base_hash),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn) -> List[int]:
+    """
+    Brings the schema up to LATEST_VERSION and returns the versions applied.
+    Returns immediately when the database is current; otherwise the pending
+    migrations run in one write transaction, re-checked under the lock so
+    concurrently starting workers apply each migration once.
+    """
+    if schema_version(conn) >= LATEST_VERSION:
+        return []
+
+    cursor = conn.cursor()
+    begin_immediate(cursor)
+    try:
+        current = schema_version(conn)
+        applied = []
+        for version, description, apply in MIGRATIONS:
+            if version <= current:
+                continue
+            started = time.perf_counter()
+            apply(cursor)
+            applied.append(version)
+            print(f"Applied migration {version} ({description}) in {(time.perf_counter() - started) * 1000:.1f} ms")
+        # PRAGMA values cannot be bound; LATEST_VERSION is an int constant
+        cursor.execute(f'PRAGMA user_version = {LATEST_VERSION}')
+        conn.commit()
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
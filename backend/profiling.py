@@ -0,0 +1,227 @@
+from typing import Callable, Dict, List, Optional
+from contextvars import ContextVar
+from datetime import datetime
+import asyncio
+import cProfile
+import functools
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from fastapi.routing import APIRoute
+import database
+import metrics
+
+# Opt-in request profiling. A request is profiled when an admin sends
+# `X-Profile: cpu` (or `cpu,memory` to also trace allocations), or when it is
+# picked by PROFILE_SAMPLE_RATE. Reports are text files in PROFILE_DIR, of
+# which the newest PROFILE_MAX_REPORTS are kept.
+PROFILE_HEADER = b'x-profile'
+PROFILE_DIR = os.environ.get('PROFILE_DIR') or os.path.join(database.DB_DIR, 'profiles')
+PROFILE_MAX_REPORTS = int(os.environ.get('PROFILE_MAX_REPORTS', '50'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_TOP_FUNCTIONS = 40
+PROFILE_TOP_ALLOCATIONS = 25
+
+# Never profiled: the feed stream does not end, and reports should not profile their own download
+EXCLUDED_PREFIXES = ('/events', '/api/events', '/admin/profiles', '/api/admin/profiles')
+
+REPORT_NAME = re.compile(r'^[\w.-]+\.txt$')
+
+
+class _Session:
+    """Profilers of one request: the event loop's and the threadpool worker's."""
+
+    def __init__(self, memory: bool):
+        self.memory = memory
+        self.loop_profile = cProfile.Profile()
+        self.worker_profiles: List[cProfile.Profile] = []
+        self.memory_before = None
+        self.memory_after = None
+        self.memory_peak = None
+
+
+_current: ContextVar[Optional[_Session]] = ContextVar('profiling_session', default=None)
+# One profiled request at a time: cProfile and tracemalloc hooks are per thread
+# and process-wide respectively, so overlapping sessions would see each other
+_busy = threading.Lock()
+
+
+def _profile_in_thread(endpoint: Callable) -> Callable:
+    @functools.wraps(endpoint)
+    def profiled_endpoint(*args, **kwargs):
+        session = _current.get()
+        if session is None:
+            return endpoint(*args, **kwargs)
+        profile = cProfile.Profile()
+        session.worker_profiles.append(profile)
+        return profile.runcall(endpoint, *args, **kwargs)
+    return profiled_endpoint
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Route class whose sync endpoints, which run on the threadpool, join the
+    profile of their request. Costs a context variable lookup when off.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = _profile_in_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _requested_mode(scope) -> Optional[str]:
+    for name, value in scope['headers']:
+        if name == PROFILE_HEADER:
+            return value.decode('latin-1').lower()
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that starts a profiling session for requests that ask
+    for one. `authorize(headers)` decides whether the X-Profile header is
+    honoured; sampled requests get a CPU profile regardless.
+    """
+
+    def __init__(self, app, authorize: Callable[[Dict[str, str]], bool]):
+        self.app = app
+        self.authorize = authorize
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'].startswith(EXCLUDED_PREFIXES):
+            return await self.app(scope, receive, send)
+
+        mode = _requested_mode(scope)
+        if mode is None and not (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE):
+            return await self.app(scope, receive, send)
+        if mode is not None:
+            headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+            if not self.authorize(headers):
+                metrics.counter('profiling.denied').inc()
+                return await self.app(scope, receive, send)
+            trigger = 'header'
+        else:
+            trigger = 'sampled'
+
+        if not _busy.acquire(blocking=False):
+            metrics.counter('profiling.skipped_busy').inc()
+            return await self.app(scope, receive, send)
+        try:
+            await self._profile(scope, receive, send, trigger, memory=bool(mode and 'memory' in mode))
+        finally:
+            _busy.release()
+
+    async def _profile(self, scope, receive, send, trigger: str, memory: bool):
+        session = _Session(memory)
+        status = {'code': None}
+
+        async def send_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        started_tracing = False
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            session.memory_before = tracemalloc.take_snapshot()
+
+        token = _current.set(session)
+        started = time.perf_counter()
+        session.loop_profile.enable()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            session.loop_profile.disable()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            _current.reset(token)
+            if memory:
+                session.memory_after = tracemalloc.take_snapshot()
+                session.memory_peak = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+            try:
+                await asyncio.to_thread(write_report, scope, status['code'], elapsed_ms, trigger, session)
+                metrics.counter('profiling.reports').inc()
+            except Exception as e:
+                metrics.counter('profiling.errors').inc()
+                print(f"Failed to write profile report: {e}")
+
+
+def _report_text(scope, status_code, elapsed_ms: float, trigger: str, session: _Session) -> str:
+    out = io.StringIO()
+    query = scope.get('query_string', b'').decode('latin-1')
+    out.write(f"{scope['method']} {scope['path']}{'?' + query if query else ''}\n")
+    out.write(f"status: {status_code}  elapsed: {elapsed_ms:.1f} ms  trigger: {trigger}\n")
+    out.write(f"recorded: {datetime.now().isoformat(timespec='seconds')}\n")
+
+    for title, profiles in (('Endpoint (threadpool)', session.worker_profiles), ('Event loop', [session.loop_profile])):
+        out.write(f"\n=== {title} ===\n")
+        if not profiles:
+            out.write("(no sync endpoint ran)\n")
+            continue
+        stats = pstats.Stats(profiles[0], stream=out)
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+
+    if session.memory_after is not None:
+        out.write(f"\n=== Allocations (top {PROFILE_TOP_ALLOCATIONS} lines by growth) ===\n")
+        for stat in session.memory_after.compare_to(session.memory_before, 'lineno')[:PROFILE_TOP_ALLOCATIONS]:
+            out.write(f"{stat}\n")
+        out.write(f"peak traced memory: {session.memory_peak} B\n")
+    return out.getvalue()
+
+
+def write_report(scope, status_code, elapsed_ms: float, trigger: str, session: _Session) -> str:
+    """Writes a report to PROFILE_DIR, drops the oldest beyond PROFILE_MAX_REPORTS, and returns its name."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r'[^\w]+', '-', scope['path']).strip('-') or 'root'
+    name = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{scope['method']}-{slug}-{elapsed_ms:.0f}ms.txt"
+    path = os.path.join(PROFILE_DIR, name)
+    with open(path + '.tmp', 'w') as f:
+        f.write(_report_text(scope, status_code, elapsed_ms, trigger, session))
+    os.replace(path + '.tmp', path)
+
+    for report in list_reports()[PROFILE_MAX_REPORTS:]:
+        try:
+            os.unlink(os.path.join(PROFILE_DIR, report['name']))
+        except OSError:
+            pass
+    return name
+
+
+def list_reports() -> List[Dict]:
+    """Stored reports, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    reports = []
+    for name in os.listdir(PROFILE_DIR):
+        if not REPORT_NAME.match(name):
+            continue
+        try:
+            info = os.stat(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            continue
+        reports.append({
+            'name': name,
+            'size': info.st_size,
+            'created_at': datetime.fromtimestamp(info.st_mtime).isoformat(timespec='seconds'),
+        })
+    reports.sort(key=lambda report: report['name'], reverse=True)
+    return reports
+
+
+def report_path(name: str) -> Optional[str]:
+    """Path of a stored report, or None for unknown or unsafe names."""
+    if not REPORT_NAME.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
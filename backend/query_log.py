@@ -0,0 +1,169 @@
+from typing import Dict, List, Optional
+from collections import deque
+from datetime import datetime
+import os
+import re
+import sqlite3
+import threading
+import time
+import metrics
+
+# Statements taking at least SLOW_QUERY_MS (execute plus fetch calls) are
+# logged per worker; a negative value turns the timing hook off entirely
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_RECENT = 200
+
+_lock = threading.Lock()
+_recent: deque = deque(maxlen=SLOW_QUERY_RECENT)
+_statements: Dict[str, Dict] = {}
+# When a list, every statement issued is appended to it (see capture)
+_captured: Optional[List] = None
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def enabled() -> bool:
+    return SLOW_QUERY_MS >= 0
+
+
+def normalize(sql: str) -> str:
+    """One line per statement shape: literals become ? and placeholder lists (?, ...)."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    return _LIST.sub('(?, ...)', sql)
+
+
+def _record(sql: str, elapsed_ms: float) -> Dict:
+    statement = normalize(sql)
+    entry = {'sql': statement, 'ms': elapsed_ms, 'at': datetime.now().isoformat(timespec='seconds')}
+    with _lock:
+        _recent.append(entry)
+        stats = _statements.setdefault(statement, {'sql': statement, 'count': 0, 'totalMs': 0.0, 'maxMs': 0.0})
+        stats['count'] += 1
+        stats['totalMs'] += elapsed_ms
+        stats['maxMs'] = max(stats['maxMs'], elapsed_ms)
+        stats['lastSeen'] = entry['at']
+    metrics.counter('db.slow_queries').inc()
+    print(f"Slow query ({elapsed_ms:.1f} ms): {statement}")
+    return entry
+
+
+def _extend(entry: Dict, elapsed_ms: float) -> None:
+    # A logged statement kept fetching: charge the extra time to its entry
+    with _lock:
+        entry['ms'] += elapsed_ms
+        stats = _statements[entry['sql']]
+        stats['totalMs'] += elapsed_ms
+        stats['maxMs'] = max(stats['maxMs'], entry['ms'])
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that charges execute and fetch time to the current statement."""
+
+    _sql = None
+    _elapsed_ms = 0.0
+    _entry = None
+
+    def _account(self, started: float) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if self._entry is not None:
+            _extend(self._entry, elapsed_ms)
+            return
+        self._elapsed_ms += elapsed_ms
+        if self._elapsed_ms >= SLOW_QUERY_MS and self._sql is not None:
+            self._entry = _record(self._sql, self._elapsed_ms)
+
+    def _start(self, sql: str, parameters) -> float:
+        self._sql = sql
+        self._elapsed_ms = 0.0
+        self._entry = None
+        if _captured is not None:
+            _captured.append((sql, parameters))
+        return time.perf_counter()
+
+    def execute(self, sql, parameters=()):
+        started = self._start(sql, parameters)
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._account(started)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        started = self._start(sql, seq_of_parameters[0] if seq_of_parameters else ())
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._account(started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._account(started)
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(*args, **kwargs)
+        finally:
+            self._account(started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._account(started)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors, including those of conn.execute, are TimedCursors."""
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or TimedCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory():
+    return TimedConnection if enabled() else sqlite3.Connection
+
+
+def snapshot() -> Dict:
+    """Slow statements by total time, and the most recent slow executions first."""
+    with _lock:
+        statements = sorted((dict(stats) for stats in _statements.values()), key=lambda stats: stats['totalMs'], reverse=True)
+        recent = [dict(entry) for entry in reversed(_recent)]
+    return {'thresholdMs': SLOW_QUERY_MS, 'statements': statements, 'recent': recent}
+
+
+def reset() -> None:
+    with _lock:
+        _recent.clear()
+        _statements.clear()
+
+
+class capture:
+    """
+    Collects (sql, parameters) of every statement issued while active, e.g.
+    to check their query plans. Needs the timing hook enabled.
+    """
+
+    def __enter__(self) -> List:
+        global _captured
+        _captured = []
+        return _captured
+
+    def __exit__(self, *exc) -> None:
+        global _captured
+        _captured = None
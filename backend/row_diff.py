@@ -0,0 +1,42 @@
+from typing import List, Dict, Any
+
+ROW_KEY = 'id'
+
+
+def index_rows(rows: List[Dict[str, Any]], key: str = ROW_KEY) -> Dict[Any, Dict[str, Any]]:
+    """Hashes rows by their key; a later duplicate key replaces an earlier one."""
+    return {row.get(key): row for row in rows}
+
+
+def changed_fields(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, list]:
+    """Returns {field: [old_value, new_value]} for every field that differs."""
+    changes = {}
+    for field in old.keys() | new.keys():
+        old_value = old.get(field)
+        new_value = new.get(field)
+        if old_value != new_value:
+            changes[field] = [old_value, new_value]
+    return changes
+
+
+def diff_rows(old_rows: List[Dict[str, Any]], new_rows: List[Dict[str, Any]], key: str = ROW_KEY) -> Dict[str, list]:
+    """
+    Row-keyed diff of two sheets in linear time: rows only in new_rows are
+    inserted, rows only in old_rows are deleted (by key), and rows in both whose
+    contents differ are updated with their changed fields.
+    """
+    old_index = index_rows(old_rows, key)
+    new_index = index_rows(new_rows, key)
+
+    inserted = []
+    updated = []
+    for row_key, new_row in new_index.items():
+        old_row = old_index.get(row_key)
+        if old_row is None:
+            inserted.append(new_row)
+        elif old_row != new_row:
+            updated.append({key: row_key, 'changes': changed_fields(old_row, new_row)})
+
+    deleted = [row_key for row_key in old_index if row_key not in new_index]
+
+    return {'inserted': inserted, 'updated': updated, 'deleted': deleted}
@@ -23,6 +23,8 @@ class TableRow(BaseModel):
 class TableDataRequest(BaseModel):
     fiscalYear: str
     data: List[TableRow]
+    # Optimistic concurrency: only write if the active version still matches
+    expectedVersion: Optional[int] = None
 
 class DropdownOptions(BaseModel):
     fiscalYear: Optional[str] = "FY_25"
@@ -40,9 +42,17 @@ class LocationRelationship(BaseModel):
     location: str
     locationCode: str
 
+class MasterDataUpdate(BaseModel):
+    fiscalYear: Optional[str] = "FY_25"
+    # Changed option lists keyed by API key (groups, ppaMerchants, ...) or option type
+    options: Dict[str, List[str]] = {}
+    # Full relationship list for fiscalYear, omitted when unchanged
+    relationships: Optional[List[LocationRelationship]] = None
+
 class RestoreBackupRequest(BaseModel):
     fiscalYear: str
     version: int
+    expectedVersion: Optional[int] = None
 
 class User(BaseModel):
     username: str
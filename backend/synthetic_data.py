@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Synthetic capacity sheets for load testing.
+
+Learns value distributions from the app/components/ex*.json templates
+(categorical frequencies and per-type solar/wind ranges) and streams any
+number of table rows from them, deterministically for a given seed:
+
+    python backend/synthetic_data.py --rows 1000000 --format ndjson --output rows.ndjson
+    python backend/synthetic_data.py --rows 100000 --format db --fiscal-year FY_LOAD
+
+A million rows take about 1.5 s to generate and about 8 s to store with
+--format db (a 240 MB sheet), most of it JSON encoding; the database write
+holds no more than a batch of rows in Python.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import Counter, defaultdict
+from itertools import accumulate
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import sys
+import tempfile
+
+import numpy as np
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / 'app' / 'components'
+TEMPLATE_FILES = ['ex.json', 'ex_fy25.json', 'ex_fy26.json', 'ex_fy27.json', 'ex_fy28.json']
+
+# Row columns sampled independently, with the template field they are learned from
+INDEPENDENT_COLUMNS = {
+    'group': 'Group',
+    'ppaMerchant': 'PPA/Merchant',
+    'type': 'Type',
+    'spv': 'SPV',
+    'location': 'Location',
+    'connectivity': 'Connectivity',
+}
+
+# Spellings of the PSS field in the templates (same as convert_to_table_row)
+PSS_FIELDS = ['PSS', 'PSS -', 'PSS-']
+
+JSON_FORMAT = 'json'
+NDJSON_FORMAT = 'ndjson'
+DB_FORMAT = 'db'
+OUTPUT_FORMATS = [JSON_FORMAT, NDJSON_FORMAT, DB_FORMAT]
+
+# Rows generated per batch; fixed so a seed gives the same rows for any consumer
+BATCH_SIZE = 10000
+
+
+def _number(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class Frequencies:
+    """Observed values of a column and their cumulative weights."""
+
+    def __init__(self, counts: Counter):
+        self.values = list(counts)
+        self.cum_weights = list(accumulate(counts[value] for value in self.values))
+        self._values = np.array(self.values, dtype=object)
+        self._cum_weights = np.array(self.cum_weights, dtype=float)
+
+    def sample_indexes(self, rng: np.random.Generator, k: int) -> np.ndarray:
+        """Positions in `values` of k weighted draws."""
+        return np.searchsorted(self._cum_weights, rng.random(k) * self._cum_weights[-1], side='right')
+
+    def values_at(self, indexes: np.ndarray) -> np.ndarray:
+        return self._values[indexes]
+
+    def sample(self, rng: np.random.Generator, k: int) -> np.ndarray:
+        return self.values_at(self.sample_indexes(rng, k))
+
+
+class SheetModel:
+    """
+    Value distributions of a capacity sheet. Location codes and PSS values
+    depend on the location; solar and wind are uniform within the range seen
+    for the project type, and capacity is their sum.
+    """
+
+    def __init__(self, columns: Dict[str, Frequencies], location_codes: Dict[str, str],
+                 pss_by_location: Dict[str, Frequencies], ranges: Dict[str, Dict[str, Tuple[float, float]]]):
+        self.columns = columns
+        self.location_codes = location_codes
+        self.pss_by_location = pss_by_location
+        self.ranges = ranges
+
+    @classmethod
+    def learn(cls, rows: Iterable[Dict]) -> "SheetModel":
+        """Builds the model from raw template rows (Excel-style field names)."""
+        counts = {column: Counter() for column in INDEPENDENT_COLUMNS}
+        codes = defaultdict(Counter)
+        pss = defaultdict(Counter)
+        ranges: Dict[str, Dict[str, List[float]]] = {}
+        for row in rows:
+            values = {column: row.get(field) or '' for column, field in INDEPENDENT_COLUMNS.items()}
+            for column, value in values.items():
+                counts[column][value] += 1
+            location = values['location']
+            codes[location][row.get('Location Code') or ''] += 1
+            pss[location][next((row[field] for field in PSS_FIELDS if field in row), None) or ''] += 1
+            type_ranges = ranges.setdefault(values['type'], {'solar': [], 'wind': []})
+            type_ranges['solar'].append(_number(row.get('Solar')))
+            type_ranges['wind'].append(_number(row.get('Wind')))
+
+        if not counts['type']:
+            raise ValueError("No template rows to learn from")
+        return cls(
+            columns={column: Frequencies(c) for column, c in counts.items()},
+            location_codes={location: c.most_common(1)[0][0] for location, c in codes.items()},
+            pss_by_location={location: Frequencies(c) for location, c in pss.items()},
+            ranges={
+                project_type: {measure: (min(values), max(values)) for measure, values in measures.items()}
+                for project_type, measures in ranges.items()
+            },
+        )
+
+    def to_dict(self) -> Dict:
+        """JSON-friendly summary of the learned distributions."""
+        def frequencies(f: Frequencies):
+            return dict(zip(f.values, (b - a for a, b in zip([0] + f.cum_weights, f.cum_weights))))
+
+        return {
+            'columns': {column: frequencies(f) for column, f in self.columns.items()},
+            'locationCodes': self.location_codes,
+            'pssByLocation': {location: frequencies(f) for location, f in self.pss_by_location.items()},
+            'ranges': self.ranges,
+        }
+
+
+def load_template_rows(templates_dir: Path = TEMPLATES_DIR) -> List[Dict]:
+    """Raw rows of every ex*.json template found in templates_dir."""
+    rows = []
+    for name in TEMPLATE_FILES:
+        path = Path(templates_dir) / name
+        if path.exists():
+            with open(path, 'r') as f:
+                rows.extend(json.load(f))
+    return rows
+
+
+def learn_model(templates_dir: Path = TEMPLATES_DIR) -> SheetModel:
+    return SheetModel.learn(load_template_rows(templates_dir))
+
+
+def generate_batches(model: SheetModel, rows: int, seed: int = 0, start_id: int = 1) -> Iterator[List[Dict]]:
+    """
+    Yields batches of up to BATCH_SIZE table rows, `rows` in total. Only one
+    batch is alive at a time, so memory stays flat however many rows are asked
+    for. Columns are drawn a batch at a time with numpy; only the row dicts
+    are built per row.
+    """
+    rng = np.random.default_rng(seed)
+    locations = model.columns['location']
+    location_codes = np.array([model.location_codes[location] for location in locations.values], dtype=object)
+    types = model.columns['type']
+    # Low ends and spans of [solar, wind], in the order of the type values
+    lows = np.array([[model.ranges[t]['solar'][0], model.ranges[t]['wind'][0]] for t in types.values])
+    spans = np.array([
+        [model.ranges[t]['solar'][1] - model.ranges[t]['solar'][0], model.ranges[t]['wind'][1] - model.ranges[t]['wind'][0]]
+        for t in types.values
+    ])
+    next_id = start_id
+    remaining = rows
+    while remaining > 0:
+        n = min(BATCH_SIZE, remaining)
+        sampled = {
+            column: f.sample(rng, n).tolist()
+            for column, f in model.columns.items() if column not in ('location', 'type')
+        }
+        location_indexes = locations.sample_indexes(rng, n)
+        type_indexes = types.sample_indexes(rng, n)
+
+        # PSS depends on the location: sample each location's share in one call
+        pss = np.empty(n, dtype=object)
+        for index in np.unique(location_indexes):
+            positions = np.flatnonzero(location_indexes == index)
+            pss[positions] = model.pss_by_location[locations.values[index]].sample(rng, len(positions))
+
+        measures = np.round(lows[type_indexes] + spans[type_indexes] * rng.random((n, 2)), 2)
+        capacity = np.round(measures.sum(axis=1), 2)
+
+        batch = [
+            {
+                'id': row_id,
+                'sno': row_id,
+                'capacity': capacity_value,
+                'group': group,
+                'ppaMerchant': ppa_merchant,
+                'type': project_type,
+                'solar': solar,
+                'wind': wind,
+                'spv': spv,
+                'locationCode': location_code,
+                'location': location,
+                'pss': pss_value,
+                'connectivity': connectivity,
+            }
+            for row_id, capacity_value, group, ppa_merchant, project_type, solar, wind, spv,
+                location_code, location, pss_value, connectivity in zip(
+                range(next_id, next_id + n), capacity.tolist(), sampled['group'], sampled['ppaMerchant'],
+                types.values_at(type_indexes).tolist(), measures[:, 0].tolist(), measures[:, 1].tolist(), sampled['spv'],
+                location_codes[location_indexes].tolist(), locations.values_at(location_indexes).tolist(),
+                pss.tolist(), sampled['connectivity'],
+            )
+        ]
+        yield batch
+        next_id += n
+        remaining -= n
+
+
+def generate_rows(model: SheetModel, rows: int, seed: int = 0) -> List[Dict]:
+    """All rows as one list; for sizes that fit comfortably in memory."""
+    return [row for batch in generate_batches(model, rows, seed) for row in batch]
+
+
+# --- Writers ---
+
+def write_json(batches: Iterable[List[Dict]], out) -> int:
+    """Writes one JSON array, a batch at a time. Returns the row count."""
+    count = 0
+    out.write('[')
+    for batch in batches:
+        if count:
+            out.write(',')
+        # Serialize the batch as an array and drop its brackets
+        out.write(json.dumps(batch)[1:-1])
+        count += len(batch)
+    out.write(']')
+    return count
+
+
+def write_ndjson(batches: Iterable[List[Dict]], out) -> int:
+    """Writes one JSON row per line. Returns the row count."""
+    encode = json.JSONEncoder().encode
+    count = 0
+    for batch in batches:
+        out.write('\n'.join(map(encode, batch)))
+        out.write('\n')
+        count += len(batch)
+    return count
+
+
+class _HashingSpool:
+    """Text sink writing UTF-8 to a binary file, hashing and measuring it on the way."""
+
+    def __init__(self, out):
+        self.out = out
+        self.hash = hashlib.sha256()
+        self.length = 0
+        self.size = 0
+
+    def write(self, text: str) -> None:
+        data = text.encode('utf-8')
+        self.hash.update(data)
+        self.out.write(data)
+        self.length += len(data)
+        self.size += len(text)
+
+
+def write_db(batches: Iterable[List[Dict]], fiscal_year: str, connect) -> Dict:
+    """
+    Stores the rows as the active sheet of a fiscal year. table_data keeps a
+    year as one JSON document, so it is spooled to a temporary file, hashed as
+    it is written, and streamed into its blob row in chunks. The write is
+    logged like a restore (a wholesale replacement, without decoding the
+    previous sheet), so a running server picks it up through the change feed
+    and the generation counters.
+    """
+    import change_feed
+    import generations
+    import table_deltas
+    import table_store
+    from db_retry import begin_immediate
+
+    with tempfile.TemporaryFile() as spool_file:
+        spool = _HashingSpool(spool_file)
+        count = write_json(batches, spool)
+        blob_hash = spool.hash.hexdigest()
+        spool_file.seek(0)
+
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            begin_immediate(cursor)
+            existing_record = table_store.check_version(cursor, fiscal_year, None)
+            table_store.store_blob_stream(conn, blob_hash, spool_file, spool.length, spool.size)
+            version = table_store.set_active_blob(cursor, fiscal_year, existing_record, blob_hash)
+            table_deltas.record(cursor, fiscal_year, version, None)
+            change_feed.record(cursor, change_feed.TABLE_DATA, fiscal_year, version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    generations.bump(generations.TABLE_DATA)
+    return {'fiscalYear': fiscal_year, 'count': count, 'version': version}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic capacity sheet rows from the ex*.json templates")
+    parser.add_argument('--rows', type=int, required=True, help="Number of rows to generate")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default=NDJSON_FORMAT)
+    parser.add_argument('--output', default='-', help="Output file for json/ndjson ('-' for stdout)")
+    parser.add_argument('--fiscal-year', default='FY_SYNTHETIC', help="Fiscal year written by --format db")
+    parser.add_argument('--templates', default=str(TEMPLATES_DIR), help="Directory holding the ex*.json templates")
+    parser.add_argument('--show-model', action='store_true', help="Print the learned distributions and exit")
+    args = parser.parse_args(argv)
+
+    model = learn_model(Path(args.templates))
+    if args.show_model:
+        json.dump(model.to_dict(), sys.stdout, indent=2)
+        print()
+        return
+
+    batches = generate_batches(model, args.rows, args.seed)
+    if args.format == DB_FORMAT:
+        from database import get_db_connection, init_db
+        init_db()
+        result = write_db(batches, args.fiscal_year, get_db_connection)
+        print(f"Stored {result['count']} rows as {result['fiscalYear']} version {result['version']}", file=sys.stderr)
+        return
+
+    writer = write_json if args.format == JSON_FORMAT else write_ndjson
+    if args.output == '-':
+        count = writer(batches, sys.stdout)
+    else:
+        with open(args.output, 'w') as out:
+            count = writer(batches, out)
+    print(f"Wrote {count} rows", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+from typing import List, Dict, Any
+
+# Column order of a table row, matching the TableRow schema
+TABLE_COLUMNS = [
+    'id', 'sno', 'capacity', 'group', 'ppaMerchant', 'type', 'solar', 'wind',
+    'spv', 'locationCode', 'location', 'pss', 'connectivity'
+]
+
+# Columns sent as plain arrays (ints/floats/nulls)
+NUMERIC_COLUMNS = ['id', 'sno', 'capacity', 'solar', 'wind']
+
+# Columns with few distinct values, sent as integer codes plus a dictionary
+CATEGORICAL_COLUMNS = [
+    'group', 'ppaMerchant', 'type', 'spv', 'locationCode', 'location', 'pss', 'connectivity'
+]
+
+COMPACT_FORMAT = 'compact'
+
+
+def table_columns(rows: List[Dict[str, Any]]) -> List[str]:
+    """Returns the known columns followed by any extra keys found in the rows."""
+    columns = list(TABLE_COLUMNS)
+    known = set(columns)
+    for row in rows:
+        if not known.issuperset(row):
+            for key in row:
+                if key not in known:
+                    known.add(key)
+                    columns.append(key)
+    return columns
+
+
+def dictionary_encode(values: List[Any]):
+    """Encodes a column as (codes, dictionary) in first-seen order."""
+    index: Dict[Any, int] = {}
+    codes = [index.setdefault(value, len(index)) for value in values]
+    return codes, list(index)
+
+
+def encode_compact(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Encodes table rows column-wise: column names are sent once, categorical
+    columns as integer codes plus a per-column dictionary, everything else as
+    plain arrays. Missing keys are sent as null.
+    """
+    columns = table_columns(rows)
+    data: Dict[str, List[Any]] = {}
+    dictionaries: Dict[str, List[Any]] = {}
+
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        if column in CATEGORICAL_COLUMNS:
+            data[column], dictionaries[column] = dictionary_encode(values)
+        else:
+            data[column] = values
+
+    return {
+        'format': COMPACT_FORMAT,
+        'length': len(rows),
+        'columns': columns,
+        'dictionaries': dictionaries,
+        'data': data,
+    }
+
+
+def decode_compact(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Inverse of encode_compact, returns the list of row dictionaries."""
+    columns = payload['columns']
+    dictionaries = payload.get('dictionaries', {})
+    decoded = []
+    for column in columns:
+        values = payload['data'][column]
+        dictionary = dictionaries.get(column)
+        if dictionary is not None:
+            values = [dictionary[code] for code in values]
+        decoded.append(values)
+    return [dict(zip(columns, row)) for row in zip(*decoded)]
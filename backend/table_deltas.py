@@ -0,0 +1,169 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import json
+import os
+import threading
+import row_diff
+
+# Deltas kept per fiscal year, and the largest delta stored with its rows;
+# a bigger one is recorded without them and readers fall back to the full sheet
+TABLE_DELTA_RETAIN_VERSIONS = int(os.environ.get('TABLE_DELTA_RETAIN_VERSIONS', '50'))
+TABLE_DELTA_MAX_ROWS = int(os.environ.get('TABLE_DELTA_MAX_ROWS', '5000'))
+# Rows of recently saved sheets a worker keeps to diff the next save against
+TABLE_DELTA_BASE_CACHE_ROWS = int(os.environ.get('TABLE_DELTA_BASE_CACHE_ROWS', '200000'))
+
+
+class DeltaUnavailable(Exception):
+    """Raised when the stored history cannot answer a request without the full sheet."""
+
+
+class BaseRowCache:
+    """
+    Row index of the sheet each fiscal year was last saved with by this
+    worker, keyed by its content hash, so the next save diffs against it
+    without decoding the stored sheet. A save based on content this worker
+    did not write misses and decodes it. Least recently saved years are
+    dropped past max_rows rows in total.
+    """
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        self._entries: "OrderedDict[str, Tuple[str, Dict[Any, Dict[str, Any]]]]" = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def get(self, fiscal_year: str, blob_hash: Optional[str]) -> Optional[Dict[Any, Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(fiscal_year)
+            return entry[1] if entry is not None and entry[0] == blob_hash else None
+
+    def put(self, fiscal_year: str, blob_hash: str, index: Dict[Any, Dict[str, Any]]) -> None:
+        with self._lock:
+            previous = self._entries.pop(fiscal_year, None)
+            if previous is not None:
+                self._rows -= len(previous[1])
+            if len(index) > self.max_rows:
+                return
+            self._entries[fiscal_year] = (blob_hash, index)
+            self._rows += len(index)
+            while self._rows > self.max_rows:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._rows -= len(evicted)
+
+
+base_rows = BaseRowCache(TABLE_DELTA_BASE_CACHE_ROWS)
+
+
+def compute(old_rows: List[Dict[str, Any]], new_rows: List[Dict[str, Any]]) -> Dict[str, list]:
+    """
+    Row-keyed delta between two sheets, holding both sides of every change:
+    inserted rows, updated rows as {'old', 'new'}, and deleted rows.
+    """
+    return compute_indexed(row_diff.index_rows(old_rows), row_diff.index_rows(new_rows))
+
+
+def compute_indexed(old_index: Dict[Any, Dict[str, Any]], new_index: Dict[Any, Dict[str, Any]]) -> Dict[str, list]:
+    """compute over rows already indexed by row_diff.index_rows."""
+    inserted = []
+    updated = []
+    for row_key, new_row in new_index.items():
+        old_row = old_index.get(row_key)
+        if old_row is None:
+            inserted.append(new_row)
+        elif old_row != new_row:
+            updated.append({'old': old_row, 'new': new_row})
+    deleted = [old_row for row_key, old_row in old_index.items() if row_key not in new_index]
+    return {'inserted': inserted, 'updated': updated, 'deleted': deleted}
+
+
+def changed_row_ids(delta: Dict[str, list]) -> List[Any]:
+    key = row_diff.ROW_KEY
+    row_ids = [row.get(key) for row in delta['inserted']]
+    row_ids.extend(change['new'].get(key) for change in delta['updated'])
+    row_ids.extend(row.get(key) for row in delta['deleted'])
+    return row_ids
+
+
+def record(cursor, fiscal_year: str, version: int, delta: Optional[Dict[str, list]], base_hash: Optional[str] = None) -> None:
+    """
+    Stores the delta that produced `version` from the sheet with content hash
+    `base_hash` (None for an empty or deleted sheet), inside the writer's
+    transaction. None records a version whose rows were replaced wholesale
+    (a restore).
+    """
+    size = len(delta['inserted']) + len(delta['updated']) + len(delta['deleted']) if delta is not None else 0
+    changes = json.dumps(delta) if delta is not None and size <= TABLE_DELTA_MAX_ROWS else None
+    cursor.execute(
+        'INSERT INTO table_data_deltas (fiscal_year, version, row_count, changes, base_hash) VALUES (?, ?, ?, ?, ?)',
+        (fiscal_year, version, size, changes, base_hash)
+    )
+    cursor.execute(
+        'DELETE FROM table_data_deltas WHERE fiscal_year = ? AND version <= ?',
+        (fiscal_year, version - TABLE_DELTA_RETAIN_VERSIONS)
+    )
+
+
+def load(cursor, fiscal_year: str, from_version: int, to_version: int) -> List[Dict[str, list]]:
+    """
+    Deltas of the versions after from_version up to to_version, oldest first.
+    Raises DeltaUnavailable unless every one of them is stored with its rows
+    and was computed from the content logged for the version before it.
+    """
+    if to_version - from_version > TABLE_DELTA_RETAIN_VERSIONS:
+        raise DeltaUnavailable(f"More than {TABLE_DELTA_RETAIN_VERSIONS} versions apart")
+    cursor.execute('''
+        SELECT d.version, d.changes, d.base_hash IS v.blob_hash
+        FROM table_data_deltas d
+        LEFT JOIN table_versions v ON v.fiscal_year = d.fiscal_year AND v.version = d.version - 1
+        WHERE d.fiscal_year = ? AND d.version > ? AND d.version <= ?
+        ORDER BY d.version
+    ''', (fiscal_year, from_version, to_version))
+    rows = cursor.fetchall()
+    # Versions written without a delta (deletes, bulk imports) break the chain
+    if [row[0] for row in rows] != list(range(from_version + 1, to_version + 1)):
+        raise DeltaUnavailable(f"No stored history from version {from_version} to {to_version}")
+    if any(row[1] is None for row in rows):
+        raise DeltaUnavailable("A version was replaced wholesale or changed too much to store as a delta")
+    # A delta whose base is not the logged content of the previous version
+    # (or of `from_version` itself) would patch rows the client never had
+    if not all(row[2] for row in rows):
+        raise DeltaUnavailable(f"Stored history from version {from_version} no longer matches its content")
+    return [json.loads(row[1]) for row in rows]
+
+
+def compose(deltas: List[Dict[str, list]], max_rows: Optional[int] = None) -> Dict[str, list]:
+    """
+    Folds consecutive deltas into the net change: rows inserted since the
+    first version (and still present), rows that existed before and were
+    updated (their latest contents), and the ids of rows that existed before
+    and are gone.
+    """
+    key = row_diff.ROW_KEY
+    # row key -> (existed before the first delta, latest row or None if deleted)
+    states: Dict[Any, tuple] = {}
+    for delta in deltas:
+        for row in delta['inserted']:
+            existed = states[row.get(key)][0] if row.get(key) in states else False
+            states[row.get(key)] = (existed, row)
+        for change in delta['updated']:
+            row = change['new']
+            existed = states[row.get(key)][0] if row.get(key) in states else True
+            states[row.get(key)] = (existed, row)
+        for row in delta['deleted']:
+            existed = states[row.get(key)][0] if row.get(key) in states else True
+            states[row.get(key)] = (existed, None)
+        if max_rows is not None and len(states) > max_rows:
+            raise DeltaUnavailable(f"More than {max_rows} rows changed")
+
+    inserted = []
+    updated = []
+    deleted = []
+    for row_key, (existed, row) in states.items():
+        if row is None:
+            if existed:
+                deleted.append(row_key)
+        elif existed:
+            updated.append(row)
+        else:
+            inserted.append(row)
+    return {'inserted': inserted, 'updated': updated, 'deleted': deleted}
@@ -0,0 +1,254 @@
+from typing import List, Dict, Optional
+import csv
+import io
+import tempfile
+from table_codec import TABLE_COLUMNS, NUMERIC_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed for the Arrow/Parquet export
+    pa = None
+    pq = None
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # openpyxl is only needed for the Excel export
+    Workbook = None
+
+ARROW_FORMAT = 'arrow'
+PARQUET_FORMAT = 'parquet'
+CSV_FORMAT = 'csv'
+XLSX_FORMAT = 'xlsx'
+
+EXPORT_MEDIA_TYPES = {
+    ARROW_FORMAT: 'application/vnd.apache.arrow.stream',
+    PARQUET_FORMAT: 'application/vnd.apache.parquet',
+    CSV_FORMAT: 'text/csv; charset=utf-8',
+    XLSX_FORMAT: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+EXPORT_EXTENSIONS = {
+    ARROW_FORMAT: 'arrows',
+    PARQUET_FORMAT: 'parquet',
+    CSV_FORMAT: 'csv',
+    XLSX_FORMAT: 'xlsx',
+}
+
+# Formats written row by row for a single fiscal year
+SHEET_FORMATS = [CSV_FORMAT, XLSX_FORMAT]
+
+INTEGER_COLUMNS = ['id', 'sno']
+
+# Columns the analytics table can be filtered on (exact match)
+FILTER_COLUMNS = ['group', 'ppaMerchant', 'type', 'locationCode', 'location', 'connectivity']
+
+# Sheet columns and headers, in the order of the analytics page Excel export
+SHEET_COLUMNS = [
+    ('sno', 'S.No'),
+    ('capacity', 'Capacity'),
+    ('group', 'Group'),
+    ('ppaMerchant', 'PPA/Merchant'),
+    ('type', 'Type'),
+    ('solar', 'Solar'),
+    ('wind', 'Wind'),
+    ('spv', 'SPV'),
+    ('locationCode', 'Location Code'),
+    ('location', 'Location'),
+    ('pss', 'PSS'),
+    ('connectivity', 'Connectivity'),
+]
+
+CAPACITY_INDEX = 1
+SOLAR_INDEX = 5
+WIND_INDEX = 6
+
+STREAM_BATCH_SIZE = 1000
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _column_sql(column: str) -> str:
+    # SQLite does the type coercion so rows never become Python dicts. Blank
+    # or non-numeric values of numeric columns become null rather than 0
+    path = f"json_extract(j.value, '$.{column}')"
+    if column in INTEGER_COLUMNS or column in NUMERIC_COLUMNS:
+        sql_type = 'INTEGER' if column in INTEGER_COLUMNS else 'REAL'
+        return f"CASE WHEN json_type(j.value, '$.{column}') IN ('integer', 'real') THEN CAST({path} AS {sql_type}) END"
+    return f'CAST({path} AS TEXT)'
+
+
+def _filter_sql(filters: Optional[Dict[str, Optional[str]]]):
+    clauses = ''
+    params = []
+    for column in FILTER_COLUMNS:
+        value = (filters or {}).get(column)
+        if value:
+            clauses += f" AND json_extract(j.value, '$.{column}') = ?"
+            params.append(value)
+    return clauses, params
+
+
+def fetch_table_columns(cursor, fiscal_years: List[str], filters: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, tuple]:
+    """
+    Reads the active rows of the given fiscal years in one query, unpacking the
+    stored JSON inside SQLite, and returns them column-wise with a leading
+    fiscalYear column.
+    """
+    columns = ['fiscalYear'] + TABLE_COLUMNS
+    placeholders = ', '.join('?' for _ in fiscal_years)
+    select_list = ', '.join(_column_sql(column) for column in TABLE_COLUMNS)
+    filter_sql, filter_params = _filter_sql(filters)
+    cursor.execute(f'''
+        SELECT t.fiscal_year, {select_list}
+        FROM table_data_content t, json_each(t.data) j
+        WHERE t.fiscal_year IN ({placeholders}) AND t.is_deleted = 0{filter_sql}
+        ORDER BY t.fiscal_year, CAST(j.key AS INTEGER)
+    ''', list(fiscal_years) + filter_params)
+    rows = cursor.fetchall()
+    if not rows:
+        return {column: () for column in columns}
+    return dict(zip(columns, zip(*rows)))
+
+
+def build_arrow_table(columns: Dict[str, tuple]):
+    """Builds a typed Arrow table: float/int numerics and dictionary-encoded text."""
+    arrays = []
+    fields = []
+    for name, values in columns.items():
+        if name in INTEGER_COLUMNS:
+            array = pa.array(values, type=pa.int64())
+        elif name in NUMERIC_COLUMNS:
+            array = pa.array(values, type=pa.float64())
+        else:
+            array = pa.array(values, type=pa.string()).dictionary_encode()
+        arrays.append(array)
+        fields.append(pa.field(name, array.type))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def serialize_arrow_table(table, export_format: str) -> bytes:
+    """Serializes the table as an Arrow IPC stream or a Parquet file."""
+    sink = pa.BufferOutputStream()
+    if export_format == ARROW_FORMAT:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, sink)
+    return sink.getvalue().to_pybytes()
+
+
+# --- Streaming sheet export (CSV / XLSX) ---
+
+def iter_sheet_rows(cursor, fiscal_year: str, filters: Optional[Dict[str, Optional[str]]] = None):
+    """Yields batches of sheet rows (tuples in SHEET_COLUMNS order) straight from the cursor."""
+    select_list = ', '.join(f"json_extract(j.value, '$.{column}')" for column, _ in SHEET_COLUMNS)
+    filter_sql, filter_params = _filter_sql(filters)
+    # No ORDER BY: json_each already walks the array in order, and sorting
+    # would make SQLite materialize the whole sheet
+    cursor.execute(f'''
+        SELECT {select_list}
+        FROM table_data_content t, json_each(t.data) j
+        WHERE t.fiscal_year = ? AND t.is_deleted = 0{filter_sql}
+    ''', [fiscal_year] + filter_params)
+    while True:
+        rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+        if not rows:
+            break
+        yield rows
+
+
+def _accumulate_totals(totals: Dict[str, float], rows) -> None:
+    for row in rows:
+        totals['capacity'] += row[CAPACITY_INDEX] or 0
+        totals['solar'] += row[SOLAR_INDEX] or 0
+        totals['wind'] += row[WIND_INDEX] or 0
+    totals['count'] += len(rows)
+
+
+def _total_row(totals: Dict[str, float]) -> list:
+    row = [''] * len(SHEET_COLUMNS)
+    row[0] = 'TOTAL'
+    row[CAPACITY_INDEX] = f"{totals['capacity']:.2f}"
+    row[SOLAR_INDEX] = f"{totals['solar']:.2f}"
+    row[WIND_INDEX] = f"{totals['wind']:.2f}"
+    return row
+
+
+def _summary_rows(totals: Dict[str, float]) -> list:
+    return [
+        ['SUMMARY REPORT'],
+        [''],
+        ['Metric', 'Value'],
+        ['Total Capacity', f"{totals['capacity']:.2f}"],
+        ['Total Solar', f"{totals['solar']:.2f}"],
+        ['Total Wind', f"{totals['wind']:.2f}"],
+        ['Total Projects', totals['count']],
+    ]
+
+
+def stream_csv(connect, fiscal_year: str, filters: Optional[Dict[str, Optional[str]]] = None):
+    """
+    Generator of CSV text chunks, one per batch of rows, ending with the totals
+    row. The connection is opened from `connect` on the first chunk, so a
+    response never started holds none.
+    """
+    conn = connect()
+    try:
+        conn.row_factory = None
+        cursor = conn.cursor()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([header for _, header in SHEET_COLUMNS])
+        totals = {'capacity': 0.0, 'solar': 0.0, 'wind': 0.0, 'count': 0}
+
+        for rows in iter_sheet_rows(cursor, fiscal_year, filters):
+            _accumulate_totals(totals, rows)
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+        writer.writerow([])
+        writer.writerow(_total_row(totals))
+        yield buffer.getvalue()
+    finally:
+        conn.close()
+
+
+def stream_xlsx(connect, fiscal_year: str, filters: Optional[Dict[str, Optional[str]]] = None):
+    """
+    Generator of XLSX file chunks. Rows go through a write-only workbook, which
+    spools them to disk, and the finished file is sent in fixed-size chunks.
+    Opens its connection like stream_csv.
+    """
+    conn = connect()
+    try:
+        conn.row_factory = None
+        cursor = conn.cursor()
+        workbook = Workbook(write_only=True)
+        data_sheet = workbook.create_sheet('Table Data')
+        data_sheet.append([header for _, header in SHEET_COLUMNS])
+        totals = {'capacity': 0.0, 'solar': 0.0, 'wind': 0.0, 'count': 0}
+
+        for rows in iter_sheet_rows(cursor, fiscal_year, filters):
+            _accumulate_totals(totals, rows)
+            for row in rows:
+                data_sheet.append(row)
+
+        data_sheet.append([])
+        data_sheet.append(_total_row(totals))
+
+        summary_sheet = workbook.create_sheet('Summary')
+        for row in _summary_rows(totals):
+            summary_sheet.append(row)
+
+        with tempfile.TemporaryFile() as spool:
+            workbook.save(spool)
+            spool.seek(0)
+            while True:
+                chunk = spool.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        conn.close()
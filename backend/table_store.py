@@ -0,0 +1,266 @@
+from typing import Optional
+from datetime import datetime, time, timezone
+import hashlib
+import os
+
+
+# Past versions of a fiscal year whose content stays readable by time (asOf);
+# older entries keep their timestamp but release their content
+TABLE_VERSION_RETAIN = int(os.environ.get('TABLE_VERSION_RETAIN', '100'))
+
+
+class VersionConflict(Exception):
+    """Raised when a write's expected version is not the stored version."""
+
+    def __init__(self, fiscal_year: str, expected_version: int, current_version: int):
+        super().__init__(
+            f"Version conflict for {fiscal_year}: expected {expected_version}, current {current_version}"
+        )
+        self.fiscal_year = fiscal_year
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+def parse_if_match(value: Optional[str]) -> Optional[int]:
+    """
+    Parses an If-Match header carrying a table data version ("12", W/"12" or 12).
+    Returns None when the header is absent or '*'.
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value in ('', '*'):
+        return None
+    if value.startswith('W/'):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise ValueError(f"Invalid If-Match header: {value}")
+
+
+def resolve_expected_version(if_match: Optional[str], expected_version: Optional[int]) -> Optional[int]:
+    """Combines the If-Match header and an explicit expectedVersion; they must agree."""
+    header_version = parse_if_match(if_match)
+    if header_version is not None and expected_version is not None and header_version != expected_version:
+        raise ValueError("If-Match and expectedVersion disagree")
+    return header_version if header_version is not None else expected_version
+
+
+def version_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def next_version(cursor, fiscal_year: str) -> int:
+    """
+    The version a new write of a fiscal year gets: past every version stored,
+    logged or covered by a delta, so a version number always names one sheet.
+    """
+    cursor.execute('''
+        SELECT MAX(version) FROM (
+            SELECT MAX(version) AS version FROM table_data WHERE fiscal_year = ?
+            UNION ALL SELECT MAX(version) FROM table_versions WHERE fiscal_year = ?
+            UNION ALL SELECT MAX(version) FROM table_data_deltas WHERE fiscal_year = ?
+        )
+    ''', (fiscal_year, fiscal_year, fiscal_year))
+    row = cursor.fetchone()
+    return (row[0] if row[0] is not None else 0) + 1
+
+
+def get_active_record(cursor, fiscal_year: str):
+    """Returns the (id, version, blob_hash) of the active record of a fiscal year, or None."""
+    cursor.execute('SELECT id, version, blob_hash FROM table_data WHERE fiscal_year = ? AND is_deleted = 0', (fiscal_year,))
+    return cursor.fetchone()
+
+
+# --- Content-addressed sheet storage ---
+# table_data rows point at their sheet JSON in table_blobs by hash, so
+# identical versions are stored once. Read sheets through the
+# table_data_content view, which also covers rows still holding inline data.
+
+def content_hash(data_json: str) -> str:
+    return hashlib.sha256(data_json.encode('utf-8')).hexdigest()
+
+
+def store_blob(cursor, data_json: str) -> str:
+    """Stores sheet JSON unless an identical blob exists, and returns its hash."""
+    blob_hash = content_hash(data_json)
+    cursor.execute(
+        'INSERT OR IGNORE INTO table_blobs (hash, data, size) VALUES (?, ?, ?)',
+        (blob_hash, data_json, len(data_json))
+    )
+    return blob_hash
+
+
+# Bytes copied per write when streaming a blob in from a file
+BLOB_STREAM_CHUNK = 1 << 20
+
+
+def store_blob_stream(conn, blob_hash: str, source, length: int, size: int) -> None:
+    """
+    Stores sheet JSON read from a binary file (length UTF-8 bytes, size
+    characters, hashed by the caller like content_hash) unless the blob exists,
+    without holding the document in Python. table_blobs has no rowids for
+    incremental blob I/O, so the bytes go through a temp table first and are
+    copied over as TEXT, which keeps them readable by the JSON functions.
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT 1 FROM table_blobs WHERE hash = ?', (blob_hash,))
+    if cursor.fetchone():
+        return
+    cursor.execute('CREATE TEMP TABLE IF NOT EXISTS blob_spool (data BLOB)')
+    cursor.execute('INSERT INTO temp.blob_spool (rowid, data) VALUES (1, zeroblob(?))', (length,))
+    with conn.blobopen('blob_spool', 'data', 1, name='temp') as blob:
+        for chunk in iter(lambda: source.read(BLOB_STREAM_CHUNK), b''):
+            blob.write(chunk)
+    cursor.execute(
+        'INSERT INTO table_blobs (hash, data, size) SELECT ?, CAST(data AS TEXT), ? FROM temp.blob_spool',
+        (blob_hash, size)
+    )
+    cursor.execute('DROP TABLE temp.blob_spool')
+
+
+def release_blob(cursor, blob_hash: Optional[str]) -> None:
+    """
+    Deletes a blob once no table_data record or retained version points at
+    it; call in the transaction that dropped the pointer.
+    """
+    if blob_hash is None:
+        return
+    cursor.execute('''
+        DELETE FROM table_blobs
+        WHERE hash = ?
+          AND NOT EXISTS (SELECT 1 FROM table_data WHERE blob_hash = ?)
+          AND NOT EXISTS (SELECT 1 FROM table_versions WHERE blob_hash = ?)
+    ''', (blob_hash, blob_hash, blob_hash))
+
+
+def collect_blobs(cursor) -> int:
+    """Deletes every unreferenced blob and returns how many were removed."""
+    cursor.execute('''
+        DELETE FROM table_blobs
+        WHERE NOT EXISTS (SELECT 1 FROM table_data WHERE table_data.blob_hash = table_blobs.hash)
+          AND NOT EXISTS (SELECT 1 FROM table_versions WHERE table_versions.blob_hash = table_blobs.hash)
+    ''')
+    return cursor.rowcount
+
+
+# --- Version log (time-travel reads) ---
+
+def log_version(cursor, fiscal_year: str, version: int, blob_hash: Optional[str]) -> None:
+    """
+    Records that `version` became the active sheet of a fiscal year now, or
+    that the year was deleted when blob_hash is None. Call in the writer's
+    transaction. Only the newest TABLE_VERSION_RETAIN contents are kept.
+    Logged versions are never replaced: reusing one fails the write.
+    """
+    cursor.execute('''
+        INSERT INTO table_versions (fiscal_year, version, blob_hash, is_deleted)
+        VALUES (?, ?, ?, ?)
+    ''', (fiscal_year, version, blob_hash, blob_hash is None))
+    cursor.execute('''
+        SELECT version, blob_hash FROM table_versions
+        WHERE fiscal_year = ? AND blob_hash IS NOT NULL
+        ORDER BY version DESC LIMIT -1 OFFSET ?
+    ''', (fiscal_year, TABLE_VERSION_RETAIN))
+    expired = cursor.fetchall()
+    if expired:
+        cursor.executemany(
+            'UPDATE table_versions SET blob_hash = NULL WHERE fiscal_year = ? AND version = ?',
+            [(fiscal_year, version) for version, _ in expired]
+        )
+        for expired_hash in {blob_hash for _, blob_hash in expired}:
+            release_blob(cursor, expired_hash)
+
+
+def parse_as_of(value: str) -> str:
+    """
+    Parses an ISO 8601 timestamp (or a date, meaning the end of that day)
+    into the UTC 'YYYY-MM-DD HH:MM:SS' form SQLite's CURRENT_TIMESTAMP uses.
+    Timestamps without an offset are taken as UTC.
+    """
+    value = value.strip()
+    try:
+        if len(value) == 10:
+            moment = datetime.combine(datetime.strptime(value, '%Y-%m-%d').date(), time(23, 59, 59))
+        else:
+            moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid asOf timestamp: {value}")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def version_as_of(cursor, fiscal_year: str, as_of: str):
+    """
+    Returns the (version, blob_hash, is_deleted, created_at) entry that was
+    current at as_of (from parse_as_of), or None if the year had no data yet.
+    blob_hash is None for deletions and for versions whose content expired.
+    """
+    cursor.execute('''
+        SELECT version, blob_hash, is_deleted, created_at FROM table_versions
+        WHERE fiscal_year = ? AND created_at <= ?
+        ORDER BY created_at DESC, version DESC LIMIT 1
+    ''', (fiscal_year, as_of))
+    return cursor.fetchone()
+
+
+def check_version(cursor, fiscal_year: str, expected_version: Optional[int]):
+    """
+    Returns the active record after checking it against the expected version.
+    A fiscal year without an active record is at version 0.
+    """
+    record = get_active_record(cursor, fiscal_year)
+    if expected_version is not None:
+        current_version = record[1] if record else 0
+        if current_version != expected_version:
+            raise VersionConflict(fiscal_year, expected_version, current_version)
+    return record
+
+
+def write_active_data(cursor, fiscal_year: str, data_json: str, expected_version: Optional[int] = None) -> int:
+    """
+    Stores data_json as the active record of a fiscal year and returns its new
+    version. Run inside a write transaction (BEGIN IMMEDIATE) so the version
+    check and the write are atomic.
+    """
+    existing_record = check_version(cursor, fiscal_year, expected_version)
+    return set_active_blob(cursor, fiscal_year, existing_record, store_blob(cursor, data_json))
+
+
+def set_active_blob(cursor, fiscal_year: str, active_record, blob_hash: str) -> int:
+    """
+    Points the active record (from get_active_record, or None to insert one)
+    at a stored blob under a new version, logs it and returns the version.
+    """
+    new_version = next_version(cursor, fiscal_year)
+    if active_record:
+        cursor.execute('''
+            UPDATE table_data
+            SET data = '', blob_hash = ?, version = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (blob_hash, new_version, active_record[0]))
+        if active_record[2] != blob_hash:
+            release_blob(cursor, active_record[2])
+    else:
+        cursor.execute('''
+            INSERT INTO table_data (fiscal_year, data, blob_hash, version, is_deleted)
+            VALUES (?, '', ?, ?, 0)
+        ''', (fiscal_year, blob_hash, new_version))
+    log_version(cursor, fiscal_year, new_version, blob_hash)
+    return new_version
+
+
+def import_sheet(cursor, fiscal_year: str, data_json: str) -> Optional[int]:
+    """
+    Bulk-import upsert: stores data_json as the active record of the fiscal
+    year under a new version, inserting one when the year has none (never
+    imported, or deleted). Backups keep their versions and content. Returns
+    the new version, or None without writing when the active record already
+    holds this content.
+    """
+    active_record = get_active_record(cursor, fiscal_year)
+    if active_record and active_record[2] == content_hash(data_json):
+        return None
+    return set_active_blob(cursor, fiscal_year, active_record, store_blob(cursor, data_json))
@@ -0,0 +1,160 @@
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+import os
+import threading
+import generations
+
+# Scope of GET /variables without user_id: every row of every user
+ALL_USERS = object()
+
+VARIABLE_CACHE_MAX_USERS = int(os.environ.get('VARIABLE_CACHE_MAX_USERS', '1024'))
+VARIABLE_CACHE_MAX_BYTES = int(os.environ.get('VARIABLE_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# Rough per-row overhead of the dict and its timestamps
+_ROW_OVERHEAD_BYTES = 200
+
+
+def _row_size(row: Dict) -> int:
+    return _ROW_OVERHEAD_BYTES + sum(len(value) for value in row.values() if isinstance(value, str))
+
+
+def _entry_size(rows: List[Dict]) -> int:
+    return sum(_row_size(row) for row in rows)
+
+
+class VariableCache:
+    """
+    Write-through LRU of variable rows per user scope (one user_id, or
+    ALL_USERS). Writers update or drop the affected scopes after committing,
+    and an entry is only stored if no write happened while it was loading.
+    Bounded by the number of scopes and by an estimate of their size in bytes.
+
+    Every write bumps the shared VARIABLES generation. A worker that sees it
+    move by more than its own writes drops all its entries.
+    """
+
+    def __init__(self, max_users: int = VARIABLE_CACHE_MAX_USERS, max_bytes: int = VARIABLE_CACHE_MAX_BYTES):
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[object, Tuple[List[Dict], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _sync(self, generation: int) -> None:
+        # Another worker wrote since we last looked: nothing cached can be trusted
+        if generation != self._generation:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
+
+    def _written(self, generation: int) -> bool:
+        # True when the write that produced `generation` is the only one we missed
+        if self._generation == generation - 1:
+            self._generation = generation
+            return True
+        self._sync(generation)
+        return False
+
+    def _drop(self, scope) -> None:
+        entry = self._entries.pop(scope, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _store(self, scope, rows: List[Dict]) -> None:
+        self._drop(scope)
+        size = _entry_size(rows)
+        if size > self.max_bytes:
+            return
+        self._entries[scope] = (rows, size)
+        self._bytes += size
+        while len(self._entries) > self.max_users or self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def get(self, scope, load) -> List[Dict]:
+        """Rows of a scope, calling load() to read them on a miss."""
+        generation = generations.current(generations.VARIABLES)
+        with self._lock:
+            self._sync(generation)
+            entry = self._entries.get(scope)
+            if entry is not None:
+                self._entries.move_to_end(scope)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        rows = load()
+        with self._lock:
+            # A write committed meanwhile may not be in what we read
+            if self._generation == generation == generations.current(generations.VARIABLES):
+                self._store(scope, rows)
+        return rows
+
+    def _apply(self, scope, match, row: Optional[Dict]) -> None:
+        entry = self._entries.get(scope)
+        if entry is None:
+            return
+        rows = [existing for existing in entry[0] if not match(existing)]
+        if row is not None:
+            position = next((i for i, existing in enumerate(entry[0]) if match(existing)), None)
+            if position is None:
+                rows.append(row)
+            else:
+                rows.insert(position, row)
+        self._store(scope, rows)
+
+    def row_saved(self, row: Dict) -> None:
+        """Writes a committed row through to the scopes holding it."""
+        def match(existing):
+            return existing['key'] == row['key'] and existing['user_id'] == row['user_id']
+
+        generation = generations.bump(generations.VARIABLES)
+        with self._lock:
+            if self._written(generation):
+                if row['user_id'] is not None:
+                    self._apply(row['user_id'], match, row)
+                self._apply(ALL_USERS, match, row)
+
+    def row_deleted(self, key: str, user_id: Optional[str]) -> None:
+        """Removes a deleted variable from the scopes holding it."""
+        def match(existing):
+            return existing['key'] == key and existing['user_id'] == user_id
+
+        generation = generations.bump(generations.VARIABLES)
+        with self._lock:
+            if self._written(generation):
+                if user_id is not None:
+                    self._apply(user_id, match, None)
+                self._apply(ALL_USERS, match, None)
+
+    def invalidate(self, user_ids) -> None:
+        """Drops the given users' scopes and the all-users scope."""
+        generation = generations.bump(generations.VARIABLES)
+        with self._lock:
+            if self._written(generation):
+                for user_id in set(user_ids):
+                    if user_id is not None:
+                        self._drop(user_id)
+                self._drop(ALL_USERS)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'users': len(self._entries),
+                'bytes': self._bytes,
+                'maxUsers': self.max_users,
+                'maxBytes': self.max_bytes,
+            }
+
+
+cache = VariableCache()
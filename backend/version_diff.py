@@ -0,0 +1,160 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import json
+import os
+import threading
+import generations
+import row_diff
+import table_deltas
+
+VERSION_DIFF_CACHE_SIZE = int(os.environ.get('VERSION_DIFF_CACHE_SIZE', '64'))
+
+
+class VersionNotFound(Exception):
+    """Raised when a version is neither stored nor reachable through the deltas."""
+
+
+def _capacity(row: Optional[Dict[str, Any]]) -> float:
+    value = row.get('capacity') if row else None
+    return value if isinstance(value, (int, float)) else 0.0
+
+
+def rewind(rows: List[Dict[str, Any]], deltas: List[Dict[str, list]]) -> List[Dict[str, Any]]:
+    """Undoes consecutive deltas (oldest first) applied to rows, newest first."""
+    index = row_diff.index_rows(rows)
+    key = row_diff.ROW_KEY
+    for delta in reversed(deltas):
+        for row in delta['inserted']:
+            index.pop(row.get(key), None)
+        for change in delta['updated']:
+            index[change['old'].get(key)] = change['old']
+        for row in delta['deleted']:
+            index[row.get(key)] = row
+    return list(index.values())
+
+
+def load_version(cursor, fiscal_year: str, version: int) -> List[Dict[str, Any]]:
+    """
+    Rows of a fiscal year at a version: the stored record with that version
+    (active or backup), else the content logged for it in table_versions while
+    retained, else the active sheet rewound through the stored deltas.
+    """
+    cursor.execute('''
+        SELECT data FROM table_data_content WHERE fiscal_year = ? AND version = ?
+        ORDER BY is_deleted LIMIT 1
+    ''', (fiscal_year, version))
+    row = cursor.fetchone()
+    if row:
+        return json.loads(row[0])
+
+    cursor.execute('''
+        SELECT b.data FROM table_versions v JOIN table_blobs b ON b.hash = v.blob_hash
+        WHERE v.fiscal_year = ? AND v.version = ?
+    ''', (fiscal_year, version))
+    row = cursor.fetchone()
+    if row:
+        return json.loads(row[0])
+
+    cursor.execute('SELECT data, version FROM table_data_content WHERE fiscal_year = ? AND is_deleted = 0', (fiscal_year,))
+    active = cursor.fetchone()
+    if active is None or not 0 < version < active[1]:
+        raise VersionNotFound(f"Version {version} of {fiscal_year} not found")
+    try:
+        deltas = table_deltas.load(cursor, fiscal_year, version, active[1])
+    except table_deltas.DeltaUnavailable as e:
+        raise VersionNotFound(f"Version {version} of {fiscal_year} not found: {e}")
+    return rewind(json.loads(active[0]), deltas)
+
+
+def diff_versions(old_rows: List[Dict[str, Any]], new_rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Added, removed and modified rows between two sheets (row_diff's hashed
+    join on id), with the changed fields and capacity delta of each modified
+    row and the capacity totals.
+    """
+    diff = row_diff.diff_rows(old_rows, new_rows)
+    old_index = row_diff.index_rows(old_rows)
+    new_index = row_diff.index_rows(new_rows)
+
+    modified = []
+    modified_capacity = 0.0
+    for change in diff['updated']:
+        row_key = change[row_diff.ROW_KEY]
+        delta = _capacity(new_index[row_key]) - _capacity(old_index[row_key])
+        modified_capacity += delta
+        modified.append({row_diff.ROW_KEY: row_key, 'changes': change['changes'], 'capacityDelta': delta})
+
+    removed = [old_index[row_key] for row_key in diff['deleted']]
+    added_capacity = sum(_capacity(row) for row in diff['inserted'])
+    removed_capacity = sum(_capacity(row) for row in removed)
+    return {
+        'added': diff['inserted'],
+        'removed': removed,
+        'modified': modified,
+        'summary': {
+            'added': len(diff['inserted']),
+            'removed': len(removed),
+            'modified': len(modified),
+            'capacityDelta': {
+                'added': added_capacity,
+                'removed': -removed_capacity,
+                'modified': modified_capacity,
+                'net': added_capacity - removed_capacity + modified_capacity,
+            },
+        },
+    }
+
+
+class VersionDiffCache:
+    """
+    LRU of diffs by (fiscal_year, from, to). Version numbers are never
+    reused, so a stored version does not change; removing a backup drops
+    one and bumps the TABLE_HISTORY generation, which empties the cache in
+    every worker.
+    """
+
+    def __init__(self, max_entries: int = VERSION_DIFF_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int, int], Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fiscal_year: str, from_version: int, to_version: int, connect) -> Dict[str, Any]:
+        key = (fiscal_year, from_version, to_version)
+        generation = generations.current(generations.TABLE_HISTORY)
+        with self._lock:
+            if generation != self._generation:
+                self._entries.clear()
+                self._generation = generation
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            old_rows = load_version(cursor, fiscal_year, from_version)
+            new_rows = load_version(cursor, fiscal_year, to_version)
+        finally:
+            conn.close()
+        result = {'fiscalYear': fiscal_year, 'from': from_version, 'to': to_version, **diff_versions(old_rows, new_rows)}
+
+        with self._lock:
+            if self._generation == generation == generations.current(generations.TABLE_HISTORY):
+                self._entries[key] = result
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+
+def history_rewritten() -> None:
+    """Call after committing a write that removes stored versions."""
+    generations.bump(generations.TABLE_HISTORY)
+
+
+cache = VersionDiffCache()
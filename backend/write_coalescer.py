@@ -0,0 +1,80 @@
+from typing import Any, Callable, Dict, Hashable
+import threading
+import time
+import metrics
+
+BATCH_SIZE_BUCKETS = [1, 2, 3, 5, 10, 20, 50, 100]
+
+
+class _Batch:
+    def __init__(self):
+        self.payload = None
+        self.size = 0
+        self.done = threading.Event()
+        self.persist_started = None
+        self.result = None
+        self.error = None
+
+
+class WriteCoalescer:
+    """
+    Group commit for full-state writes. The first save for a key opens a batch
+    and waits `window_seconds`; saves for the same key arriving meanwhile only
+    replace the pending payload. The batch then persists the latest payload
+    once and every caller in it gets the same result (or error).
+
+    Batches of one key are persisted in order; different keys never wait on
+    each other. A window of 0 persists every call directly.
+    """
+
+    def __init__(self, name: str, window_seconds: float, persist: Callable[[Hashable, Any], Any]):
+        self.window_seconds = window_seconds
+        self._persist = persist
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, _Batch] = {}
+        self._persist_locks: Dict[Hashable, threading.Lock] = {}
+        self._batch_sizes = metrics.histogram(f'{name}.batch_size', BATCH_SIZE_BUCKETS)
+        self._added_latency = metrics.histogram(f'{name}.added_latency_ms')
+        self._batches = metrics.counter(f'{name}.batches')
+        self._writes = metrics.counter(f'{name}.writes')
+
+    def submit(self, key: Hashable, payload: Any) -> Any:
+        self._writes.inc()
+        if self.window_seconds <= 0:
+            self._batches.inc()
+            self._batch_sizes.observe(1)
+            return self._persist(key, payload)
+
+        arrived = time.monotonic()
+        with self._lock:
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                self._pending[key] = batch
+                persist_lock = self._persist_locks.setdefault(key, threading.Lock())
+            batch.payload = payload
+            batch.size += 1
+
+        if leader:
+            time.sleep(self.window_seconds)
+            with self._lock:
+                # Close the batch; later saves open the next one
+                del self._pending[key]
+            with persist_lock:
+                batch.persist_started = time.monotonic()
+                try:
+                    batch.result = self._persist(key, batch.payload)
+                except Exception as e:
+                    batch.error = e
+                finally:
+                    batch.done.set()
+            self._batches.inc()
+            self._batch_sizes.observe(batch.size)
+        else:
+            batch.done.wait()
+
+        self._added_latency.observe((batch.persist_started - arrived) * 1000)
+        if batch.error is not None:
+            raise batch.error
+        return batch.result
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+API benchmark suite.
+
+Runs the FastAPI backend in-process (TestClient) against a temporary SQLite
+database seeded with synthetic fiscal-year sheets (backend/synthetic_data.py,
+learned from the app/components/ex*.json templates), and reports
+p50/p95/p99 latency, requests per second and peak RSS for the read, write,
+backup and import endpoints.
+
+Results are written as JSON and compared against a committed baseline;
+the script exits with status 1 when a case regresses past the threshold.
+Every case makes at least MIN_ITERATIONS calls, whatever the sheet size, and
+latency is gated on the median: p95/p99 are reported, but over 20-odd calls
+one slow call moves them too much to gate on.
+Timings are machine specific: refresh the baseline with --update-baseline
+on the machine that runs the comparison. The 1M-row sheet only runs with
+--large (peak RSS grows about linearly, roughly 8 GB at 1M rows), and the
+committed baseline has no entries for it; its meta lists the gated sizes.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --large
+    python benchmarks/run_benchmarks.py --update-baseline
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / "backend"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+# Added by --large: too memory hungry for the default run or the committed baseline
+LARGE_SIZES = [1000000]
+LARGE_SIZES_FLAG = "--large"
+DEFAULT_ITERATIONS = 20
+# Fewest calls per case, so p95 is read off a real distribution
+MIN_ITERATIONS = 20
+DEFAULT_SEED = 42
+# Relative change in p50 latency, RPS or peak RSS that counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# --- Seeding ---
+
+def seed_fiscal_year(db_path, fiscal_year, data_json, backups=2):
+    """
+    Writes an active sheet plus a few backup versions straight into the
+    database, pointing at one content-addressed blob as the backend stores them.
+    """
+    import table_store
+
+    conn = sqlite3.connect(db_path)
+    try:
+        blob_hash = table_store.store_blob(conn.cursor(), data_json)
+        conn.execute("DELETE FROM table_data WHERE fiscal_year = ?", (fiscal_year,))
+        for version in range(1, backups + 1):
+            conn.execute(
+                "INSERT INTO table_data (fiscal_year, data, blob_hash, version, is_deleted) VALUES (?, '', ?, ?, 1)",
+                (fiscal_year, blob_hash, version),
+            )
+        conn.execute(
+            "INSERT INTO table_data (fiscal_year, data, blob_hash, version) VALUES (?, '', ?, ?)",
+            (fiscal_year, blob_hash, backups + 1),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# --- Measurement ---
+
+class PeakRSS:
+    """Samples the resident set size in a background thread while active."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            # No procfs: fall back to the lifetime peak (KiB on Linux, bytes on macOS)
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_case(request, iterations):
+    """Calls request() `iterations` times after one warm-up and summarizes the timings."""
+    request()
+    latencies = []
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            request()
+            latencies.append((time.perf_counter() - t0) * 1000)
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "rps": round(iterations / elapsed, 3) if elapsed else None,
+        "peak_rss_mb": round(rss.peak / (1024 * 1024), 1),
+    }
+
+
+def expect_ok(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url}: {response.status_code} {response.text[:200]}")
+    return response
+
+
+# --- Cases ---
+
+def build_cases(client, fiscal_year, rows):
+    """Endpoint cases for one seeded fiscal year, by category."""
+    payload = {"fiscalYear": fiscal_year, "data": rows}
+
+    def get(path, **params):
+        return lambda: expect_ok(client.get(path, params=params)).content
+
+    def restore():
+        return expect_ok(client.post("/backup-data/restore", json={"fiscalYear": fiscal_year, "version": 1}))
+
+    return [
+        ("read", "GET /table-data", get("/table-data", fiscalYear=fiscal_year)),
+        ("read", "GET /table-data?format=compact", get("/table-data", fiscalYear=fiscal_year, format="compact")),
+        ("read", "GET /table-data/export?format=csv", get("/table-data/export", fiscalYear=fiscal_year, format="csv")),
+        ("read", "GET /table-data/compare", get("/table-data/compare", fiscalYear=fiscal_year)),
+        ("write", "POST /table-data", lambda: expect_ok(client.post("/table-data", json=payload))),
+        ("backup", "GET /backup-data", get("/backup-data", fiscalYear=fiscal_year)),
+        ("backup", "POST /backup-data/restore", restore),
+        ("import", "POST /import-data-from-frontend", lambda: expect_ok(client.post("/import-data-from-frontend", json=payload))),
+    ]
+
+
+def run_benchmarks(sizes, iterations, seed):
+    db_dir = tempfile.mkdtemp(prefix="adani-bench-")
+    os.environ["ADANI_DB_PATH"] = os.path.join(db_dir, "bench.db")
+    os.environ["ADANI_SNAPSHOT_DIR"] = os.path.join(db_dir, "snapshots")
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    # The backend logs every request; keep that out of the report
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            import main
+            import synthetic_data
+            from fastapi.testclient import TestClient
+
+            model = synthetic_data.learn_model()
+            results = []
+            with TestClient(main.app) as client:
+                for size in sizes:
+                    fiscal_year = f"BENCH_{size}"
+                    rows = synthetic_data.generate_rows(model, size, seed)
+                    data_json = json.dumps(rows)
+                    for category, name, request in build_cases(client, fiscal_year, rows):
+                        # Every case starts from the same sheet and backup history
+                        seed_fiscal_year(os.environ["ADANI_DB_PATH"], fiscal_year, data_json)
+                        result = {"rows": size, "category": category, "endpoint": name}
+                        result.update(run_case(request, iterations))
+                        results.append(result)
+                        print(json.dumps(result), file=sys.stderr)
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": seed,
+            "sizes": sizes,
+            "large_sizes": LARGE_SIZES,
+            "large_sizes_flag": LARGE_SIZES_FLAG,
+            "iterations": iterations,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+# --- Baseline comparison ---
+
+def unmatched(current, baseline):
+    """Results with no baseline entry to compare against (e.g. the --large sizes)."""
+    previous = {(r["rows"], r["endpoint"]) for r in baseline.get("results", [])}
+    return [r for r in current["results"] if (r["rows"], r["endpoint"]) not in previous]
+
+
+def compare(current, baseline, threshold):
+    """Regressions of current results against the baseline, matched by (rows, endpoint)."""
+    previous = {(r["rows"], r["endpoint"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        base = previous.get((result["rows"], result["endpoint"]))
+        if base is None:
+            continue
+        checks = [
+            ("p50_ms", result["p50_ms"] > base["p50_ms"] * (1 + threshold)),
+            ("rps", result["rps"] < base["rps"] * (1 - threshold)),
+            ("peak_rss_mb", result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold)),
+        ]
+        for metric, regressed in checks:
+            if regressed:
+                regressions.append({
+                    "rows": result["rows"],
+                    "endpoint": result["endpoint"],
+                    "metric": metric,
+                    "baseline": base[metric],
+                    "current": result[metric],
+                })
+    return regressions
+
+
+def print_report(report, regressions):
+    header = f"{'rows':>8}  {'category':<7} {'endpoint':<36} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rps':>9} {'rss MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in report["results"]:
+        print(f"{r['rows']:>8}  {r['category']:<7} {r['endpoint']:<36} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['rps']:>9} {r['peak_rss_mb']:>8}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against the baseline:")
+        for reg in regressions:
+            print(f"  {reg['rows']:>8} {reg['endpoint']}: {reg['metric']} {reg['baseline']} -> {reg['current']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend API against synthetic fiscal-year sheets")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated row counts per sheet (e.g. 1000,10000,100000,1000000)")
+    parser.add_argument(LARGE_SIZES_FLAG, action="store_true",
+                        help=f"Also run the {','.join(str(s) for s in LARGE_SIZES)}-row sheet (needs about 8 GB of RAM, not in the committed baseline)")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS,
+                        help=f"Calls per case, at every size (at least {MIN_ITERATIONS})")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", default="bench_output.json", help="Where to write the results JSON")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to the baseline file")
+    args = parser.parse_args()
+
+    if args.iterations < MIN_ITERATIONS:
+        parser.error(f"--iterations must be at least {MIN_ITERATIONS}")
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    if args.large:
+        sizes += [size for size in LARGE_SIZES if size not in sizes]
+    report = run_benchmarks(sizes, args.iterations, args.seed)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    regressions = []
+    missing = []
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        missing = unmatched(report, baseline)
+
+    print_report(report, regressions)
+    if missing:
+        sizes_missing = sorted({r["rows"] for r in missing})
+        print(f"\n{len(missing)} case(s) not in the baseline, not compared (rows: {', '.join(str(s) for s in sizes_missing)})")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+// Decoder for the column-wise table data format returned by
+// GET /api/table-data?fiscalYear=xxx&format=compact
+
+export interface CompactTableData {
+  format: 'compact';
+  length: number;
+  columns: string[];
+  dictionaries: Record<string, any[]>;
+  data: Record<string, any[]>;
+}
+
+export function isCompactTableData(payload: any): payload is CompactTableData {
+  return payload != null && payload.format === 'compact' && Array.isArray(payload.columns);
+}
+
+// Rebuild row objects from the column arrays, resolving dictionary codes
+export function decodeCompactTable<T = Record<string, any>>(payload: CompactTableData): T[] {
+  const { columns, dictionaries, data, length } = payload;
+  const columnValues = columns.map((column) => {
+    const values = data[column];
+    const dictionary = dictionaries[column];
+    return dictionary ? values.map((code: number) => dictionary[code]) : values;
+  });
+
+  const rows: T[] = new Array(length);
+  for (let i = 0; i < length; i++) {
+    const row: Record<string, any> = {};
+    for (let c = 0; c < columns.length; c++) {
+      row[columns[c]] = columnValues[c][i];
+    }
+    rows[i] = row as T;
+  }
+  return rows;
+}
@@ -0,0 +1,38 @@
+import { useEffect, useRef } from 'react';
+
+export interface ChangeEvent {
+  id: number;
+  resource: 'tableData' | 'dropdownOptions' | 'locationRelationships';
+  fiscalYear: string | null;
+  version: number;
+  // null when the whole sheet or list was replaced
+  rowIds: number[] | null;
+  optionTypes?: string[];
+}
+
+// Subscribes to /api/events and calls onChange for every committed change.
+// onReset is called when the client missed events and has to refetch.
+export function useChangeFeed(onChange: (event: ChangeEvent) => void, onReset?: () => void) {
+  const onChangeRef = useRef(onChange);
+  const onResetRef = useRef(onReset);
+  onChangeRef.current = onChange;
+  onResetRef.current = onReset;
+
+  useEffect(() => {
+    // EventSource reconnects by itself and resumes with Last-Event-ID
+    const source = new EventSource('/api/events');
+
+    source.addEventListener('change', (message) => {
+      try {
+        onChangeRef.current(JSON.parse((message as MessageEvent).data));
+      } catch (err) {
+        console.error('Error handling change event:', err);
+      }
+    });
+    source.addEventListener('reset', () => {
+      onResetRef.current?.();
+    });
+
+    return () => source.close();
+  }, []);
+}
@@ -63,6 +63,33 @@ export function useVariables() {
     }
   };
 
+  // Set several variables in one request
+  const setManyVariables = async (values: Record<string, any>) => {
+    try {
+      const response = await fetch('/api/variables/bulk', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(Object.entries(values).map(([key, value]) => ({ key, value }))),
+      });
+
+      const data = await response.json();
+
+      if (response.ok) {
+        // Update local state
+        setVariables(prev => ({ ...prev, ...values }));
+        return { success: true, data };
+      } else {
+        throw new Error(data.error || 'Failed to set variables');
+      }
+    } catch (err: any) {
+      setError(err.message || 'Network error');
+      console.error('Error setting variables:', err);
+      return { success: false, error: err.message };
+    }
+  };
+
   // Delete a variable
   const deleteVariable = async (key: string) => {
     try {
@@ -101,6 +128,7 @@ export function useVariables() {
     error,
     getVariable,
     setVariable,
+    setManyVariables,
     deleteVariable,
     refresh: fetchVariables,
   };
@@ -13,7 +13,8 @@ from pathlib import Path
 backend_dir = Path(__file__).parent / "backend"
 sys.path.append(str(backend_dir))
 
-from database import get_db_connection
+from database import get_db_connection, create_admin_user
+import table_store
 from main import convert_to_table_row
 
 def load_sample_data():
@@ -56,23 +57,11 @@ def load_sample_data():
             converted_data = [convert_to_table_row(row, i) for i, row in enumerate(raw_data)]
             data_json = json.dumps(converted_data)
            
-            # Upsert logic
-            cursor.execute('SELECT 1 FROM table_data WHERE fiscal_year = ?', (item['name'],))
-            exists = cursor.fetchone()
-           
-            if exists:
-                cursor.execute('''
-                    UPDATE table_data
-                    SET data = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE fiscal_year = ?
-                ''', (data_json, item['name']))
-                print(f"Updated data for {item['name']} with {len(converted_data)} records")
+            # Upsert logic; an unchanged file writes nothing
+            if table_store.import_sheet(cursor, item['name'], data_json) is not None:
+                print(f"Imported data for {item['name']} with {len(converted_data)} records")
             else:
-                cursor.execute('''
-                    INSERT INTO table_data (fiscal_year, data, version)
-                    VALUES (?, ?, 1)
-                ''', (item['name'], data_json))
-                print(f"Inserted data for {item['name']} with {len(converted_data)} records")
+                print(f"Data for {item['name']} unchanged ({len(converted_data)} records)")
                
             results.append({
                 'fiscalYear': item['name'],
@@ -143,6 +132,10 @@ if __name__ == "__main__":
         
         # Populate dropdown options
         populate_dropdown_options()
+
+        # Admin user (no longer created on backend startup)
+        if create_admin_user():
+            print("Admin user created")
         
         print("\nDatabase population completed successfully!")
     except Exception as e:
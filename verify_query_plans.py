@@ -0,0 +1,184 @@
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+# Checks the query plan of every statement the backend issues: drives the API
+# through a scenario touching each endpoint, records the statements, and runs
+# EXPLAIN QUERY PLAN on each. Fails when one scans a table outside the list
+# of statements that read a whole (small) table by design.
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+# Statements allowed to scan (patterns over the whole normalized SQL), with the reason
+ALLOWED_SCANS = {
+    r"SELECT \* FROM dropdown_options WHERE is_deleted = \?": "reads every active option",
+    r"SELECT option_type, option_value FROM dropdown_options WHERE is_deleted = \?": "reads every active option",
+    r"UPDATE dropdown_options SET is_deleted = \?, version = version \+ \?, updated_at = CURRENT_TIMESTAMP": "a full options save replaces every type",
+    r"SELECT \* FROM variables": "unscoped listing of every variable",
+    r"SELECT fiscal_year, version FROM table_data WHERE is_deleted = \?": "one record per fiscal year, sheets live in table_blobs",
+    r"SELECT t\.fiscal_year, t\.version, .* FROM table_data_content t, json_each\(t\.data\) j WHERE t\.is_deleted = \?": "autocomplete index build over every active sheet",
+}
+
+# Statement kinds without a meaningful plan
+SKIPPED = re.compile(r"^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE|PRAGMA|CREATE|ALTER|DROP|EXPLAIN|ANALYZE|VACUUM)\b", re.IGNORECASE)
+# Plan steps that do not read a stored table in full
+HARMLESS = re.compile(r"VIRTUAL TABLE|CONSTANT ROW|SUBQUERY|\(subquery|USE TEMP B-TREE|LIST SUBQUERY|MATERIALIZE")
+
+
+def row(i, group="G1"):
+    return {
+        "id": i, "sno": i, "capacity": float(i % 50), "group": group, "ppaMerchant": "PPA",
+        "type": "Solar", "solar": 1.0, "wind": None, "spv": f"SPV {i % 7}", "locationCode": f"LC{i % 5}",
+        "location": f"Loc {i % 5}", "pss": f"PSS {i % 3}", "connectivity": "CTU",
+    }
+
+
+def expect_ok(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url}: {response.status_code} {response.text[:200]}")
+    return response
+
+
+class CheckedClient:
+    """Test client whose calls fail the check on an error status, so every plan comes from a working call."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, *args, **kwargs):
+        return expect_ok(self.client.get(*args, **kwargs))
+
+    def post(self, *args, **kwargs):
+        return expect_ok(self.client.post(*args, **kwargs))
+
+    def delete(self, *args, **kwargs):
+        return expect_ok(self.client.delete(*args, **kwargs))
+
+
+def run_scenario(client, admin_headers):
+    """Calls every endpoint family once or twice, with the parameters the frontend uses."""
+    client.get("/health")
+    client.get("/metrics")
+    rows = [row(i) for i in range(1, 60)]
+    for fiscal_year in ("FY_25", "FY_26"):
+        client.post("/table-data", json={"fiscalYear": fiscal_year, "data": rows})
+    rows[0]["capacity"] = 99.0
+    client.post("/table-data", json={"fiscalYear": "FY_25", "data": rows, "expectedVersion": 1})
+    client.post("/table-data", json={"fiscalYear": "FY_25", "data": rows[:-1]})
+
+    client.get("/table-data?fiscalYear=FY_25")
+    client.get("/table-data?fiscalYear=FY_25&format=compact")
+    client.get("/table-data?fiscalYear=FY_25&asOf=2000-01-01")
+    client.get("/table-data?fiscalYear=FY_25&asOf=2999-01-01")
+    client.get("/table-data/changes?fiscalYear=FY_25&since=1")
+    client.get("/table-data/export?fiscalYear=FY_25&format=csv&group=G1")
+    client.get("/table-data/compare?fiscalYear=FY_25,FY_26&groupBy=group,type")
+    client.get("/autocomplete?field=spv&q=SPV&fiscalYear=FY_25")
+    client.get("/autocomplete?field=location&q=Loc")
+
+    client.get("/backup-data?fiscalYear=FY_25")
+    client.get("/backup-data/diff?fiscalYear=FY_25&from=1&to=3")
+    client.delete("/table-data?fiscalYear=FY_26")
+    client.get("/backup-data?fiscalYear=FY_26")
+    client.post("/backup-data/restore", json={"fiscalYear": "FY_26", "version": 2})
+    client.delete("/table-data?fiscalYear=FY_26")
+    client.delete("/backup-data?fiscalYear=FY_26&version=2")
+    client.post("/import-data-from-frontend", json={"fiscalYear": "FY_27", "data": rows[:10]})
+
+    client.get("/dropdown-options")
+    client.post("/dropdown-options", json={
+        "fiscalYear": "FY_25", "groups": ["G1", "G2"], "ppaMerchants": ["PPA"], "types": ["Solar"],
+        "locationCodes": ["LC1"], "locations": ["Loc 1"], "connectivities": ["CTU"],
+    })
+    client.post("/dropdown-option", json={"optionType": "groups", "optionValue": "G3"})
+    client.get("/dropdown-options/groups")
+    client.post("/dropdown-options/groups", json=["G1", "G4"])
+    client.get("/master-data?fiscalYear=FY_25")
+    client.post("/master-data", json={
+        "fiscalYear": "FY_25", "options": {"types": ["Solar", "Wind"]},
+        "relationships": [{"location": "Loc 1", "locationCode": "LC1"}],
+    })
+    client.get("/location-relationships?fiscalYear=FY_25")
+    client.post("/location-relationships?fiscalYear=FY_25", json=[{"location": "Loc 2", "locationCode": "LC2"}])
+    client.post("/location-relationships/validate?fiscalYear=FY_25&mode=fill", json=rows[:5])
+
+    client.post("/variables", json={"key": "theme", "value": "dark", "user_id": "u1"})
+    client.post("/variables", json={"key": "theme", "value": "light"})
+    client.post("/variables/bulk", json=[{"key": "a", "value": 1, "user_id": "u1"}, {"key": "b", "value": 2}])
+    client.get("/variables")
+    client.get("/variables?user_id=u1")
+    client.get("/variables?key=theme&user_id=u1")
+    client.get("/variables/bulk?keys=a,b&user_id=u1")
+    client.get("/variables/bulk?prefix=th")
+    client.delete("/variables?key=a&user_id=u1")
+
+    client.get("/admin/profiles", headers=admin_headers)
+    client.get("/admin/slow-queries", headers=admin_headers)
+
+
+def full_scans(conn, sql, parameters):
+    """Plan steps of a statement that scan a stored table in full."""
+    try:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error as e:
+        return [f"(could not explain: {e})"]
+    return [step[3] for step in plan if step[3].startswith("SCAN ") and not HARMLESS.search(step[3])]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["ADANI_DB_PATH"] = os.path.join(tmp, "plans.db")
+        os.environ["ADANI_SNAPSHOT_DIR"] = os.path.join(tmp, "snapshots")
+        os.environ["PROFILE_DIR"] = os.path.join(tmp, "profiles")
+        os.environ["TABLE_DATA_COALESCE_WINDOW_MS"] = "0"
+        # Keep the timing hook on, but quiet
+        os.environ["SLOW_QUERY_MS"] = "1e9"
+        sys.path.insert(0, BACKEND_DIR)
+
+        import contextlib
+        import io
+        from fastapi.testclient import TestClient
+        import database
+        import query_log
+        import main as backend
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.create_admin_user()
+            with TestClient(backend.app) as client:
+                token = client.post("/login", json={
+                    "email": database.DEFAULT_ADMIN_EMAIL, "password": database.DEFAULT_ADMIN_PASSWORD
+                }).json()["access_token"]
+                with query_log.capture() as statements:
+                    run_scenario(CheckedClient(client), {"Authorization": f"Bearer {token}"})
+
+        conn = sqlite3.connect(database.DB_PATH)
+        seen = {}
+        for sql, parameters in statements:
+            if not SKIPPED.match(sql):
+                seen.setdefault(query_log.normalize(sql), (sql, parameters))
+
+        failures = []
+        allowed = 0
+        for normalized, (sql, parameters) in sorted(seen.items()):
+            scans = full_scans(conn, sql, parameters)
+            if not scans:
+                continue
+            if any(re.fullmatch(pattern, normalized) for pattern in ALLOWED_SCANS):
+                allowed += 1
+                continue
+            failures.append((normalized, scans))
+        conn.close()
+
+        print(f"Checked {len(seen)} distinct statements ({allowed} allowed full scans)")
+        for normalized, scans in failures:
+            print(f"FULL SCAN: {', '.join(scans)}\n    {normalized}")
+        if failures:
+            print(f"{len(failures)} statement(s) scan a table in full")
+            sys.exit(1)
+        print("No unexpected full table scans")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Startup budgets in milliseconds (override with env vars of the same name)
+STARTUP_BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", "50"))          # startup event, schema current
+MIGRATION_BUDGET_MS = float(os.environ.get("MIGRATION_BUDGET_MS", "1000"))    # startup event, empty database
+COLD_START_BUDGET_MS = float(os.environ.get("COLD_START_BUDGET_MS", "2000"))  # import + startup, schema current
+
+RUNS = 5
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+# Runs in a fresh interpreter so imports and the database are cold
+PROBE = """
+import contextlib, io, json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+with contextlib.redirect_stdout(io.StringIO()):
+    import main
+    imported = time.perf_counter()
+    main.startup_event()
+    finished = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (finished - imported) * 1000,
+    "total_ms": (finished - started) * 1000,
+}))
+"""
+
+
+def probe(db_path):
+    env = dict(os.environ, ADANI_DB_PATH=db_path)
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, BACKEND_DIR],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def check(name, value, budget):
+    ok = value <= budget
+    print(f"{name}: {value:.1f} ms (budget {budget:.0f} ms) {'OK' if ok else 'OVER BUDGET'}")
+    return ok
+
+
+def main():
+    print("Measuring backend startup...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.db")
+
+        # First start creates the schema
+        first = probe(db_path)
+
+        # Later starts find it current
+        warm = [probe(db_path) for _ in range(RUNS)]
+
+    results = [
+        check("Startup on empty database", first["startup_ms"], MIGRATION_BUDGET_MS),
+        check(f"Startup with current schema (median of {RUNS})",
+              statistics.median(r["startup_ms"] for r in warm), STARTUP_BUDGET_MS),
+        check(f"Import + startup with current schema (median of {RUNS})",
+              statistics.median(r["total_ms"] for r in warm), COLD_START_BUDGET_MS),
+    ]
+
+    if not all(results):
+        print("Startup budget exceeded!")
+        sys.exit(1)
+    print("All checks passed!")
+
+
+if __name__ == "__main__":
+    main()